@@ -1,15 +1,24 @@
 """stactools-icesat2-boreal"""
 
-import stactools.core
-from stactools.cli.registry import Registry
-from stactools.icesat2_boreal.stac import create_collection, create_item
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from stactools.cli.registry import Registry
 
 __all__ = ["create_collection", "create_item"]
 
-stactools.core.use_fsspec()
+
+def __getattr__(name: str) -> Any:
+    # importing stac.py loads rasterio, rio_stac and pystac, so it is deferred until
+    # one of its functions is used rather than paid by every plugin registration
+    if name in __all__:
+        from stactools.icesat2_boreal import stac
+
+        return getattr(stac, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
-def register_plugin(registry: Registry) -> None:
+def register_plugin(registry: "Registry") -> None:
     from stactools.icesat2_boreal import commands
 
     registry.register_subcommand(commands.create_icesat2boreal_command)
@@ -0,0 +1,358 @@
+"""Collection extent and summaries reduced from the generated items
+
+A :class:`CollectionSummary` is built in one pass over a stream of items, or over
+the columns of an :class:`~stactools.icesat2_boreal.store.ItemStore`, and only holds
+a few numbers per band. Partial summaries of separate workers or files are combined
+with :meth:`CollectionSummary.merge`.
+"""
+
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional
+
+import fsspec
+import numpy as np
+import numpy.typing as npt
+from pystac import Collection, Extent, SpatialExtent, Summaries, TemporalExtent
+from pystac.utils import datetime_to_str, str_to_datetime
+
+from stactools.icesat2_boreal.constants import AssetType
+from stactools.icesat2_boreal.options import Variable
+from stactools.icesat2_boreal.templates import get_item_template
+
+if TYPE_CHECKING:
+    from stactools.icesat2_boreal.store import ItemStore
+
+# summary of the DAAC coverage of the items
+IN_DAAC_SUMMARY = "icesat2-boreal:in_daac"
+
+
+@dataclass
+class BandSummary:
+    """Statistics of one band over many items
+
+    Item means and variances are weighted by the number of valid pixels of the
+    item, so ``mean`` and ``stddev`` are those of all valid pixels of the
+    collection. Items without ``valid_percent`` count as fully valid.
+    """
+
+    items: int = 0
+    pixels: float = 0.0
+    minimum: float = math.inf
+    maximum: float = -math.inf
+    mean: float = 0.0
+    # sum of the squared differences of the pixels from the mean
+    m2: float = 0.0
+
+    @property
+    def stddev(self) -> float:
+        """Standard deviation of the valid pixels"""
+        return math.sqrt(self.m2 / self.pixels) if self.pixels else math.nan
+
+    @classmethod
+    def from_statistics(cls, statistics: Dict[str, Any], pixels: int) -> "BandSummary":
+        """Summary of one item, from the ``statistics`` of a band"""
+        mean = statistics.get("mean")
+        valid = pixels * statistics.get("valid_percent", 100.0) / 100
+        if mean is None or math.isnan(mean) or not valid:
+            return cls()
+        stddev = statistics.get("stddev")
+        return cls(
+            items=1,
+            pixels=valid,
+            minimum=statistics.get("minimum", mean),
+            maximum=statistics.get("maximum", mean),
+            mean=mean,
+            m2=valid * stddev**2 if stddev is not None else 0.0,
+        )
+
+    @classmethod
+    def from_arrays(
+        cls, statistics: npt.NDArray[np.float64], pixels: npt.NDArray[np.float64]
+    ) -> "BandSummary":
+        """Summary of many items
+
+        Args:
+            statistics: One row of ``mean, minimum, maximum, stddev, valid_percent``
+                per item, NaN where missing, as in ``ItemStore.statistics``
+            pixels: Number of pixels of each item
+        """
+        mean, minimum, maximum, stddev, valid_percent = statistics.T
+        weights = pixels * np.where(np.isnan(valid_percent), 100.0, valid_percent) / 100
+        valid = ~np.isnan(mean) & (weights > 0)
+        if not valid.any():
+            return cls()
+
+        weights, mean = weights[valid], mean[valid]
+        total = weights.sum()
+        global_mean = (weights * mean).sum() / total
+        variance = np.nan_to_num(stddev[valid]) ** 2 + (mean - global_mean) ** 2
+        return cls(
+            items=int(valid.sum()),
+            pixels=float(total),
+            minimum=float(np.fmin.reduce(np.fmin(minimum[valid], mean))),
+            maximum=float(np.fmax.reduce(np.fmax(maximum[valid], mean))),
+            mean=float(global_mean),
+            m2=float((weights * variance).sum()),
+        )
+
+    def merge(self, other: "BandSummary") -> None:
+        """Add the items of another summary to this one"""
+        if not other.items:
+            return
+        pixels = self.pixels + other.pixels
+        delta = other.mean - self.mean
+        self.mean += delta * other.pixels / pixels
+        self.m2 += other.m2 + delta**2 * self.pixels * other.pixels / pixels
+        self.pixels = pixels
+        self.items += other.items
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Structured report, e.g. for JSON output"""
+        return {
+            "items": self.items,
+            "pixels": self.pixels,
+            "minimum": self.minimum,
+            "maximum": self.maximum,
+            "mean": self.mean,
+            "stddev": self.stddev,
+        }
+
+    @classmethod
+    def from_dict(cls, report: Dict[str, Any]) -> "BandSummary":
+        """Summary from a report created by :meth:`to_dict`"""
+        if not report["items"]:
+            return cls()
+        return cls(
+            items=report["items"],
+            pixels=report["pixels"],
+            minimum=report["minimum"],
+            maximum=report["maximum"],
+            mean=report["mean"],
+            m2=report["stddev"] ** 2 * report["pixels"],
+        )
+
+
+@dataclass
+class CollectionSummary:
+    """Spatial and temporal extent, band statistics and DAAC coverage of items"""
+
+    items: int = 0
+    in_daac: int = 0
+    bbox: List[float] = field(
+        default_factory=lambda: [math.inf, math.inf, -math.inf, -math.inf]
+    )
+    start_datetime: Optional[datetime] = None
+    end_datetime: Optional[datetime] = None
+    # by band name, in the order of the bands of the COG asset
+    bands: Dict[str, BandSummary] = field(default_factory=dict)
+
+    def add(self, item_dict: Dict[str, Any]) -> None:
+        """Add one STAC item dictionary"""
+        properties = item_dict["properties"]
+        start = properties.get("start_datetime") or properties.get("datetime")
+        end = properties.get("end_datetime") or properties.get("datetime")
+        shape = properties.get("proj:shape") or [1, 1]
+
+        partial = CollectionSummary(
+            items=1,
+            in_daac=int(bool(properties.get("icesat2-boreal:in_daac"))),
+            start_datetime=str_to_datetime(start) if start else None,
+            end_datetime=str_to_datetime(end) if end else None,
+        )
+        if item_dict.get("bbox"):
+            partial.bbox = list(item_dict["bbox"][:4])
+        cog = item_dict.get("assets", {}).get(AssetType.COG.value, {})
+        for band in cog.get("bands", []):
+            partial.bands[band.get("name")] = BandSummary.from_statistics(
+                band.get("statistics", {}), shape[0] * shape[1]
+            )
+        self.merge(partial)
+
+    def add_store(self, store: "ItemStore") -> None:
+        """Add every item of an item store, computed from its columns"""
+        if not len(store):
+            return
+
+        partial = CollectionSummary(
+            items=len(store),
+            in_daac=int(store.in_daac.sum()),
+            bbox=[
+                *np.fmin.reduce(store.bbox[:, :2]).tolist(),
+                *np.fmax.reduce(store.bbox[:, 2:]).tolist(),
+            ],
+        )
+        years = set(zip(store.variable.tolist(), store.year.tolist(), strict=True))
+        datetimes = [
+            get_item_template(Variable(variable), year).properties
+            for variable, year in years
+        ]
+        partial.start_datetime = min(
+            str_to_datetime(d["start_datetime"]) for d in datetimes
+        )
+        partial.end_datetime = max(
+            str_to_datetime(d["end_datetime"]) for d in datetimes
+        )
+
+        pixels = store.proj_shape.prod(axis=1).astype(np.float64)
+        for names, rows in store.band_groups():
+            for index, name in enumerate(names):
+                partial.bands.setdefault(name, BandSummary()).merge(
+                    BandSummary.from_arrays(store.statistics[rows, index], pixels[rows])
+                )
+        self.merge(partial)
+
+    def merge(self, other: "CollectionSummary") -> None:
+        """Add the items of another summary to this one"""
+        self.items += other.items
+        self.in_daac += other.in_daac
+        self.bbox = [
+            min(self.bbox[0], other.bbox[0]),
+            min(self.bbox[1], other.bbox[1]),
+            max(self.bbox[2], other.bbox[2]),
+            max(self.bbox[3], other.bbox[3]),
+        ]
+        starts = [d for d in (self.start_datetime, other.start_datetime) if d]
+        self.start_datetime = min(starts) if starts else None
+        ends = [d for d in (self.end_datetime, other.end_datetime) if d]
+        self.end_datetime = max(ends) if ends else None
+        for name, band in other.bands.items():
+            self.bands.setdefault(name, BandSummary()).merge(band)
+
+    def apply(self, collection: Collection) -> None:
+        """Set the extent and summaries of a collection from the items"""
+        if not self.items:
+            return
+
+        collection.extent = Extent(
+            spatial=SpatialExtent(bboxes=[self.bbox]),
+            temporal=TemporalExtent(
+                intervals=[[self.start_datetime, self.end_datetime]]
+            ),
+        )
+        # a new object, the static summaries are shared by all collections
+        summaries = collection.summaries.to_dict()
+        summaries["bands"] = [
+            {
+                "name": name,
+                "statistics": {
+                    "minimum": band.minimum,
+                    "maximum": band.maximum,
+                    "mean": band.mean,
+                    "stddev": band.stddev,
+                },
+            }
+            for name, band in self.bands.items()
+            if band.items
+        ]
+        counts = {False: self.items - self.in_daac, True: self.in_daac}
+        summaries[IN_DAAC_SUMMARY] = [value for value, count in counts.items() if count]
+        collection.summaries = Summaries(summaries)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Structured report, e.g. for JSON output"""
+        return {
+            "items": self.items,
+            "in_daac": self.in_daac,
+            "not_in_daac": self.items - self.in_daac,
+            "bbox": self.bbox if self.items else None,
+            "start_datetime": (
+                datetime_to_str(self.start_datetime) if self.start_datetime else None
+            ),
+            "end_datetime": (
+                datetime_to_str(self.end_datetime) if self.end_datetime else None
+            ),
+            "bands": {name: band.to_dict() for name, band in self.bands.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, report: Dict[str, Any]) -> "CollectionSummary":
+        """Summary from a report created by :meth:`to_dict`"""
+        start, end = report["start_datetime"], report["end_datetime"]
+        summary = cls(
+            items=report["items"],
+            in_daac=report["in_daac"],
+            start_datetime=str_to_datetime(start) if start else None,
+            end_datetime=str_to_datetime(end) if end else None,
+            bands={
+                name: BandSummary.from_dict(band)
+                for name, band in report["bands"].items()
+            },
+        )
+        if report["bbox"] is not None:
+            summary.bbox = list(report["bbox"])
+        return summary
+
+
+def iter_item_dicts(href: str) -> Iterator[Dict[str, Any]]:
+    """Stream the items of a ``create-items`` output
+
+    Args:
+        href: Directory of JSON items, ndjson file or stac-geoparquet file (which
+            requires the ``geoparquet`` extra)
+    """
+    fs, path = fsspec.core.url_to_fs(href)
+    if fs.isdir(path):
+        for item_path in sorted(fs.glob(os.path.join(path, "*.json"))):
+            with fs.open(item_path) as f:
+                yield json.load(f)
+    elif path.endswith(".parquet"):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            from stac_geoparquet.arrow import stac_table_to_items
+        except ImportError as error:
+            raise ImportError(
+                "Reading stac-geoparquet requires the geoparquet extra: "
+                "pip install 'stactools-icesat2-boreal[geoparquet]'"
+            ) from error
+
+        with fs.open(path, "rb") as f:
+            parquet_file = pq.ParquetFile(f)
+            reader = pa.RecordBatchReader.from_batches(
+                parquet_file.schema_arrow, parquet_file.iter_batches()
+            )
+            yield from stac_table_to_items(reader)
+    else:
+        with fs.open(path, "r") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def summarize_items(item_dicts: Iterable[Dict[str, Any]]) -> CollectionSummary:
+    """Summarize a stream of STAC item dictionaries"""
+    summary = CollectionSummary()
+    for item_dict in item_dicts:
+        summary.add(item_dict)
+    return summary
+
+
+def summarize_file(href: str) -> CollectionSummary:
+    """Summarize the items of a ``create-items`` output, see :func:`iter_item_dicts`"""
+    return summarize_items(iter_item_dicts(href))
+
+
+def summarize(hrefs: List[str], workers: int = 1) -> CollectionSummary:
+    """Summarize several item outputs, one process per output
+
+    Args:
+        hrefs: Outputs of ``create-items``, see :func:`iter_item_dicts`
+        workers: Number of processes
+    """
+    summary = CollectionSummary()
+    if workers > 1 and len(hrefs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(hrefs))) as executor:
+            partials = list(executor.map(summarize_file, hrefs))
+    else:
+        partials = [summarize_file(href) for href in hrefs]
+
+    for partial in partials:
+        summary.merge(partial)
+    return summary
@@ -0,0 +1,619 @@
+"""Batch STAC item generation for whole tile runs"""
+
+import logging
+import os
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    BrokenExecutor,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+)
+
+import fsspec
+from pystac import Item
+from stactools.core.io import read_text
+
+from stactools.icesat2_boreal.cache import BlockCache
+from stactools.icesat2_boreal.keys import plan_manifest
+from stactools.icesat2_boreal.metrics import IOCounters, stage, track_io
+from stactools.icesat2_boreal.options import ExecutorType, OutputFormat
+from stactools.icesat2_boreal.prefetch import PrefetchedTile, iter_prefetched
+from stactools.icesat2_boreal.stac import create_item
+from stactools.icesat2_boreal.state import (
+    CatalogState,
+    ItemRecord,
+    generator_key,
+    inputs_fingerprint,
+    item_hash,
+)
+from stactools.icesat2_boreal.workqueue import TaskStatus, WorkQueue, is_transient
+from stactools.icesat2_boreal.writers import ItemWriter, open_writer
+
+logger = logging.getLogger(__name__)
+
+
+class TileError(Exception):
+    """An error raised while creating the item of a tile in a worker
+
+    Exceptions cross the process boundary as their ``repr`` and whether they are
+    transient, since not every exception can be unpickled in the parent (e.g.
+    pystac's ``GetSchemaError``), and one that can't breaks the process pool.
+    """
+
+    def __init__(self, message: str, transient: bool = False) -> None:
+        """Wrap the ``repr`` of the original exception"""
+        super().__init__(message, transient)
+        self.message = message
+        self.transient = transient
+
+    def __str__(self) -> str:
+        """The ``repr`` of the original exception"""
+        return self.message
+
+    def __repr__(self) -> str:
+        """The ``repr`` of the original exception"""
+        return self.message
+
+
+@dataclass
+class BatchError:
+    """A tile that could not be turned into an item"""
+
+    cog_key: str
+    parquet_key: str
+    error: str
+
+
+@dataclass
+class BatchResult:
+    """Summary of a batch run"""
+
+    # where each item was written; items in a bulk output share the same file
+    hrefs: List[str] = field(default_factory=list)
+    errors: List[BatchError] = field(default_factory=list)
+    # COG keys of tiles whose items were already up to date
+    skipped: List[str] = field(default_factory=list)
+    # attempts that failed with a transient error and were queued again
+    retried: int = 0
+    # counters and stage timings summed over all tiles, if the run was profiled
+    profile: Optional[IOCounters] = None
+    # asset checksums: bytes read and hashed, summed time of the workers and the
+    # number of checksums taken from S3 without reading the object
+    bytes_hashed: int = 0
+    checksum_seconds: float = 0.0
+    stored_checksums: int = 0
+    # block cache lookups of the workers
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+    @property
+    def ok(self) -> bool:
+        """True if every tile in the batch produced an item"""
+        return not self.errors
+
+    @property
+    def hash_throughput(self) -> Optional[float]:
+        """Bytes hashed per second by each worker, None if nothing was hashed"""
+        if not self.bytes_hashed or not self.checksum_seconds:
+            return None
+        return self.bytes_hashed / self.checksum_seconds
+
+    @property
+    def cache_hit_rate(self) -> Optional[float]:
+        """Fraction of block reads served by the block cache, None if unused"""
+        lookups = self.cache_hits + self.cache_misses
+        return self.cache_hits / lookups if lookups else None
+
+    def add_worker_counters(self, counters: IOCounters) -> None:
+        """Add the checksum and block cache counters of one tile"""
+        self.bytes_hashed += counters.bytes_hashed
+        self.stored_checksums += counters.stored_checksums
+        self.checksum_seconds += counters.stage_seconds.get("checksum", 0.0)
+        self.cache_hits += counters.cache_hits
+        self.cache_misses += counters.cache_misses
+
+
+def parse_manifest(text: str) -> List[Tuple[str, str]]:
+    """Parse a manifest of COG/parquet key pairs
+
+    Each non-empty line holds a COG key and a training data parquet key separated by
+    a comma or whitespace. Lines starting with ``#`` are ignored.
+    """
+    pairs = []
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = line.replace(",", " ").split()
+        if len(parts) != 2:
+            raise ValueError(
+                f"Manifest line {line_number} should contain a COG key and a "
+                f"parquet key, got: {line}"
+            )
+        pairs.append((parts[0], parts[1]))
+
+    return pairs
+
+
+def read_manifest(href: str, latest_only: bool = False) -> List[Tuple[str, str]]:
+    """Read a manifest of COG/parquet key pairs from a local path or URL
+
+    The COG keys are validated before any tile is read, see
+    :func:`stactools.icesat2_boreal.keys.plan_manifest`.
+
+    Args:
+        href: Local path or URL of the manifest
+        latest_only: Keep only the newest run of each tile
+
+    Raises:
+        ValueError: if a line or a COG key is malformed
+    """
+    return plan_manifest(parse_manifest(read_text(href)), latest_only).pairs
+
+
+@dataclass
+class TileResult:
+    """Outcome of creating the item for one tile"""
+
+    cog_key: str
+    parquet_key: str
+    item: Optional[Item] = None
+    error: Optional[BaseException] = None
+    # fingerprint of the source files, see state.inputs_fingerprint
+    inputs: Optional[str] = None
+    # True if the source files had not changed since the previous build
+    skipped: bool = False
+    # counters and stage timings of the worker, if the run was profiled
+    profile: Optional[IOCounters] = None
+
+
+def _create_item_dict(
+    cog_key: str,
+    parquet_key: str,
+    create_item_kwargs: Dict[str, Any],
+    previous_inputs: Optional[str] = None,
+    cog_header: Optional[bytes] = None,
+    parquet_footer: Optional[bytes] = None,
+    profile: bool = False,
+    block_cache: Optional[BlockCache] = None,
+) -> Tuple[
+    Optional[str],
+    Optional[Dict[str, Any]],
+    Optional[Dict[str, Any]],
+    Optional[TileError],
+]:
+    """Create an item and return it as a (picklable) dictionary
+
+    If the fingerprint of the source files matches ``previous_inputs`` the item is
+    not created and None is returned in its place. With ``profile`` the report of
+    the counters and stage timings is returned as well. Errors are returned as a
+    :class:`TileError` rather than raised, so they always reach the parent.
+    """
+    inputs = None
+    item_dict = None
+    tile_error = None
+    with track_io() if profile else nullcontext() as counters:
+        try:
+            if previous_inputs is not None:
+                with stage("fingerprint"):
+                    inputs = inputs_fingerprint(cog_key, parquet_key)
+            if previous_inputs is None or inputs != previous_inputs:
+                item = create_item(
+                    cog_key,
+                    parquet_key,
+                    cog_header=cog_header,
+                    parquet_footer=parquet_footer,
+                    block_cache=block_cache,
+                    **create_item_kwargs,
+                )
+                with stage("serialize"):
+                    item_dict = item.to_dict(include_self_link=False)
+                if counters is not None:
+                    counters.items += 1
+        except Exception as error:
+            tile_error = TileError(repr(error), is_transient(error))
+
+    report = None if counters is None else counters.to_dict()
+    return inputs, item_dict, report, tile_error
+
+
+def _create_executor(executor_type: ExecutorType, workers: int) -> Executor:
+    if executor_type == ExecutorType.PROCESS:
+        return ProcessPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+def iter_items(
+    pairs: Iterable[Tuple[str, str]],
+    workers: Optional[int] = None,
+    executor_type: ExecutorType = ExecutorType.PROCESS,
+    previous_inputs: Optional[Mapping[str, str]] = None,
+    prefetch: bool = False,
+    profile: bool = False,
+    block_cache: Optional[BlockCache] = None,
+    **create_item_kwargs: Any,
+) -> Iterator[TileResult]:
+    """Create items in parallel, yielding them as they finish
+
+    Work is submitted in a bounded window so only a few items per worker are held in
+    memory at once. Failures are yielded rather than raised so one bad tile does not
+    end the batch.
+
+    Args:
+        pairs: (COG key, training data parquet key) pairs
+        workers: Number of workers in the pool, defaults to the number of CPUs
+        executor_type: Use a process pool (CPU bound) or a thread pool (I/O bound)
+        previous_inputs: Source file fingerprints from a previous build, by COG key.
+            Tiles whose sources still match are skipped. When set, the fingerprint
+            of every tile is computed by the workers and returned in the results.
+        prefetch: Fetch the COG headers (and parquet footers, with
+            ``parquet_metadata``) of upcoming tiles concurrently with asyncio and
+            hand them to the workers, so reading the metadata of a tile needs no
+            further round trips
+        profile: Count I/O and time the stages of every tile, see
+            :func:`stactools.icesat2_boreal.metrics.track_io`
+        block_cache: Read the COGs through a local block cache shared by the
+            workers, see :class:`stactools.icesat2_boreal.cache.BlockCache`
+        create_item_kwargs: Options passed to :func:`create_item`, e.g.
+            ``validation`` or ``statistics``
+
+    Yields:
+        TileResult: one result per tile, in completion order
+    """
+    workers = workers or os.cpu_count() or 1
+    pending: Dict[Future, Tuple[str, str]] = {}
+    tiles: Iterator[PrefetchedTile] = (
+        iter_prefetched(
+            pairs,
+            parquet_footers=bool(create_item_kwargs.get("parquet_metadata")),
+        )
+        if prefetch
+        else (PrefetchedTile(cog_key, parquet_key) for cog_key, parquet_key in pairs)
+    )
+
+    # tiles that could not be submitted because the pool is broken
+    broken: List[TileResult] = []
+
+    def submit(executor: Executor, n: int) -> None:
+        for _ in range(n):
+            try:
+                tile = next(tiles)
+            except StopIteration:
+                return
+            try:
+                future = executor.submit(
+                    _create_item_dict,
+                    tile.cog_key,
+                    tile.parquet_key,
+                    create_item_kwargs,
+                    (
+                        None
+                        if previous_inputs is None
+                        else previous_inputs.get(tile.cog_key, "")
+                    ),
+                    tile.cog_header,
+                    tile.parquet_footer,
+                    profile,
+                    block_cache,
+                )
+            except BrokenExecutor as error:
+                # e.g. a worker was killed; fail the tile, not the whole run
+                broken.append(TileResult(tile.cog_key, tile.parquet_key, error=error))
+                continue
+            pending[future] = (tile.cog_key, tile.parquet_key)
+
+    with _create_executor(executor_type, workers) as executor:
+        submit(executor, workers * 2)
+        while pending or broken:
+            done: Set[Future] = set()
+            if pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                cog_key, parquet_key = pending.pop(future)
+                yield _tile_result(cog_key, parquet_key, future)
+            failed = list(broken)
+            broken.clear()
+            yield from failed
+            submit(executor, len(done) + len(failed))
+
+
+def _tile_result(cog_key: str, parquet_key: str, future: Future) -> TileResult:
+    """Unpack the outcome of :func:`_create_item_dict`"""
+    result = TileResult(cog_key=cog_key, parquet_key=parquet_key)
+    try:
+        result.inputs, item_dict, report, result.error = future.result()
+        if report is not None:
+            result.profile = IOCounters.from_dict(report)
+        if result.error is not None:
+            return result
+        if item_dict is None:
+            result.skipped = True
+        else:
+            with stage("deserialize"):
+                result.item = Item.from_dict(item_dict, migrate=False)
+    except Exception as error:
+        result.error = error
+    return result
+
+
+def _item_key(cog_key: str) -> Tuple[str, str]:
+    """(variable, tile ID) for a COG key"""
+    parts = os.path.splitext(os.path.basename(cog_key))[0].split("_")
+    return parts[1], parts[-1]
+
+
+def _remove(href: str) -> None:
+    fs, path = fsspec.core.url_to_fs(href)
+    if fs.exists(path):
+        fs.rm(path)
+
+
+def _item_href(destination: str, item_id: str) -> str:
+    return os.path.join(destination, f"{item_id}.json")
+
+
+def _previous_inputs(
+    pairs: List[Tuple[str, str]],
+    records: Mapping[Tuple[str, str], ItemRecord],
+    generator: str,
+    destination: str,
+) -> Dict[str, str]:
+    """Source fingerprints of tiles that were built by this generator before"""
+    previous_inputs = {}
+    for cog_key, _ in pairs:
+        record = records.get(_item_key(cog_key))
+        item_id = os.path.splitext(os.path.basename(cog_key))[0]
+        if (
+            record is not None
+            and record.generator == generator
+            and record.href == _item_href(destination, item_id)
+        ):
+            previous_inputs[cog_key] = record.inputs
+
+    return previous_inputs
+
+
+def _save_incremental(
+    tile: TileResult,
+    destination: str,
+    generator: str,
+    records: Mapping[Tuple[str, str], ItemRecord],
+    state: CatalogState,
+) -> bool:
+    """Save a rebuilt item unless it is identical to the previous build
+
+    Returns:
+        bool: True if the item was written
+    """
+    item = tile.item
+    href = _item_href(destination, item.id)
+    variable, tile_id = _item_key(tile.cog_key)
+    record = ItemRecord(
+        variable=variable,
+        tile_id=tile_id,
+        item_id=item.id,
+        href=href,
+        inputs=tile.inputs or "",
+        generator=generator,
+        item_hash=item_hash(item.to_dict(include_self_link=False)),
+    )
+    previous = records.get((variable, tile_id))
+    if previous is not None and previous.href != href:
+        logger.info(f"Removing superseded item {previous.href}")
+        _remove(previous.href)
+
+    written = previous is None or (previous.href, previous.item_hash) != (
+        record.href,
+        record.item_hash,
+    )
+    if written:
+        item.save_object(include_self_link=False, dest_href=href)
+    state.put(record)
+
+    return written
+
+
+def _record_item(
+    tile: TileResult,
+    result: BatchResult,
+    writer: ItemWriter,
+    destination: str,
+    generator: str,
+    records: Mapping[Tuple[str, str], ItemRecord],
+    state: Optional[CatalogState],
+) -> Optional[str]:
+    """Write the item of a tile, unless it is up to date
+
+    Returns:
+        Optional[str]: where the item is, None if the tile was skipped
+    """
+    if tile.skipped:
+        result.skipped.append(tile.cog_key)
+        return None
+
+    if state is None:
+        with stage("write"):
+            href = writer.write(tile.item)
+        result.hrefs.append(href)
+        return href
+
+    with stage("write"):
+        written = _save_incremental(tile, destination, generator, records, state)
+    if written:
+        result.hrefs.append(_item_href(destination, tile.item.id))
+    else:
+        result.skipped.append(tile.cog_key)
+    return _item_href(destination, tile.item.id)
+
+
+def _record_error(
+    tile: TileResult, result: BatchResult, queue: Optional[WorkQueue]
+) -> None:
+    """Queue a tile again after a transient error, or record it as failed"""
+    if queue is not None and queue.fail(tile.cog_key, tile.error) == TaskStatus.PENDING:
+        logger.info(f"Retrying {tile.cog_key} after: {tile.error}")
+        result.retried += 1
+        return
+
+    logger.warning(f"Failed to create item for {tile.cog_key}: {tile.error}")
+    result.errors.append(
+        BatchError(
+            cog_key=tile.cog_key,
+            parquet_key=tile.parquet_key,
+            error=repr(tile.error),
+        )
+    )
+
+
+def _iter_rounds(
+    pairs: Iterable[Tuple[str, str]], queue: Optional[WorkQueue]
+) -> Iterator[Iterable[Tuple[str, str]]]:
+    """Tiles to work on, in rounds that each run until no tile is ready
+
+    Without a queue there is a single round of ``pairs``. With a queue, tiles are
+    claimed as the workers take them, and after each round this waits for the
+    tiles that are backing off before a retry.
+    """
+    if queue is None:
+        yield pairs
+        return
+
+    while True:
+        yield ((task.cog_key, task.parquet_key) for task in queue.iter_claims())
+        delay = queue.retry_delay()
+        if delay is None:
+            return
+        if delay > 0:
+            logger.info(f"Waiting {delay:.1f}s to retry tiles")
+            time.sleep(delay)
+
+
+def create_items(
+    pairs: Iterable[Tuple[str, str]],
+    destination: str,
+    workers: Optional[int] = None,
+    executor_type: ExecutorType = ExecutorType.PROCESS,
+    state: Optional[CatalogState] = None,
+    queue: Optional[WorkQueue] = None,
+    output_format: OutputFormat = OutputFormat.JSON,
+    row_group_size: Optional[int] = None,
+    prefetch: bool = False,
+    profile: bool = False,
+    block_cache: Optional[BlockCache] = None,
+    **create_item_kwargs: Any,
+) -> BatchResult:
+    """Create items for many tiles and write them to a directory or bulk file
+
+    Each item is written as soon as it is finished: to
+    ``{destination}/{item_id}.json`` for ``json`` output, or appended to the
+    ``destination`` file for ``ndjson`` and ``geoparquet`` output. Tiles that fail
+    are collected in the returned result.
+
+    With a ``state`` database the build is incremental: a tile is only rebuilt if
+    its COG or parquet file, the generator version or the item options changed
+    since it was last written to the same location. Items that come out identical
+    to the previous build are not rewritten, and items from a superseded run of a
+    tile are removed from the destination.
+
+    With a ``queue`` the run is resumable: ``pairs`` are added to the queue, tiles
+    are claimed from it as workers become free and marked done as their items are
+    written. A run that is interrupted continues with the remaining tiles when it
+    is started again, and tiles that fail with a transient error are retried with
+    backoff. Other processes using the same queue share the work.
+
+    Args:
+        pairs: (COG key, training data parquet key) pairs
+        destination: Directory for the item JSON files, or the HREF of the
+            ndjson or geoparquet file
+        workers: Number of workers in the pool, defaults to the number of CPUs
+        executor_type: Use a process pool (CPU bound) or a thread pool (I/O bound)
+        state: Record of previous builds for incremental runs, only supported
+            for ``json`` output
+        queue: Work queue of the run, see
+            :class:`stactools.icesat2_boreal.workqueue.WorkQueue`. Only supported
+            for ``json`` output
+        output_format: Write one JSON file per item, or a single ndjson or
+            stac-geoparquet file
+        row_group_size: Rows per row group for ``geoparquet`` output
+        prefetch: Prefetch COG headers concurrently, see :func:`iter_items`
+        profile: Sum the I/O counters and stage timings of the workers and of
+            writing the items into ``BatchResult.profile``
+        block_cache: Read the COGs through a local block cache shared by the
+            workers, see :class:`stactools.icesat2_boreal.cache.BlockCache`
+        create_item_kwargs: Options passed to :func:`create_item`, e.g.
+            ``validation`` or ``statistics``
+
+    Returns:
+        BatchResult: hrefs of the written items and per-tile errors
+
+    Raises:
+        ValueError: if ``state`` or ``queue`` is used with a bulk output format
+    """
+    # a bulk file is rewritten from scratch, losing the items of earlier runs
+    if output_format != OutputFormat.JSON and (state is not None or queue is not None):
+        run = "Incremental builds" if state is not None else "Queued runs"
+        raise ValueError(f"{run} are not supported for {output_format} output")
+
+    result = BatchResult()
+    generator = generator_key(create_item_kwargs)
+    records: Dict[Tuple[str, str], ItemRecord] = {}
+    previous_inputs = None
+    if queue is not None:
+        queue.add(pairs)
+        pairs = queue.pairs()
+    if state is not None:
+        pairs = list(pairs)
+        records = state.records()
+        previous_inputs = _previous_inputs(pairs, records, generator, destination)
+
+    with (
+        track_io() if profile else nullcontext() as counters,
+        open_writer(output_format, destination, row_group_size) as writer,
+    ):
+        for tiles in _iter_rounds(pairs, queue):
+            for tile in iter_items(
+                tiles,
+                workers=workers,
+                executor_type=executor_type,
+                previous_inputs=previous_inputs,
+                prefetch=prefetch,
+                # the worker counters also carry the checksum throughput and the
+                # block cache hit rate
+                profile=profile
+                or bool(create_item_kwargs.get("checksums"))
+                or block_cache is not None,
+                block_cache=block_cache,
+                **create_item_kwargs,
+            ):
+                if tile.profile is not None:
+                    result.add_worker_counters(tile.profile)
+                if counters is not None and tile.profile is not None:
+                    counters.merge(tile.profile)
+                if tile.error is not None:
+                    _record_error(tile, result, queue)
+                    continue
+                href = _record_item(
+                    tile, result, writer, destination, generator, records, state
+                )
+                if queue is not None:
+                    queue.complete(tile.cog_key, href)
+
+    result.profile = counters
+    return result
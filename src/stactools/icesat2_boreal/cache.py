@@ -0,0 +1,344 @@
+"""GDAL configuration and on-disk block cache for reading the COGs"""
+
+import hashlib
+import io
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+from itertools import groupby
+from typing import IO, TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import fsspec
+
+from stactools.icesat2_boreal.metrics import count_bytes, count_cache_blocks
+from stactools.icesat2_boreal.options import DEFAULT_BLOCK_CACHE_SIZE
+from stactools.icesat2_boreal.prefetch import DEFAULT_HEADER_SIZE
+
+if TYPE_CHECKING:
+    from rasterio import Env
+
+logger = logging.getLogger(__name__)
+
+# GDAL options for reading COG metadata and overviews from object stores
+GDAL_OPTIONS: Dict[str, Any] = {
+    # the IFDs of every overview level arrive with the first request
+    "GDAL_INGESTED_BYTES_AT_OPEN": DEFAULT_HEADER_SIZE,
+    # don't list the bucket or probe for .aux.xml and .ovr sidecars
+    "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+    "CPL_VSIL_CURL_ALLOWED_EXTENSIONS": ".tif,.TIF,.tiff",
+    # fetch the blocks of a window in as few requests as possible
+    "GDAL_HTTP_MULTIRANGE": "YES",
+    "GDAL_HTTP_MERGE_CONSECUTIVE_RANGES": "YES",
+    # keep recently read ranges in memory while a dataset is open, and across
+    # datasets for the lifetime of the process
+    "VSI_CACHE": "TRUE",
+    "VSI_CACHE_SIZE": 64 * 1024 * 1024,
+    "CPL_VSIL_CURL_CACHE_SIZE": 256 * 1024 * 1024,
+    # retry throttled and failed requests
+    "GDAL_HTTP_MAX_RETRY": 3,
+    "GDAL_HTTP_RETRY_DELAY": 1,
+}
+
+DEFAULT_BLOCK_SIZE = 256 * 1024
+# blocks of the current file kept in memory, so GDAL's many small reads of the
+# same block don't each go to disk
+MEMORY_BLOCKS = 16
+
+# eviction removes the least recently used blocks down to this fraction of the
+# cache size, and each process checks the size after writing this fraction of it
+_EVICT_TO = 0.9
+_CHECK_EVERY = 0.05
+# bytes written by this process since the cache size was last checked, by directory
+_written: Dict[str, int] = {}
+
+
+def gdal_env(**options: Any) -> "Env":
+    """rasterio environment tuned for reading COGs from object stores
+
+    Options set as environment variables take precedence over the tuned values, so
+    any of them can be overridden without code changes.
+
+    Args:
+        options: Additional GDAL configuration options
+    """
+    import rasterio
+
+    config = {k: v for k, v in GDAL_OPTIONS.items() if k not in os.environ}
+    config.update(options)
+    return rasterio.Env(**config)
+
+
+def _runs(indices: List[int]) -> List[List[int]]:
+    """Split sorted block indices into runs of consecutive blocks"""
+    return [
+        [index for _, index in run]
+        for _, run in groupby(enumerate(indices), lambda pair: pair[1] - pair[0])
+    ]
+
+
+class BlockCache:
+    """Fixed size blocks of remote files, cached in a local directory
+
+    The cache can be shared by any number of processes: blocks are written to a
+    temporary file and renamed into place, and blocks that disappear because
+    another process evicted them are read again. When the cache grows past
+    ``max_bytes`` the least recently used blocks are removed. Files are
+    identified by HREF only, so the cached files must not change.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = DEFAULT_BLOCK_CACHE_SIZE,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+    ) -> None:
+        """Use the cache directory at ``path``, creating it if needed
+
+        Args:
+            path: Local cache directory
+            max_bytes: Approximate size limit of the cache
+            block_size: Size of the cached blocks. All processes sharing a cache
+                must use the same block size.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.block_size = block_size
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, href: str, name: str) -> str:
+        key = hashlib.sha256(href.encode()).hexdigest()[:32]
+        return os.path.join(self.path, key[:2], f"{key}.{name}")
+
+    def _read(self, path: str) -> Optional[bytes]:
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            # the modification time orders blocks for eviction
+            os.utime(path)
+        except FileNotFoundError:  # no cov
+            pass
+        return data
+
+    def _write(self, path: str, data: bytes) -> None:
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temporary, path)
+
+        written = _written.get(self.path, 0) + len(data)
+        if written >= self.max_bytes * _CHECK_EVERY:
+            self.evict()
+            written = 0
+        _written[self.path] = written
+
+    def get(self, href: str, index: int) -> Optional[bytes]:
+        """Block ``index`` of a file, None if it is not cached"""
+        return self._read(self._file(href, str(index)))
+
+    def put(self, href: str, index: int, data: bytes) -> None:
+        """Cache block ``index`` of a file"""
+        self._write(self._file(href, str(index)), data)
+
+    def get_size(self, href: str) -> Optional[int]:
+        """Size of a file, None if it is not cached"""
+        data = self._read(self._file(href, "size"))
+        return None if data is None else int(data)
+
+    def put_size(self, href: str, size: int) -> None:
+        """Cache the size of a file"""
+        self._write(self._file(href, "size"), str(size).encode())
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        for directory in os.scandir(self.path):
+            if not directory.is_dir():
+                continue
+            for entry in os.scandir(directory.path):
+                # blocks being written by another process
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def usage(self) -> int:
+        """Bytes used by the cache"""
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self) -> int:
+        """Remove the least recently used blocks if the cache is too large
+
+        Returns:
+            int: bytes removed
+        """
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return 0
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total - removed <= self.max_bytes * _EVICT_TO:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            removed += size
+        logger.debug(f"Evicted {removed} bytes from the block cache in {self.path}")
+        return removed
+
+    def opener(self, href: str, header: Optional[bytes] = None) -> "BlockCacheOpener":
+        """rasterio ``opener`` that reads ``href`` through this cache"""
+        return BlockCacheOpener(href, self, header)
+
+
+class CachedFile(io.RawIOBase):
+    """A read-only remote file whose reads are served from a :class:`BlockCache`
+
+    Reads are rounded out to whole blocks. Missing blocks are fetched from the
+    file, consecutive blocks in a single request, and added to the cache. An
+    optional prefetched header is served from memory.
+    """
+
+    def __init__(
+        self, href: str, cache: BlockCache, header: Optional[bytes] = None
+    ) -> None:
+        """Read ``href`` through ``cache``"""
+        self.href = href
+        self.cache = cache
+        self.header = header or b""
+        self._position = 0
+        self._file: Optional[IO[bytes]] = None
+        self._size: Optional[int] = None
+        self._blocks: "OrderedDict[int, bytes]" = OrderedDict()
+
+    def _underlying(self) -> IO[bytes]:
+        if self._file is None:
+            self._file = fsspec.open(self.href, "rb").open()
+        return self._file
+
+    @property
+    def size(self) -> int:
+        """Size of the file"""
+        if self._size is None:
+            self._size = self.cache.get_size(self.href)
+        if self._size is None:
+            self._size = self._underlying().seek(0, io.SEEK_END)
+            self.cache.put_size(self.href, self._size)
+        return self._size
+
+    def readable(self) -> bool:
+        """The file can be read"""
+        return True
+
+    def seekable(self) -> bool:
+        """The file supports random access"""
+        return True
+
+    def tell(self) -> int:
+        """Current position"""
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        """Move to a new position"""
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self._position = offset
+        return self._position
+
+    def _keep(self, index: int, block: bytes) -> None:
+        self._blocks[index] = block
+        if len(self._blocks) > MEMORY_BLOCKS:
+            self._blocks.popitem(last=False)
+
+    def _read_blocks(self, first: int, last: int) -> Dict[int, bytes]:
+        blocks = {}
+        missing = []
+        hits = 0
+        for index in range(first, last + 1):
+            block = self._blocks.get(index)
+            if block is None:
+                block = self.cache.get(self.href, index)
+                hits += block is not None
+            if block is None:
+                missing.append(index)
+            else:
+                blocks[index] = block
+        count_cache_blocks(hits, len(missing))
+
+        block_size = self.cache.block_size
+        for run in _runs(missing):
+            file = self._underlying()
+            file.seek(run[0] * block_size)
+            data = file.read(len(run) * block_size)
+            count_bytes(len(data))
+            for offset, index in enumerate(run):
+                block = data[offset * block_size : (offset + 1) * block_size]
+                self.cache.put(self.href, index, block)
+                blocks[index] = block
+
+        for index, block in blocks.items():
+            self._keep(index, block)
+        return blocks
+
+    def readinto(self, buffer: bytearray) -> int:  # type: ignore[override]
+        """Read into a buffer, from the header or the cached blocks"""
+        start = self._position
+        end = start + len(buffer)
+        if end <= len(self.header):
+            data = self.header[start:end]
+        else:
+            end = min(end, self.size)
+            if end <= start:
+                return 0
+            block_size = self.cache.block_size
+            first, last = start // block_size, (end - 1) // block_size
+            blocks = self._read_blocks(first, last)
+            offset = start - first * block_size
+            data = b"".join(blocks[i] for i in range(first, last + 1))[
+                offset : offset + end - start
+            ]
+        buffer[: len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def close(self) -> None:
+        """Close the underlying file if it was opened"""
+        if self._file is not None:
+            self._file.close()
+        self._blocks.clear()
+        super().close()
+
+
+class BlockCacheOpener:
+    """A rasterio ``opener`` that serves a COG through a :class:`BlockCache`
+
+    Any other file (e.g. the ``.aux.xml`` and ``.ovr`` sidecars GDAL probes for)
+    is reported as missing, like ``GDAL_DISABLE_READDIR_ON_OPEN=EMPTY_DIR``.
+    """
+
+    def __init__(
+        self, href: str, cache: BlockCache, header: Optional[bytes] = None
+    ) -> None:
+        """Serve ``href`` from ``cache``, and its first bytes from ``header``"""
+        self.href = href
+        self.cache = cache
+        self.header = header
+
+    def __call__(self, path: str, mode: str = "rb") -> CachedFile:
+        """Open the cached file"""
+        if path != self.href:
+            raise FileNotFoundError(path)
+        return CachedFile(self.href, self.cache, self.header)
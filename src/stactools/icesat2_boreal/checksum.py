@@ -0,0 +1,100 @@
+"""File extension size and checksum of the item assets"""
+
+import base64
+import hashlib
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import fsspec
+
+from stactools.icesat2_boreal.metrics import count_hashed_bytes, count_stored_checksum
+
+# multihash prefixes: function code and digest length in bytes
+SHA2_256_MULTIHASH = "1220"
+MD5_MULTIHASH = "d510"
+
+# large reads keep the number of requests to object stores low
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+# the ETag of an object uploaded in one part is the MD5 of its content, the ETag
+# of a multipart upload has a "-<parts>" suffix
+_MD5_ETAG = re.compile(r"[0-9a-f]{32}")
+
+
+@dataclass(frozen=True)
+class FileInfo:
+    """Size and multihash checksum of a file"""
+
+    size: int
+    checksum: str
+
+
+def stored_checksum(info: Dict[str, Any]) -> Optional[str]:
+    """Multihash of a checksum an S3 object already has, if any
+
+    Args:
+        info: Metadata of the object, as returned by ``head_object`` or s3fs
+    """
+    sha256 = info.get("ChecksumSHA256")
+    # composite checksums of multipart uploads are not a hash of the content
+    if sha256 and "-" not in sha256:
+        return SHA2_256_MULTIHASH + base64.b64decode(sha256).hex()
+
+    etag = str(info.get("ETag") or "").strip('"')
+    if _MD5_ETAG.fullmatch(etag):
+        return MD5_MULTIHASH + etag
+
+    return None
+
+
+def _object_info(fs: Any, path: str) -> Dict[str, Any]:
+    if hasattr(fs, "call_s3"):
+        # s3fs only returns the additional checksums when they are asked for
+        bucket, key, _ = fs.split_path(path)
+        response = fs.call_s3(
+            "head_object", Bucket=bucket, Key=key, ChecksumMode="ENABLED"
+        )
+        return {"size": response["ContentLength"], **response}
+    return dict(fs.info(path))
+
+
+def hash_file(href: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> FileInfo:
+    """Stream a file once and compute its size and SHA2-256 multihash
+
+    The next chunk is read in a background thread while the current one is hashed,
+    so reading and hashing overlap (hashlib releases the GIL on large buffers).
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with (
+        fsspec.open(href, "rb", block_size=chunk_size) as f,
+        ThreadPoolExecutor(max_workers=1) as reader,
+    ):
+        pending = reader.submit(f.read, chunk_size)
+        while chunk := pending.result():
+            pending = reader.submit(f.read, chunk_size)
+            digest.update(chunk)
+            size += len(chunk)
+
+    count_hashed_bytes(size)
+    return FileInfo(size=size, checksum=SHA2_256_MULTIHASH + digest.hexdigest())
+
+
+def get_file_info(href: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> FileInfo:
+    """Size and checksum of an asset
+
+    On S3 the object checksum or ETag is used if there is one, so the object is
+    not read. Other files are hashed with :func:`hash_file`.
+    """
+    fs, path = fsspec.core.url_to_fs(href)
+    protocols = (fs.protocol,) if isinstance(fs.protocol, str) else fs.protocol
+    if "s3" in protocols:
+        info = _object_info(fs, path)
+        checksum = stored_checksum(info)
+        if checksum is not None:
+            count_stored_checksum()
+            return FileInfo(size=int(info["size"]), checksum=checksum)
+
+    return hash_file(href, chunk_size)
@@ -1,17 +1,190 @@
 """CLI commands for icesat2-boreal-stac"""
 
+import json
 import logging
+from contextlib import ExitStack, nullcontext
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Optional, TextIO, Tuple
 
 import click
 from click import Command, Group
 
-from stactools.icesat2_boreal import stac
-from stactools.icesat2_boreal.constants import Variable
+from stactools.icesat2_boreal.metrics import IOCounters, track_io
+from stactools.icesat2_boreal.options import (
+    DEFAULT_BLOCK_CACHE_SIZE,
+    DEFAULT_LIST_WORKERS,
+    DEFAULT_MAX_ATTEMPTS,
+    DEFAULT_MOSAIC_RESOLUTION,
+    DEFAULT_OVERVIEW_SIZE,
+    DEFAULT_ROW_GROUP_SIZE,
+    DEFAULT_THUMBNAIL_SIZE,
+    TILE_ID_COLUMN,
+    ExecutorType,
+    GeometryMode,
+    OutputFormat,
+    StatisticsMode,
+    ThumbnailFormat,
+    ValidationMode,
+    Variable,
+)
+
+if TYPE_CHECKING:
+    from stactools.icesat2_boreal.batch import BatchResult
+    from stactools.icesat2_boreal.cache import BlockCache
 
 logger = logging.getLogger(__name__)
 
+validation_option = click.option(
+    "--validation",
+    type=click.Choice([mode.value for mode in ValidationMode]),
+    default=ValidationMode.ALL.value,
+    show_default=True,
+    help="Validate all STAC objects, a deterministic sample of them or none",
+)
+
+
+def statistics_options(f: Callable) -> Callable:
+    """Options that control how COG band statistics are computed"""
+    f = click.option(
+        "--overview-size",
+        type=int,
+        default=DEFAULT_OVERVIEW_SIZE,
+        show_default=True,
+        help="Target size of the overview read in 'overview' statistics mode",
+    )(f)
+    f = click.option(
+        "--statistics",
+        type=click.Choice([mode.value for mode in StatisticsMode]),
+        default=StatisticsMode.EXACT.value,
+        show_default=True,
+        help="Read band statistics from the COG header tags (no pixel reads), the "
+        "smallest overview above --overview-size, or every pixel",
+    )(f)
+    return f
+
+
+def geometry_options(f: Callable) -> Callable:
+    """Options that control where the item geometry comes from"""
+    f = click.option(
+        "--tile-index",
+        default=None,
+        help="Tile index built with build-tile-index (defaults to "
+        "$ICESAT2_BOREAL_TILE_INDEX)",
+    )(f)
+    f = click.option(
+        "--geometry",
+        type=click.Choice([mode.value for mode in GeometryMode]),
+        default=GeometryMode.RASTER.value,
+        show_default=True,
+        help="Derive geometry, bbox and projection from the COG, or look them up "
+        "in the tile index (with --statistics none the COG is not opened)",
+    )(f)
+    return f
+
+
+def thumbnail_options(f: Callable) -> Callable:
+    """Options for the item thumbnails"""
+    f = click.option(
+        "--thumbnail-format",
+        type=click.Choice([f.value for f in ThumbnailFormat]),
+        default=ThumbnailFormat.PNG.value,
+        show_default=True,
+        help="Image format of the thumbnails",
+    )(f)
+    f = click.option(
+        "--thumbnail-size",
+        type=int,
+        default=DEFAULT_THUMBNAIL_SIZE,
+        show_default=True,
+        help="Longest side of the thumbnails in pixels",
+    )(f)
+    f = click.option(
+        "--thumbnails",
+        default=None,
+        help="Directory or URL prefix to write a thumbnail of each COG to, "
+        "rendered from its smallest overview and added as an item asset",
+    )(f)
+    return f
+
+
+def block_cache_options(f: Callable) -> Callable:
+    """Options for the on-disk COG block cache"""
+    f = click.option(
+        "--block-cache-size",
+        type=float,
+        default=DEFAULT_BLOCK_CACHE_SIZE / 1024**3,
+        show_default=True,
+        help="Size limit of the block cache in GB; the least recently used "
+        "blocks are evicted",
+    )(f)
+    f = click.option(
+        "--block-cache",
+        type=click.Path(file_okay=False),
+        default=None,
+        help="Local directory to cache the COG blocks that are read in, shared "
+        "by all workers and runs using the same directory",
+    )(f)
+    return f
+
+
+def open_block_cache(path: Optional[str], size: float) -> Optional["BlockCache"]:
+    """The block cache selected on the command line, if any"""
+    if path is None:
+        return None
+
+    from stactools.icesat2_boreal.cache import BlockCache
+
+    return BlockCache(path, max_bytes=int(size * 1024**3))
 
-def create_icesat2boreal_command(cli: Group) -> Command:
+
+parquet_metadata_option = click.option(
+    "--parquet-metadata",
+    is_flag=True,
+    default=False,
+    help="Add the row count, columns and column ranges of the training data "
+    "parquet file, read from its footer (requires pyarrow)",
+)
+
+checksums_option = click.option(
+    "--checksums",
+    is_flag=True,
+    default=False,
+    help="Add the file size and multihash checksum of the assets, from the S3 "
+    "checksum or ETag where possible and by streaming the file otherwise",
+)
+
+profile_option = click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    help="Print a JSON report of the time spent in each stage, dataset opens, "
+    "bytes read and schema fetches to stderr",
+)
+
+
+def echo_profile(counters: Optional[IOCounters]) -> None:
+    """Print the report of profiled counters to stderr"""
+    if counters is not None:
+        click.echo(json.dumps(counters.to_dict(), indent=2), err=True)
+
+
+def echo_worker_counters(result: "BatchResult") -> None:
+    """Print the block cache and checksum counters of a batch run"""
+    if result.cache_hit_rate is not None:
+        click.echo(
+            f"Block cache: {result.cache_hits} hits, {result.cache_misses} "
+            f"misses ({result.cache_hit_rate:.0%} hit rate)"
+        )
+    if result.stored_checksums:
+        click.echo(f"Used {result.stored_checksums} checksums stored in S3")
+    if result.hash_throughput is not None:
+        click.echo(
+            f"Hashed {result.bytes_hashed / 1e6:.1f} MB at "
+            f"{result.hash_throughput / 1e6:.1f} MB/s per worker"
+        )
+
+
+def create_icesat2boreal_command(cli: Group) -> Command:  # noqa: C901
     """Creates the icesat2-boreal-stac command line utility."""
 
     @cli.group(
@@ -27,22 +200,92 @@ def create_icesat2boreal_command(cli: Group) -> Command:
     )
     @click.argument("variable")
     @click.argument("destination")
-    def create_collection_command(variable: str, destination: str) -> None:
+    @click.option(
+        "--items",
+        "item_sources",
+        multiple=True,
+        help="Output of create-items (JSON directory, ndjson or geoparquet file) "
+        "to compute the extent, band statistics and DAAC coverage from; repeat "
+        "for several outputs",
+    )
+    @click.option(
+        "--workers",
+        type=int,
+        default=1,
+        show_default=True,
+        help="Number of processes summarizing the --items outputs",
+    )
+    @click.option(
+        "--mosaic",
+        default=None,
+        help="Circumpolar mosaic COG written by build-mosaic, added as the "
+        "overview asset with its PNG as the collection thumbnail",
+    )
+    @validation_option
+    @profile_option
+    def create_collection_command(
+        variable: str,
+        destination: str,
+        item_sources: Tuple[str, ...],
+        workers: int,
+        mosaic: Optional[str],
+        validation: str,
+        profile: bool,
+    ) -> None:
         """Creates a STAC Collection
 
         Args:
             destination: An HREF for the Collection JSON
         """
-        collection = stac.create_collection(variable=Variable(variable))
-        collection.set_self_href(destination)
-        collection.save_object()
+        from stactools.icesat2_boreal import stac
+        from stactools.icesat2_boreal.aggregate import summarize
+
+        with track_io() if profile else nullcontext() as counters:
+            summary = summarize(list(item_sources), workers) if item_sources else None
+            collection = stac.create_collection(
+                variable=Variable(variable),
+                validation=ValidationMode(validation),
+                summary=summary,
+                mosaic=mosaic,
+            )
+            collection.set_self_href(destination)
+            collection.save_object()
+        echo_profile(counters)
+        if summary is not None:
+            click.echo(
+                f"Summarized {summary.items} items, {summary.in_daac} of them in "
+                "the DAAC"
+            )
 
     @icesat2boreal.command("create-item", short_help="Create a STAC item")
     @click.argument("cog_source")
     @click.argument("parquet_source")
     @click.argument("destination")
+    @validation_option
+    @statistics_options
+    @parquet_metadata_option
+    @checksums_option
+    @geometry_options
+    @thumbnail_options
+    @block_cache_options
+    @profile_option
     def create_item_command(
-        cog_source: str, parquet_source: str, destination: str
+        cog_source: str,
+        parquet_source: str,
+        destination: str,
+        validation: str,
+        statistics: str,
+        overview_size: int,
+        parquet_metadata: bool,
+        checksums: bool,
+        geometry: str,
+        tile_index: Optional[str],
+        thumbnails: Optional[str],
+        thumbnail_size: int,
+        thumbnail_format: str,
+        block_cache: Optional[str],
+        block_cache_size: float,
+        profile: bool,
     ) -> None:
         """Creates a STAC Item
 
@@ -50,7 +293,406 @@ def create_icesat2boreal_command(cli: Group) -> Command:
             source: HREF of the Asset associated with the Item
             destination: An HREF for the STAC Item
         """
-        item = stac.create_item(cog_source, parquet_source)
-        item.save_object(dest_href=destination)
+        from stactools.icesat2_boreal import stac
+
+        with track_io() if profile else nullcontext() as counters:
+            item = stac.create_item(
+                cog_source,
+                parquet_source,
+                validation=ValidationMode(validation),
+                statistics=StatisticsMode(statistics),
+                overview_size=overview_size,
+                parquet_metadata=parquet_metadata,
+                checksums=checksums,
+                geometry=GeometryMode(geometry),
+                tile_index=tile_index,
+                thumbnails=thumbnails,
+                thumbnail_size=thumbnail_size,
+                thumbnail_format=ThumbnailFormat(thumbnail_format),
+                block_cache=open_block_cache(block_cache, block_cache_size),
+            )
+            item.save_object(dest_href=destination)
+            if counters is not None:
+                counters.items += 1
+        echo_profile(counters)
+
+    @icesat2boreal.command(
+        "create-items", short_help="Create STAC items for a manifest of tiles"
+    )
+    @click.argument("manifest")
+    @click.argument("destination")
+    @click.option(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of parallel workers (defaults to the number of CPUs)",
+    )
+    @click.option(
+        "--executor",
+        type=click.Choice([e.value for e in ExecutorType]),
+        default=ExecutorType.PROCESS.value,
+        show_default=True,
+        help="Use processes (CPU bound) or threads (I/O bound S3 reads)",
+    )
+    @click.option(
+        "--all-runs",
+        is_flag=True,
+        default=False,
+        help="Create items for every run of a tile in the manifest instead of only "
+        "the newest one",
+    )
+    @click.option(
+        "--state",
+        type=click.Path(dir_okay=False),
+        default=None,
+        help="SQLite database of previous builds; only tiles whose sources, "
+        "generator version or options changed are rebuilt",
+    )
+    @click.option(
+        "--queue",
+        type=click.Path(dir_okay=False),
+        default=None,
+        help="SQLite work queue of the run; an interrupted run resumes where it "
+        "stopped and processes sharing the queue split the tiles between them",
+    )
+    @click.option(
+        "--max-attempts",
+        type=int,
+        default=DEFAULT_MAX_ATTEMPTS,
+        show_default=True,
+        help="Attempts per tile for transient S3 errors, with --queue",
+    )
+    @click.option(
+        "--format",
+        "output_format",
+        type=click.Choice([f.value for f in OutputFormat]),
+        default=OutputFormat.JSON.value,
+        show_default=True,
+        help="Write one JSON file per item into DESTINATION, or stream every item "
+        "into a single newline-delimited JSON or stac-geoparquet file",
+    )
+    @click.option(
+        "--row-group-size",
+        type=int,
+        default=DEFAULT_ROW_GROUP_SIZE,
+        show_default=True,
+        help="Rows per parquet row group for geoparquet output",
+    )
+    @click.option(
+        "--prefetch",
+        is_flag=True,
+        default=False,
+        help="Fetch COG headers for hundreds of tiles concurrently ahead of the "
+        "workers, to hide the latency of the small metadata reads",
+    )
+    @validation_option
+    @statistics_options
+    @parquet_metadata_option
+    @checksums_option
+    @geometry_options
+    @thumbnail_options
+    @block_cache_options
+    @profile_option
+    def create_items_command(
+        manifest: str,
+        destination: str,
+        workers: Optional[int],
+        executor: str,
+        all_runs: bool,
+        state: Optional[str],
+        queue: Optional[str],
+        max_attempts: int,
+        output_format: str,
+        row_group_size: int,
+        prefetch: bool,
+        validation: str,
+        statistics: str,
+        overview_size: int,
+        parquet_metadata: bool,
+        checksums: bool,
+        geometry: str,
+        tile_index: Optional[str],
+        thumbnails: Optional[str],
+        thumbnail_size: int,
+        thumbnail_format: str,
+        block_cache: Optional[str],
+        block_cache_size: float,
+        profile: bool,
+    ) -> None:
+        """Creates STAC Items for every COG/parquet pair in a manifest
+
+        Args:
+            manifest: HREF of a file with one COG key and parquet key per line
+            destination: Directory for the STAC Item JSON files, or the HREF of
+                the ndjson or geoparquet file
+        """
+        if state and output_format != OutputFormat.JSON:
+            raise click.UsageError("--state is only supported with --format json")
+        if queue and output_format != OutputFormat.JSON:
+            raise click.UsageError("--queue is only supported with --format json")
+
+        from stactools.icesat2_boreal import batch
+        from stactools.icesat2_boreal.state import CatalogState
+        from stactools.icesat2_boreal.workqueue import WorkQueue
+
+        with ExitStack() as stack:
+            catalog_state = stack.enter_context(CatalogState(state)) if state else None
+            work_queue = (
+                stack.enter_context(WorkQueue(queue, max_attempts=max_attempts))
+                if queue
+                else None
+            )
+            result = batch.create_items(
+                batch.read_manifest(manifest, latest_only=not all_runs),
+                destination,
+                workers=workers,
+                executor_type=ExecutorType(executor),
+                state=catalog_state,
+                queue=work_queue,
+                output_format=OutputFormat(output_format),
+                row_group_size=row_group_size,
+                prefetch=prefetch,
+                profile=profile,
+                block_cache=open_block_cache(block_cache, block_cache_size),
+                validation=ValidationMode(validation),
+                statistics=StatisticsMode(statistics),
+                overview_size=overview_size,
+                parquet_metadata=parquet_metadata,
+                checksums=checksums,
+                geometry=GeometryMode(geometry),
+                tile_index=tile_index,
+                thumbnails=thumbnails,
+                thumbnail_size=thumbnail_size,
+                thumbnail_format=ThumbnailFormat(thumbnail_format),
+            )
+            counts = work_queue.counts() if work_queue is not None else None
+        echo_profile(result.profile)
+        click.echo(f"Created {len(result.hrefs)} items in {destination}")
+        if result.skipped:
+            click.echo(f"Skipped {len(result.skipped)} up-to-date items")
+        if result.retried:
+            click.echo(f"Retried {result.retried} tiles after transient errors")
+        if counts is not None:
+            click.echo(
+                "Queue: " + ", ".join(f"{n} {status}" for status, n in counts.items())
+            )
+        echo_worker_counters(result)
+        if not result.ok:
+            click.echo(f"Failed to create {len(result.errors)} items:", err=True)
+            for error in result.errors:
+                click.echo(f"  {error.cog_key}: {error.error}", err=True)
+            raise click.exceptions.Exit(1)
+
+    @icesat2boreal.command(
+        "discover",
+        short_help="Find COG/parquet pairs under a prefix and write a manifest",
+    )
+    @click.argument("prefix")
+    @click.argument("manifest", type=click.File("w"))
+    @click.option(
+        "--all-runs",
+        is_flag=True,
+        default=False,
+        help="Keep every run of a tile instead of only the newest one",
+    )
+    @click.option(
+        "--workers",
+        type=int,
+        default=DEFAULT_LIST_WORKERS,
+        show_default=True,
+        help="Number of concurrent directory listings",
+    )
+    def discover_command(
+        prefix: str, manifest: TextIO, all_runs: bool, workers: int
+    ) -> None:
+        """Lists a run's output tree and writes a create-items manifest
+
+        Args:
+            prefix: Local directory or URL of the run output
+            manifest: Path of the manifest to write
+        """
+        from stactools.icesat2_boreal import discovery
+
+        result = discovery.discover_assets(
+            prefix, latest_only=not all_runs, workers=workers
+        )
+        for cog_key, parquet_key in result.pairs():
+            manifest.write(f"{cog_key} {parquet_key}\n")
+
+        click.echo(f"Found {len(result.groups)} complete asset groups")
+        if result.superseded:
+            click.echo(f"Skipped {len(result.superseded)} superseded runs")
+        if result.incomplete:
+            click.echo(
+                f"Found {len(result.incomplete)} incomplete asset groups:", err=True
+            )
+            for group in result.incomplete:
+                click.echo(
+                    f"  {group.item_id}: missing {', '.join(sorted(group.missing))}",
+                    err=True,
+                )
+
+    @icesat2boreal.command(
+        "build-mosaic",
+        short_help="Build a low resolution circumpolar mosaic of a run",
+    )
+    @click.argument("manifest")
+    @click.argument("destination")
+    @click.option(
+        "--resolution",
+        type=float,
+        default=DEFAULT_MOSAIC_RESOLUTION,
+        show_default=True,
+        help="Pixel size of the mosaic in meters",
+    )
+    @click.option(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of parallel workers (defaults to the number of CPUs)",
+    )
+    @click.option(
+        "--executor",
+        type=click.Choice([e.value for e in ExecutorType]),
+        default=ExecutorType.THREAD.value,
+        show_default=True,
+        help="Use threads (I/O bound S3 reads) or processes",
+    )
+    def build_mosaic_command(
+        manifest: str,
+        destination: str,
+        resolution: float,
+        workers: Optional[int],
+        executor: str,
+    ) -> None:
+        """Composites the coarsest overview of every tile into a polar mosaic
+
+        Writes a COG and a PNG rendered with the variable's default colormap,
+        which create-collection --mosaic adds to the collection.
+
+        Args:
+            manifest: Manifest of COG/parquet key pairs, as for create-items
+            destination: Local directory or URL prefix of the mosaic files
+        """
+        from stactools.icesat2_boreal.batch import read_manifest
+        from stactools.icesat2_boreal.mosaic import MosaicGrid, build_mosaic
+
+        cog_keys = [cog_key for cog_key, _ in read_manifest(manifest, latest_only=True)]
+        result = build_mosaic(
+            cog_keys,
+            destination,
+            grid=MosaicGrid(resolution=resolution),
+            workers=workers,
+            executor_type=ExecutorType(executor),
+        )
+        click.echo(f"Wrote {result.cog_href} and {result.png_href}")
+        if result.errors:
+            click.echo(f"{len(result.errors)} tiles failed:", err=True)
+            for cog_key, error in result.errors:
+                click.echo(f"  {cog_key}: {error}", err=True)
+
+    @icesat2boreal.command(
+        "build-mosaicjson",
+        short_help="Index the item COGs by quadkey for dynamic tiling",
+    )
+    @click.argument("destination")
+    @click.option(
+        "--items",
+        "item_sources",
+        multiple=True,
+        required=True,
+        help="Output of create-items (JSON directory, ndjson or geoparquet file); "
+        "repeat for several outputs",
+    )
+    @click.option(
+        "--update",
+        is_flag=True,
+        default=False,
+        help="Add the items to the existing index at DESTINATION; newer runs of a "
+        "tile replace older ones",
+    )
+    @click.option(
+        "--quadkey-zoom",
+        type=int,
+        default=None,
+        help="Zoom level of the quadkeys (defaults to the minimum zoom of the "
+        "renders; ignored with --update)",
+    )
+    def build_mosaicjson_command(
+        destination: str,
+        item_sources: Tuple[str, ...],
+        update: bool,
+        quadkey_zoom: Optional[int],
+    ) -> None:
+        """Writes a MosaicJSON quadkey to COG HREF index of the items
+
+        Args:
+            destination: Local path or URL of the MosaicJSON document
+        """
+        from stactools.icesat2_boreal.aggregate import iter_item_dicts
+        from stactools.icesat2_boreal.mosaicjson import MosaicIndex
+
+        if update:
+            index = MosaicIndex.load(destination)
+        elif quadkey_zoom is not None:
+            index = MosaicIndex(quadkey_zoom=quadkey_zoom)
+        else:
+            index = MosaicIndex()
+        added = sum(index.add_items(iter_item_dicts(href)) for href in item_sources)
+        index.save(destination)
+        click.echo(f"Indexed {added} items, {len(index.tiles)} quadkeys")
+
+    @icesat2boreal.command(
+        "build-tile-index",
+        short_help="Compile the tiles GeoPackage into a tile geometry index",
+    )
+    @click.option(
+        "--gpkg",
+        default=None,
+        help="HREF of the tiles GeoPackage (defaults to the boreal tiles "
+        "GeoPackage in the MAAP data store)",
+    )
+    @click.option(
+        "--tile-id-column",
+        default=TILE_ID_COLUMN,
+        show_default=True,
+        help="Attribute of the tile features that holds the tile number",
+    )
+    @click.argument("destination")
+    def build_tile_index_command(
+        gpkg: Optional[str], tile_id_column: str, destination: str
+    ) -> None:
+        """Builds the tile index used by --geometry index
+
+        Args:
+            destination: Path of the index
+        """
+        from stactools.icesat2_boreal.constants import TILE_GPKG_HREF
+        from stactools.icesat2_boreal.tiles import build_tile_index
+
+        path = build_tile_index(gpkg or TILE_GPKG_HREF, destination, tile_id_column)
+        click.echo(f"Wrote the tile index to {path}")
+
+    @icesat2boreal.command(
+        "prewarm-schemas",
+        short_help="Download the STAC JSON schemas into the local cache",
+    )
+    @click.option(
+        "--cache-dir",
+        type=click.Path(file_okay=False, path_type=Path),
+        default=None,
+        help="Cache directory (defaults to $ICESAT2_BOREAL_SCHEMA_CACHE or "
+        "~/.cache/stactools-icesat2-boreal/schemas)",
+    )
+    def prewarm_schemas_command(cache_dir: Optional[Path]) -> None:
+        """Downloads the STAC core and extension schemas used by this package
+
+        Copy the cache directory to nodes without network access and point
+        ICESAT2_BOREAL_SCHEMA_CACHE at it to validate offline.
+        """
+        from stactools.icesat2_boreal.validation import prewarm_schemas
+
+        uris = prewarm_schemas(cache_dir)
+        click.echo(f"Cached {len(uris)} schemas")
 
     return icesat2boreal
@@ -14,13 +14,9 @@ from pystac import (
     Summaries,
 )
 from pystac.extensions.render import Render
+from rio_stac.stac import PROJECTION_EXT_VERSION
 
-
-class Variable(StrEnum):
-    """Enumeration of the different variables"""
-
-    AGB = "agb"
-    HT = "ht"
+from stactools.icesat2_boreal.options import Variable
 
 
 class AssetType(StrEnum):
@@ -51,6 +47,14 @@ class AssetType(StrEnum):
 VERSION = "v3.1"
 COLLECTION_ID_FORMAT = "icesat2-boreal-{version}-{variable}"
 
+PROCESSING_EXTENSION_SCHEMA = (
+    "https://stac-extensions.github.io/processing/v1.2.0/schema.json"
+)
+# the projection extension version used by rio_stac
+PROJECTION_EXTENSION_SCHEMA = (
+    f"https://stac-extensions.github.io/projection/{PROJECTION_EXT_VERSION}/schema.json"
+)
+
 
 RESOLUTION = 30
 BBOX = [-180, 51.6, 180, 78]
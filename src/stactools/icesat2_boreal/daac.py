@@ -0,0 +1,53 @@
+"""Lookup of the tiles that are distributed by the DAAC"""
+
+import importlib.resources as pkg_resources
+import json
+from functools import cache
+from typing import FrozenSet, Iterable
+
+import numpy as np
+import numpy.typing as npt
+
+
+@cache
+def daac_tiles() -> FrozenSet[str]:
+    """Set of the tile IDs that are included in the DAAC distribution
+
+    The packaged list is parsed once per process.
+    """
+    with (
+        pkg_resources.files("stactools.icesat2_boreal")
+        .joinpath("daac-tiles.json")
+        .open("r") as f
+    ):
+        return frozenset(json.load(f))
+
+
+@cache
+def _daac_tile_index() -> npt.NDArray[np.int64]:
+    """Sorted integer index of the DAAC tile IDs"""
+    return np.sort(np.fromiter((int(t) for t in daac_tiles()), dtype=np.int64))
+
+
+def in_daac(tile_id: str) -> bool:
+    """Check whether a tile is included in the DAAC distribution"""
+    return tile_id in daac_tiles()
+
+
+def classify_tiles(tile_ids: Iterable[str]) -> npt.NDArray[np.bool_]:
+    """Check DAAC membership for many tiles at once
+
+    Args:
+        tile_ids: Zero-padded tile IDs, e.g. ``"0000004"``
+
+    Returns:
+        Boolean array with one entry per tile ID, True for tiles in the DAAC
+
+    Raises:
+        ValueError: if a tile ID is not numeric
+    """
+    ids = np.asarray(list(tile_ids), dtype=np.str_)
+    if ids.size == 0:
+        return np.zeros(0, dtype=np.bool_)
+
+    return np.isin(ids.astype(np.int64), _daac_tile_index())
@@ -0,0 +1,189 @@
+"""Discovery of COG and training data parquet assets in a run's output tree"""
+
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import fsspec
+from fsspec import AbstractFileSystem
+
+from stactools.icesat2_boreal.constants import AssetType
+from stactools.icesat2_boreal.options import DEFAULT_LIST_WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class AssetGroup:
+    """The asset files that make up one item"""
+
+    item_id: str
+    hrefs: Dict[AssetType, str] = field(default_factory=dict)
+
+    @property
+    def complete(self) -> bool:
+        """True if every required asset was found"""
+        return set(self.hrefs) == AssetType.required_assets()
+
+    @property
+    def missing(self) -> Set[str]:
+        """Required asset types that were not found"""
+        return AssetType.required_assets() - set(self.hrefs)
+
+    @property
+    def variable(self) -> str:
+        """Variable part of the item ID, e.g. ``agb``"""
+        return self.item_id.split("_")[1]
+
+    @property
+    def tile_id(self) -> str:
+        """Tile ID part of the item ID, e.g. ``0000004``"""
+        return self.item_id.split("_")[-1]
+
+    @property
+    def created(self) -> str:
+        """Run timestamp part of the item ID, sortable as a string"""
+        return self.item_id.split("_")[3]
+
+
+@dataclass
+class DiscoveryResult:
+    """Asset groups found under a prefix"""
+
+    groups: List[AssetGroup] = field(default_factory=list)
+    incomplete: List[AssetGroup] = field(default_factory=list)
+    # complete groups that were replaced by a newer run of the same tile
+    superseded: List[AssetGroup] = field(default_factory=list)
+
+    def pairs(self) -> List[Tuple[str, str]]:
+        """(COG key, parquet key) pairs for the batch item generation"""
+        return [
+            (group.hrefs[AssetType.COG], group.hrefs[AssetType.TRAINING_DATA_PARQUET])
+            for group in self.groups
+        ]
+
+
+def match_asset(filename: str) -> Optional[Tuple[AssetType, str]]:
+    """Find the asset type and item ID of a file name
+
+    Returns:
+        (asset type, item ID), or None if the file is not an item asset
+    """
+    for asset_type in AssetType:
+        if asset_type.matches_file(filename):
+            item_id = filename[: -len(asset_type.get_file_pattern())]
+            if item_id.startswith("boreal_") and len(item_id.split("_")) == 5:
+                return asset_type, item_id
+    return None
+
+
+def list_files(
+    prefix: str,
+    workers: int = DEFAULT_LIST_WORKERS,
+    fs: Optional[AbstractFileSystem] = None,
+) -> Iterator[str]:
+    """List every file below a prefix, listing sub-prefixes concurrently
+
+    Each directory level is listed with a delimiter, so the deep
+    ``YYYY/MM/DD/HH/MM/SS/<job>`` run layout is walked breadth first with up to
+    ``workers`` listings in flight instead of one long serial listing.
+
+    Yields:
+        Full URLs (with protocol) of the files, in no particular order
+    """
+    if fs is None:
+        fs, root = fsspec.core.url_to_fs(prefix)
+    else:
+        root = prefix
+    protocol = fs.protocol if isinstance(fs.protocol, str) else fs.protocol[0]
+
+    def unstrip(path: str) -> str:
+        return path if protocol in ("file", "local") else f"{protocol}://{path}"
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending: Set[Future] = {executor.submit(fs.ls, root, detail=True)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for entry in future.result():
+                    if entry["type"] == "directory":
+                        pending.add(executor.submit(fs.ls, entry["name"], detail=True))
+                    else:
+                        yield unstrip(entry["name"])
+
+
+def iter_asset_groups(
+    hrefs: Iterable[str], incomplete: Optional[List[AssetGroup]] = None
+) -> Iterator[AssetGroup]:
+    """Group asset files by item ID, yielding each group as soon as it is complete
+
+    Args:
+        hrefs: File hrefs, in any order
+        incomplete: If given, groups that are still missing assets once all hrefs
+            have been consumed are appended to this list
+    """
+    groups: Dict[str, AssetGroup] = {}
+    for href in hrefs:
+        match = match_asset(os.path.basename(href))
+        if match is None:
+            continue
+        asset_type, item_id = match
+        group = groups.setdefault(item_id, AssetGroup(item_id=item_id))
+        if asset_type in group.hrefs:
+            logger.warning(
+                f"Duplicate {asset_type} asset for {item_id}: {href} and "
+                f"{group.hrefs[asset_type]}"
+            )
+            continue
+        group.hrefs[asset_type] = href
+        if group.complete:
+            yield groups.pop(item_id)
+
+    if incomplete is not None:
+        incomplete.extend(groups.values())
+
+
+def discover_assets(
+    prefix: str,
+    latest_only: bool = True,
+    workers: int = DEFAULT_LIST_WORKERS,
+) -> DiscoveryResult:
+    """Find complete asset groups below a prefix
+
+    Args:
+        prefix: Local directory or URL (e.g. ``s3://bucket/dps_output/...``)
+        latest_only: Keep only the newest run (by the created timestamp in the
+            item ID) of each tile
+        workers: Number of concurrent listings
+
+    Returns:
+        DiscoveryResult: complete groups, incomplete groups and superseded runs
+    """
+    result = DiscoveryResult()
+    latest: Dict[Tuple[str, str], AssetGroup] = {}
+    for group in iter_asset_groups(
+        list_files(prefix, workers=workers), result.incomplete
+    ):
+        if not latest_only:
+            result.groups.append(group)
+            continue
+        key = (group.variable, group.tile_id)
+        previous = latest.get(key)
+        if previous is None or group.created > previous.created:
+            latest[key] = group
+            if previous is not None:
+                result.superseded.append(previous)
+        else:
+            result.superseded.append(group)
+
+    if latest_only:
+        result.groups = list(latest.values())
+    result.groups.sort(key=lambda group: group.item_id)
+    for group in result.incomplete:
+        logger.warning(
+            f"Incomplete asset group {group.item_id}: missing {group.missing}"
+        )
+
+    return result
@@ -0,0 +1,197 @@
+"""Parsing and validation of the COG keys of a run
+
+Item names are parsed with one compiled regular expression, and whole manifests in
+a single pass of it over the joined file names, so a manifest of a few hundred
+thousand keys is checked in about a second, before any file is opened.
+"""
+
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Sequence, Tuple
+
+from stactools.icesat2_boreal.options import Variable
+
+logger = logging.getLogger(__name__)
+
+_VARIABLES = "|".join(re.escape(variable.value) for variable in Variable)
+# boreal_{variable}_{year}_{run ID}_{tile ID}, where the run ID is a timestamp that
+# starts with the date of the run and the tile ID is the zero padded tile number
+ITEM_ID_PATTERN = (
+    rf"(?P<item_id>boreal_(?P<variable>{_VARIABLES})_(?P<year>\d{{4}})"
+    r"_(?P<run_id>\d{8,})_(?P<tile_id>\d{7}))"
+)
+_ITEM_ID = re.compile(ITEM_ID_PATTERN)
+# one file name per line: the item ID and an optional extension
+_FILE_NAMES = re.compile(rf"^{ITEM_ID_PATTERN}(?:\.[^\n.]+)?$", re.MULTILINE)
+
+# invalid keys listed in the error message of a manifest
+MAX_REPORTED_KEYS = 10
+
+
+@dataclass(frozen=True)
+class ItemName:
+    """The parts of an item ID, e.g. ``boreal_agb_2020_202411251732556086_0000004``"""
+
+    item_id: str
+    variable: Variable
+    year: int
+    # run timestamp, the first eight digits are the creation date
+    run_id: str
+    tile_id: str
+
+    @classmethod
+    def from_key(cls, cog_key: str) -> "ItemName":
+        """Parse the item ID from the file name of a COG
+
+        Raises:
+            ValueError: if the file name is not a valid item ID
+        """
+        item_id = os.path.splitext(os.path.basename(cog_key))[0]
+        match = _ITEM_ID.fullmatch(item_id)
+        if match is None:
+            raise ValueError(
+                f"Invalid item key {cog_key}: expected "
+                "boreal_<variable>_<year>_<run ID>_<7 digit tile ID>"
+            )
+        return cls(
+            item_id=match["item_id"],
+            variable=Variable(match["variable"]),
+            year=int(match["year"]),
+            run_id=match["run_id"],
+            tile_id=match["tile_id"],
+        )
+
+
+def _invalid_date(date: str) -> bool:
+    try:
+        datetime.strptime(date, "%Y%m%d")
+    except ValueError:
+        return True
+    return False
+
+
+def _describe(keys: Sequence[str], invalid: List[str], reason: str) -> str:
+    listed = "\n".join(f"  {key}" for key in invalid[:MAX_REPORTED_KEYS])
+    more = len(invalid) - MAX_REPORTED_KEYS
+    suffix = f"\n  ... and {more} more" if more > 0 else ""
+    return f"{len(invalid)} of {len(keys)} keys {reason}:\n{listed}{suffix}"
+
+
+@dataclass
+class ParsedKeys:
+    """The item names of many keys, one list per part of the item ID"""
+
+    item_ids: List[str] = field(default_factory=list)
+    variables: List[str] = field(default_factory=list)
+    years: List[str] = field(default_factory=list)
+    run_ids: List[str] = field(default_factory=list)
+    tile_ids: List[str] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        """Number of keys"""
+        return len(self.item_ids)
+
+    def name(self, index: int) -> ItemName:
+        """Item name of one key"""
+        return ItemName(
+            item_id=self.item_ids[index],
+            variable=Variable(self.variables[index]),
+            year=int(self.years[index]),
+            run_id=self.run_ids[index],
+            tile_id=self.tile_ids[index],
+        )
+
+
+def parse_keys(cog_keys: Sequence[str]) -> ParsedKeys:
+    """Parse the item names of many COG keys at once
+
+    The file names are joined and matched in one pass of the compiled pattern,
+    and the run dates are checked once per distinct date.
+
+    Raises:
+        ValueError: listing the keys that are not valid item IDs (unknown variable,
+            malformed year, run ID or tile ID) or whose run date does not exist
+    """
+    file_names = [key.rpartition("/")[2] for key in cog_keys]
+    matches = _FILE_NAMES.findall("\n".join(file_names))
+    if len(matches) != len(cog_keys) or any("\n" in key for key in cog_keys):
+        # only a failed manifest pays for matching the keys one by one
+        invalid = [
+            key
+            for key, file_name in zip(cog_keys, file_names, strict=True)
+            if "\n" in key or _FILE_NAMES.fullmatch(file_name) is None
+        ]
+        raise ValueError(
+            _describe(
+                cog_keys,
+                invalid,
+                "are not boreal_<variable>_<year>_<run ID>_<7 digit tile ID> "
+                f"with a variable of {', '.join(Variable)}",
+            )
+        )
+
+    parsed = ParsedKeys(*(list(column) for column in zip(*matches, strict=True)))
+    invalid_dates = {
+        date
+        for date in {run_id[:8] for run_id in parsed.run_ids}
+        if _invalid_date(date)
+    }
+    if invalid_dates:
+        raise ValueError(
+            _describe(
+                cog_keys,
+                [
+                    key
+                    for key, run_id in zip(cog_keys, parsed.run_ids, strict=True)
+                    if run_id[:8] in invalid_dates
+                ],
+                "have a run ID that does not start with a valid date",
+            )
+        )
+    return parsed
+
+
+@dataclass
+class ManifestPlan:
+    """The tiles of a manifest, checked before any item is created"""
+
+    pairs: List[Tuple[str, str]] = field(default_factory=list)
+    # pairs replaced by a newer run of the same tile
+    superseded: List[Tuple[str, str]] = field(default_factory=list)
+
+
+def plan_manifest(
+    pairs: Sequence[Tuple[str, str]], latest_only: bool = True
+) -> ManifestPlan:
+    """Validate the COG keys of a manifest and keep the latest run of each tile
+
+    Args:
+        pairs: (COG key, training data parquet key) pairs
+        latest_only: Keep only the newest run (by run ID) of each variable and
+            tile, as ``discover`` does
+
+    Raises:
+        ValueError: if any COG key is invalid, see :func:`parse_keys`
+    """
+    parsed = parse_keys([cog_key for cog_key, _ in pairs])
+    if not latest_only:
+        return ManifestPlan(list(pairs))
+
+    # run IDs are compared as numbers: by length, then as strings
+    latest: Dict[Tuple[str, str], Tuple[int, str, int]] = {}
+    for index, tile in enumerate(zip(parsed.variables, parsed.tile_ids, strict=True)):
+        run_id = parsed.run_ids[index]
+        run = (len(run_id), run_id, index)
+        if run > latest.get(tile, (0, "", -1)):
+            latest[tile] = run
+
+    kept = {index for _, _, index in latest.values()}
+    plan = ManifestPlan()
+    for index, pair in enumerate(pairs):
+        (plan.pairs if index in kept else plan.superseded).append(pair)
+    if plan.superseded:
+        logger.info(f"Skipped {len(plan.superseded)} superseded runs")
+    return plan
@@ -0,0 +1,196 @@
+"""I/O counters and stage timers for STAC metadata generation"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, Optional
+
+if TYPE_CHECKING:
+    from rasterio.io import DatasetReader
+
+
+@dataclass
+class IOCounters:
+    """Counts of the I/O operations and time spent per stage creating STAC objects"""
+
+    dataset_opens: int = 0
+    # bytes read by this package's own readers: prefetched ranges, reads past a
+    # prefetched header and parquet footers. Reads made by GDAL are not included.
+    bytes_read: int = 0
+    # schemas downloaded because they were in neither the memory nor disk cache
+    schema_fetches: int = 0
+    # bytes read to compute asset checksums, and checksums taken from S3 instead
+    bytes_hashed: int = 0
+    stored_checksums: int = 0
+    # blocks found in and missing from the on-disk block cache
+    cache_hits: int = 0
+    cache_misses: int = 0
+    items: int = 0
+    stage_calls: Dict[str, int] = field(default_factory=dict)
+    stage_seconds: Dict[str, float] = field(default_factory=dict)
+
+    def add_stage(self, name: str, seconds: float, calls: int = 1) -> None:
+        """Record time spent in a stage"""
+        self.stage_calls[name] = self.stage_calls.get(name, 0) + calls
+        self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+
+    def merge(self, other: "IOCounters") -> None:
+        """Add the counts and timings of another set of counters to this one"""
+        self.dataset_opens += other.dataset_opens
+        self.bytes_read += other.bytes_read
+        self.schema_fetches += other.schema_fetches
+        self.bytes_hashed += other.bytes_hashed
+        self.stored_checksums += other.stored_checksums
+        self.cache_hits += other.cache_hits
+        self.cache_misses += other.cache_misses
+        self.items += other.items
+        for name, seconds in other.stage_seconds.items():
+            self.add_stage(name, seconds, other.stage_calls[name])
+
+    @property
+    def cache_hit_rate(self) -> Optional[float]:
+        """Fraction of block reads served by the block cache, None if unused"""
+        lookups = self.cache_hits + self.cache_misses
+        return self.cache_hits / lookups if lookups else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Structured report, e.g. for JSON output
+
+        Stages are sorted by total time, slowest first.
+        """
+        stages = sorted(self.stage_seconds.items(), key=lambda s: s[1], reverse=True)
+        return {
+            "items": self.items,
+            "dataset_opens": self.dataset_opens,
+            "bytes_read": self.bytes_read,
+            "schema_fetches": self.schema_fetches,
+            "bytes_hashed": self.bytes_hashed,
+            "stored_checksums": self.stored_checksums,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_hit_rate": self.cache_hit_rate,
+            "stages": {
+                name: {
+                    "calls": self.stage_calls[name],
+                    "seconds": seconds,
+                    "mean_seconds": seconds / self.stage_calls[name],
+                }
+                for name, seconds in stages
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, report: Dict[str, Any]) -> "IOCounters":
+        """Counters from a report created by :meth:`to_dict`"""
+        counters = cls(
+            dataset_opens=report["dataset_opens"],
+            bytes_read=report["bytes_read"],
+            schema_fetches=report["schema_fetches"],
+            bytes_hashed=report["bytes_hashed"],
+            stored_checksums=report["stored_checksums"],
+            cache_hits=report["cache_hits"],
+            cache_misses=report["cache_misses"],
+            items=report["items"],
+        )
+        for name, stage in report["stages"].items():
+            counters.add_stage(name, stage["seconds"], stage["calls"])
+        return counters
+
+
+_io_counters: ContextVar[Optional[IOCounters]] = ContextVar("io_counters", default=None)
+
+
+@contextmanager
+def track_io() -> Iterator[IOCounters]:
+    """Count I/O operations and time the stages performed in this context
+
+    Counters are tracked per context, so items created concurrently in different
+    threads are counted separately. Outside of this context the counters and
+    timers are disabled and cost a context variable lookup.
+
+    Example:
+        >>> with track_io() as counters:
+        ...     item = create_item(cog_key, parquet_key)
+        >>> counters.dataset_opens
+        1
+        >>> counters.to_dict()["stages"]["statistics"]["seconds"]
+        0.0123
+    """
+    counters = IOCounters()
+    token = _io_counters.set(counters)
+    try:
+        yield counters
+    finally:
+        _io_counters.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a stage of item or collection creation, if tracking is enabled"""
+    counters = _io_counters.get()
+    if counters is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        counters.add_stage(name, time.perf_counter() - start)
+
+
+def count_bytes(n: int) -> None:
+    """Record bytes read, if tracking is enabled"""
+    counters = _io_counters.get()
+    if counters is not None:
+        counters.bytes_read += n
+
+
+def count_hashed_bytes(n: int) -> None:
+    """Record bytes read to compute a checksum, if tracking is enabled"""
+    counters = _io_counters.get()
+    if counters is not None:
+        counters.bytes_hashed += n
+
+
+def count_stored_checksum() -> None:
+    """Record a checksum taken from the object store, if tracking is enabled"""
+    counters = _io_counters.get()
+    if counters is not None:
+        counters.stored_checksums += 1
+
+
+def count_cache_blocks(hits: int, misses: int) -> None:
+    """Record block cache lookups, if tracking is enabled"""
+    counters = _io_counters.get()
+    if counters is not None:
+        counters.cache_hits += hits
+        counters.cache_misses += misses
+
+
+def count_schema_fetch() -> None:
+    """Record a schema download, if tracking is enabled"""
+    counters = _io_counters.get()
+    if counters is not None:
+        counters.schema_fetches += 1
+
+
+def open_dataset(
+    href: str, opener: Optional[Callable[..., Any]] = None
+) -> "DatasetReader":
+    """Open a raster dataset, recording the open in the active counters
+
+    Args:
+        href: HREF of the dataset
+        opener: rasterio opener, e.g. a
+            :class:`stactools.icesat2_boreal.prefetch.HeaderOpener` that serves
+            reads from a prefetched header
+    """
+    import rasterio
+
+    counters = _io_counters.get()
+    if counters is not None:
+        counters.dataset_opens += 1
+    with stage("open"):
+        return rasterio.open(href, opener=opener)
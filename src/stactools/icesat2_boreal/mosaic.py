@@ -0,0 +1,386 @@
+"""Low resolution circumpolar mosaic of all tiles of a run"""
+
+import logging
+import math
+import os
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import fsspec
+import numpy as np
+import numpy.typing as npt
+import rasterio.shutil
+from rasterio.transform import Affine
+from pystac import Asset, MediaType
+from rasterio.enums import Resampling
+from rasterio.io import MemoryFile
+from rasterio.warp import reproject, transform_bounds
+from rasterio.windows import Window
+from rasterio.windows import transform as window_transform
+
+from stactools.icesat2_boreal.cache import gdal_env
+from stactools.icesat2_boreal.metrics import open_dataset
+from stactools.icesat2_boreal.options import (
+    DEFAULT_MOSAIC_RESOLUTION,
+    ExecutorType,
+    ThumbnailFormat,
+    Variable,
+)
+from stactools.icesat2_boreal.keys import ItemName
+from stactools.icesat2_boreal.thumbnail import encode, get_render_options, render
+
+logger = logging.getLogger(__name__)
+
+OVERVIEW_ASSET_KEY = "overview"
+
+# NSIDC EASE-Grid 2.0 North, a Lambert azimuthal equal area projection centered on
+# the North Pole, so the mean of the tiles in a mosaic pixel is an areal mean
+MOSAIC_CRS = "EPSG:6931"
+# the default grid covers everything north of ~36°N
+MOSAIC_BOUNDS = (-6_000_000.0, -6_000_000.0, 6_000_000.0, 6_000_000.0)
+MOSAIC_NAME_FORMAT = "boreal_{variable}_mosaic"
+
+# tiles reprojected per task; each task returns only the small mosaic windows
+# covered by its tiles
+DEFAULT_CHUNK_SIZE = 64
+
+
+@dataclass(frozen=True)
+class MosaicGrid:
+    """Pixel grid of the mosaic"""
+
+    resolution: float = DEFAULT_MOSAIC_RESOLUTION
+    bounds: Tuple[float, float, float, float] = MOSAIC_BOUNDS
+    crs: str = MOSAIC_CRS
+
+    @property
+    def width(self) -> int:
+        """Number of columns"""
+        return math.ceil((self.bounds[2] - self.bounds[0]) / self.resolution)
+
+    @property
+    def height(self) -> int:
+        """Number of rows"""
+        return math.ceil((self.bounds[3] - self.bounds[1]) / self.resolution)
+
+    @property
+    def transform(self) -> Affine:
+        """Geotransform of the grid"""
+        return Affine(
+            self.resolution, 0, self.bounds[0], 0, -self.resolution, self.bounds[3]
+        )
+
+    def window(self, bounds: Tuple[float, float, float, float]) -> Optional[Window]:
+        """Whole pixel window covering ``bounds``, None if outside the grid"""
+        left, bottom, right, top = bounds
+        x, y = self.bounds[0], self.bounds[3]
+        col_off = max(0, math.floor((left - x) / self.resolution))
+        row_off = max(0, math.floor((y - top) / self.resolution))
+        col_end = min(self.width, math.ceil((right - x) / self.resolution))
+        row_end = min(self.height, math.ceil((y - bottom) / self.resolution))
+        if col_end <= col_off or row_end <= row_off:
+            return None
+        return Window(col_off, row_off, col_end - col_off, row_end - row_off)
+
+
+@dataclass
+class Patch:
+    """A tile reprojected onto a window of the mosaic grid, NaN where empty"""
+
+    row: int
+    col: int
+    data: npt.NDArray[np.float32]
+
+
+@dataclass
+class MosaicResult:
+    """Outcome of building a mosaic"""
+
+    cog_href: str
+    png_href: str
+    tiles: int = 0
+    # (COG key, error message) of the tiles that could not be read
+    errors: List[Tuple[str, str]] = field(default_factory=list)
+
+
+def reproject_tile(href: str, grid: MosaicGrid) -> Optional[Patch]:
+    """Reproject the coarsest overview of a COG onto the mosaic grid
+
+    Only the smallest overview is read, so a tile costs the header and a few
+    blocks regardless of its full resolution.
+    """
+    with open_dataset(href) as src:
+        factor = max(src.overviews(1), default=1)
+        height, width = math.ceil(src.height / factor), math.ceil(src.width / factor)
+        data = src.read(
+            1,
+            out_shape=(height, width),
+            masked=True,
+            resampling=Resampling.average,
+        )
+        source = np.ma.fix_invalid(data).astype(np.float32).filled(np.nan)
+        source_transform = src.transform * Affine.scale(
+            src.width / width, src.height / height
+        )
+        window = grid.window(transform_bounds(src.crs, grid.crs, *src.bounds))
+        if window is None:
+            return None
+
+        destination = np.full(
+            (int(window.height), int(window.width)), np.nan, dtype=np.float32
+        )
+        reproject(
+            source,
+            destination,
+            src_transform=source_transform,
+            src_crs=src.crs,
+            src_nodata=np.nan,
+            dst_transform=window_transform(window, grid.transform),
+            dst_crs=grid.crs,
+            dst_nodata=np.nan,
+            resampling=Resampling.average,
+        )
+    return Patch(int(window.row_off), int(window.col_off), destination)
+
+
+def reproject_chunk(
+    hrefs: Sequence[str], grid: MosaicGrid
+) -> Tuple[List[Patch], List[Tuple[str, str]]]:
+    """Reproject a chunk of tiles, returning the patches and the failed tiles"""
+    patches = []
+    errors = []
+    with gdal_env():
+        for href in hrefs:
+            try:
+                patch = reproject_tile(href, grid)
+            except Exception as error:
+                errors.append((href, f"{type(error).__name__}: {error}"))
+                continue
+            if patch is not None:
+                patches.append(patch)
+    return patches, errors
+
+
+class Mosaic:
+    """Running mean of the patches of all tiles on the mosaic grid
+
+    Memory is two arrays of the grid size, e.g. 1200 x 1200 pixels for the default
+    10 km grid, however many tiles are added.
+    """
+
+    def __init__(self, grid: MosaicGrid) -> None:
+        """Start an empty mosaic on ``grid``"""
+        self.grid = grid
+        self.sum = np.zeros((grid.height, grid.width), dtype=np.float64)
+        self.count = np.zeros((grid.height, grid.width), dtype=np.uint16)
+
+    def add(self, patch: Patch) -> None:
+        """Add a reprojected tile, averaging pixels covered by several tiles"""
+        rows = slice(patch.row, patch.row + patch.data.shape[0])
+        cols = slice(patch.col, patch.col + patch.data.shape[1])
+        valid = ~np.isnan(patch.data)
+        self.sum[rows, cols][valid] += patch.data[valid]
+        self.count[rows, cols][valid] += 1
+
+    def to_array(self) -> np.ma.MaskedArray:
+        """Mean of the tiles, masked where no tile has data"""
+        empty = self.count == 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = (self.sum / self.count).astype(np.float32)
+        return np.ma.masked_array(mean, mask=empty)
+
+
+def _chunks(hrefs: Iterable[str], size: int) -> Iterator[List[str]]:
+    chunk: List[str] = []
+    for href in hrefs:
+        chunk.append(href)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _create_executor(executor_type: ExecutorType, workers: int) -> Executor:
+    if executor_type == ExecutorType.PROCESS:
+        return ProcessPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+def composite(
+    hrefs: Iterable[str],
+    grid: MosaicGrid,
+    workers: Optional[int] = None,
+    executor_type: ExecutorType = ExecutorType.THREAD,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Tuple[Mosaic, List[Tuple[str, str]]]:
+    """Reproject tiles in parallel chunks and composite them into a mosaic
+
+    Chunks are submitted in a bounded window, so only the patches of a few chunks
+    per worker are held in memory besides the mosaic itself.
+
+    Returns:
+        Tuple[Mosaic, List[Tuple[str, str]]]: the mosaic and the failed tiles
+    """
+    workers = workers or os.cpu_count() or 1
+    mosaic = Mosaic(grid)
+    errors: List[Tuple[str, str]] = []
+    chunks = _chunks(hrefs, chunk_size)
+    pending: Dict[Future, List[str]] = {}
+
+    def submit(executor: Executor, n: int) -> None:
+        for chunk in (next(chunks, None) for _ in range(n)):
+            if chunk is None:
+                return
+            pending[executor.submit(reproject_chunk, chunk, grid)] = chunk
+
+    with _create_executor(executor_type, workers) as executor:
+        submit(executor, workers * 2)
+        while pending:
+            done: Set[Future]
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk = pending.pop(future)
+                try:
+                    patches, chunk_errors = future.result()
+                except Exception as error:
+                    message = f"{type(error).__name__}: {error}"
+                    chunk_errors = [(href, message) for href in chunk]
+                    patches = []
+                for patch in patches:
+                    mosaic.add(patch)
+                errors.extend(chunk_errors)
+            submit(executor, len(done))
+
+    return mosaic, errors
+
+
+def encode_cog(data: np.ma.MaskedArray, grid: MosaicGrid) -> bytes:
+    """Encode the mosaic as a deflate compressed float32 COG with NaN nodata"""
+    with MemoryFile() as source, MemoryFile() as target:
+        with source.open(
+            driver="GTiff",
+            count=1,
+            height=grid.height,
+            width=grid.width,
+            dtype="float32",
+            crs=grid.crs,
+            transform=grid.transform,
+            nodata=np.nan,
+        ) as dst:
+            dst.write(data.filled(np.nan), 1)
+        with source.open() as src:
+            rasterio.shutil.copy(
+                src,
+                target.name,
+                driver="COG",
+                COMPRESS="DEFLATE",
+                PREDICTOR="YES",
+                BLOCKSIZE=512,
+                RESAMPLING="AVERAGE",
+            )
+        return target.read()
+
+
+def _write(href: str, data: bytes) -> None:
+    fs, path = fsspec.core.url_to_fs(href)
+    fs.makedirs(fs._parent(path), exist_ok=True)
+    fs.pipe_file(path, data)
+
+
+def mosaic_variable(cog_keys: Sequence[str]) -> Variable:
+    """The variable of the tiles of a run
+
+    Raises:
+        ValueError: if the tiles belong to different variables or there are none
+    """
+    variables = {ItemName.from_key(cog_key).variable for cog_key in cog_keys}
+    if len(variables) != 1:
+        raise ValueError(
+            "A mosaic is built from the tiles of one variable, got: "
+            f"{sorted(variables) or 'no tiles'}"
+        )
+    return variables.pop()
+
+
+def build_mosaic(
+    cog_keys: Sequence[str],
+    destination: str,
+    grid: Optional[MosaicGrid] = None,
+    workers: Optional[int] = None,
+    executor_type: ExecutorType = ExecutorType.THREAD,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> MosaicResult:
+    """Build the circumpolar mosaic COG and PNG of a run
+
+    Args:
+        cog_keys: COG keys of all tiles of the run
+        destination: Local directory or URL prefix of the mosaic files
+        grid: Resolution, extent and projection of the mosaic, defaults to the
+            :data:`DEFAULT_MOSAIC_RESOLUTION` grid over the whole boreal zone
+        workers: Number of workers in the pool, defaults to the number of CPUs
+        executor_type: Use a thread pool (I/O bound) or a process pool
+        chunk_size: Number of tiles reprojected per task
+
+    Returns:
+        MosaicResult: HREFs of the mosaic files and the tiles that failed
+    """
+    grid = grid or MosaicGrid()
+    variable = mosaic_variable(cog_keys)
+    name = MOSAIC_NAME_FORMAT.format(variable=variable.value)
+    result = MosaicResult(
+        cog_href=os.path.join(destination, f"{name}.tif"),
+        png_href=os.path.join(destination, f"{name}.png"),
+        tiles=len(cog_keys),
+    )
+
+    mosaic, result.errors = composite(
+        cog_keys, grid, workers, executor_type, chunk_size
+    )
+    data = mosaic.to_array()
+    rescale, colormap = get_render_options(variable)
+    _write(result.cog_href, encode_cog(data, grid))
+    rgba = render(data, rescale, colormap)
+    _write(result.png_href, encode(rgba, ThumbnailFormat.PNG))
+    logger.info(
+        f"Composited {result.tiles - len(result.errors)} tiles into {result.cog_href}"
+    )
+    return result
+
+
+def png_href(cog_href: str) -> str:
+    """HREF of the PNG written next to a mosaic COG"""
+    return os.path.splitext(cog_href)[0] + ".png"
+
+
+def mosaic_assets(cog_href: str) -> Dict[str, Asset]:
+    """Collection assets of a mosaic built with :func:`build_mosaic`
+
+    The PNG replaces the static collection thumbnail.
+    """
+    return {
+        "thumbnail": Asset(
+            href=png_href(cog_href),
+            media_type=MediaType.PNG,
+            roles=["thumbnail"],
+            title="Thumbnail",
+            description="Circumpolar view of model predictions",
+        ),
+        OVERVIEW_ASSET_KEY: Asset(
+            href=cog_href,
+            media_type=MediaType.COG,
+            roles=["overview"],
+            title="Circumpolar mosaic",
+            description="Low resolution mosaic of model predictions in the "
+            f"{MOSAIC_CRS} projection, the mean of the coarsest overviews of "
+            "all tiles",
+        ),
+    }
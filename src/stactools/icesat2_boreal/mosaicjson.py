@@ -0,0 +1,240 @@
+"""MosaicJSON quadkey index of the item COGs for dynamic tiling"""
+
+import json
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import fsspec
+import shapely
+from shapely.geometry import box, shape
+
+from stactools.icesat2_boreal.constants import (
+    COLLECTION_ID_FORMAT,
+    RENDERS,
+    VERSION,
+    AssetType,
+)
+from stactools.icesat2_boreal.options import Variable
+from stactools.icesat2_boreal.keys import ItemName
+
+MOSAICJSON_VERSION = "0.0.3"
+
+# the zoom levels of the renders; the quadkeys are at the minimum zoom so the COGs
+# of any rendered tile are found under the tile's parent quadkey
+MINZOOM, MAXZOOM = next(iter(RENDERS[Variable.AGB].values())).minmax_zoom
+DEFAULT_QUADKEY_ZOOM = MINZOOM
+
+# web mercator is undefined at the poles
+MAX_LATITUDE = 85.0511287798066
+
+BBox = Tuple[float, float, float, float]
+
+
+def tile_range(bbox: BBox, zoom: int) -> Tuple[int, int, int, int]:
+    """Web mercator tiles (min x, min y, max x, max y) covering a lon/lat bbox"""
+    west, south, east, north = bbox
+    n = 2**zoom
+
+    def x(lon: float) -> int:
+        return min(n - 1, max(0, math.floor((lon + 180) / 360 * n)))
+
+    def y(lat: float) -> int:
+        lat = math.radians(max(-MAX_LATITUDE, min(MAX_LATITUDE, lat)))
+        value = (1 - math.asinh(math.tan(lat)) / math.pi) / 2 * n
+        return min(n - 1, max(0, math.floor(value)))
+
+    return x(west), y(north), x(east), y(south)
+
+
+def tile_bounds(x: int, y: int, zoom: int) -> BBox:
+    """Lon/lat bounds of a web mercator tile"""
+    n = 2**zoom
+
+    def lat(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360 - 180, lat(y + 1), (x + 1) / n * 360 - 180, lat(y)
+
+
+def quadkey(x: int, y: int, zoom: int) -> str:
+    """Quadkey of a web mercator tile"""
+    digits = []
+    for level in range(zoom, 0, -1):
+        mask = 1 << (level - 1)
+        digits.append(str((1 if x & mask else 0) + (2 if y & mask else 0)))
+    return "".join(digits)
+
+
+def footprint_quadkeys(
+    bbox: BBox, zoom: int, geometry: Optional[Dict[str, Any]] = None
+) -> Set[str]:
+    """Quadkeys of the tiles at ``zoom`` that intersect an item footprint
+
+    Tiles in the bbox that miss the footprint ``geometry`` are left out. A bbox
+    that crosses the antimeridian (west > east) is split in two.
+    """
+    west, south, east, north = bbox
+    if west > east:
+        return footprint_quadkeys(
+            (west, south, 180.0, north), zoom
+        ) | footprint_quadkeys((-180.0, south, east, north), zoom)
+
+    footprint = None if geometry is None else shape(geometry)
+    if footprint is not None:
+        shapely.prepare(footprint)
+    min_x, min_y, max_x, max_y = tile_range(bbox, zoom)
+    return {
+        quadkey(x, y, zoom)
+        for x in range(min_x, max_x + 1)
+        for y in range(min_y, max_y + 1)
+        if footprint is None or footprint.intersects(box(*tile_bounds(x, y, zoom)))
+    }
+
+
+def _union(a: Optional[BBox], b: BBox) -> BBox:
+    if a is None:
+        return b
+    if b[0] > b[2]:
+        # the bbox crosses the antimeridian
+        return -180.0, min(a[1], b[1]), 180.0, max(a[3], b[3])
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+@dataclass
+class _Source:
+    run_id: str
+    href: str
+    quadkeys: Set[str]
+
+
+@dataclass
+class MosaicIndex:
+    """Quadkey to COG HREF index of the items of one variable
+
+    Items can be added at any time, e.g. to the index of a previous run. A tile
+    appears once: adding a newer run of a tile replaces the older one, and older
+    runs are ignored. Tilers look up the COGs of a tile at or below the quadkey
+    zoom with one dictionary access of the tile's parent quadkey.
+    """
+
+    variable: Optional[Variable] = None
+    quadkey_zoom: int = DEFAULT_QUADKEY_ZOOM
+    minzoom: int = MINZOOM
+    maxzoom: int = MAXZOOM
+    bounds: Optional[BBox] = None
+    tiles: Dict[str, Set[str]] = field(default_factory=dict)
+    # the COG of each tile, by tile ID
+    _sources: Dict[str, _Source] = field(default_factory=dict, repr=False)
+
+    def _remove(self, source: _Source) -> None:
+        for key in source.quadkeys:
+            hrefs = self.tiles.get(key, set())
+            hrefs.discard(source.href)
+            if not hrefs:
+                self.tiles.pop(key, None)
+
+    def _insert(self, name: ItemName, href: str, quadkeys: Set[str]) -> bool:
+        if self.variable is None:
+            self.variable = name.variable
+        elif name.variable != self.variable:
+            raise ValueError(
+                f"Cannot add {name.variable} item {name.item_id} to the index of "
+                f"{self.variable}"
+            )
+
+        previous = self._sources.get(name.tile_id)
+        if previous is not None:
+            if previous.run_id > name.run_id or previous.href == href:
+                return False
+            self._remove(previous)
+        self._sources[name.tile_id] = _Source(name.run_id, href, quadkeys)
+        for key in quadkeys:
+            self.tiles.setdefault(key, set()).add(href)
+        return True
+
+    def add(self, item_dict: Dict[str, Any]) -> bool:
+        """Add the COG of an item
+
+        Returns:
+            bool: False if the index already holds the same or a newer run of the
+            tile
+
+        Raises:
+            ValueError: if the item is of another variable than the index
+        """
+        bbox: BBox = tuple(item_dict["bbox"][:4])  # type: ignore[assignment]
+        added = self._insert(
+            ItemName.from_key(item_dict["id"]),
+            item_dict["assets"][AssetType.COG]["href"],
+            footprint_quadkeys(bbox, self.quadkey_zoom, item_dict.get("geometry")),
+        )
+        if added:
+            self.bounds = _union(self.bounds, bbox)
+        return added
+
+    def add_items(self, item_dicts: Iterable[Dict[str, Any]]) -> int:
+        """Add the COGs of a stream of items, returning the number added"""
+        return sum(self.add(item_dict) for item_dict in item_dicts)
+
+    def get_assets(self, x: int, y: int, zoom: int) -> List[str]:
+        """COG HREFs of a web mercator tile"""
+        key = quadkey(x, y, zoom)
+        if zoom >= self.quadkey_zoom:
+            return sorted(self.tiles.get(key[: self.quadkey_zoom], ()))
+        # tiles above the quadkey zoom cover several quadkeys
+        hrefs: Set[str] = set()
+        for child, child_hrefs in self.tiles.items():
+            if child.startswith(key):
+                hrefs |= child_hrefs
+        return sorted(hrefs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """MosaicJSON document of the index"""
+        west, south, east, north = self.bounds or (-180.0, -90.0, 180.0, 90.0)
+        name = (
+            None
+            if self.variable is None
+            else COLLECTION_ID_FORMAT.format(
+                version=VERSION, variable=self.variable.value
+            )
+        )
+        return {
+            "mosaicjson": MOSAICJSON_VERSION,
+            "name": name,
+            "version": "1.0.0",
+            "minzoom": self.minzoom,
+            "maxzoom": self.maxzoom,
+            "quadkey_zoom": self.quadkey_zoom,
+            "bounds": [west, south, east, north],
+            "center": [(west + east) / 2, (south + north) / 2, self.minzoom],
+            "tiles": {key: sorted(hrefs) for key, hrefs in sorted(self.tiles.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, document: Dict[str, Any]) -> "MosaicIndex":
+        """Load the index from a MosaicJSON document written by :meth:`to_dict`"""
+        index = cls(
+            quadkey_zoom=document["quadkey_zoom"],
+            minzoom=document["minzoom"],
+            maxzoom=document["maxzoom"],
+            bounds=tuple(document["bounds"]),  # type: ignore[arg-type]
+        )
+        quadkeys: Dict[str, Set[str]] = {}
+        for key, hrefs in document["tiles"].items():
+            for href in hrefs:
+                quadkeys.setdefault(href, set()).add(key)
+        for href, keys in quadkeys.items():
+            index._insert(ItemName.from_key(href), href, keys)
+        return index
+
+    def save(self, href: str) -> None:
+        """Write the MosaicJSON document to a local path or URL"""
+        with fsspec.open(href, "w") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, href: str) -> "MosaicIndex":
+        """Read a MosaicJSON document from a local path or URL"""
+        with fsspec.open(href, "r") as f:
+            return cls.from_dict(json.load(f))
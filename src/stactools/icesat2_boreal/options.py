@@ -0,0 +1,102 @@
+"""Choices and defaults of the item generation options
+
+This module has no third party imports, so the command line can declare its
+options without loading rasterio, pystac or the other heavy dependencies.
+"""
+
+from enum import StrEnum
+
+
+class Variable(StrEnum):
+    """Enumeration of the different variables"""
+
+    AGB = "agb"
+    HT = "ht"
+
+
+class ValidationMode(StrEnum):
+    """Enumeration of the validation modes"""
+
+    NONE = "none"
+    SAMPLE = "sample"
+    ALL = "all"
+
+
+class StatisticsMode(StrEnum):
+    """Enumeration of the ways band statistics can be computed"""
+
+    # no statistics, keep the band metadata of the item asset definition
+    NONE = "none"
+    # no pixel reads, use the statistics tags in the COG header if present
+    HEADER = "header"
+    # read the smallest overview that is at least the target size
+    OVERVIEW = "overview"
+    # read every pixel at full resolution, block by block
+    EXACT = "exact"
+
+
+DEFAULT_OVERVIEW_SIZE = 1024
+
+
+class GeometryMode(StrEnum):
+    """Enumeration of the sources of the item geometry"""
+
+    # derive geometry, bbox and projection from the COG
+    RASTER = "raster"
+    # look them up in the tile index without opening the COG
+    INDEX = "index"
+
+
+# attribute of the tile features that holds the tile number
+TILE_ID_COLUMN = "tile_num"
+
+
+class ExecutorType(StrEnum):
+    """Enumeration of the pools that can run a batch"""
+
+    PROCESS = "process"
+    THREAD = "thread"
+
+
+class OutputFormat(StrEnum):
+    """Enumeration of the batch output formats"""
+
+    # one JSON file per item
+    JSON = "json"
+    # newline-delimited JSON, one item per line
+    NDJSON = "ndjson"
+    # stac-geoparquet, one row per item
+    GEOPARQUET = "geoparquet"
+
+
+# rows per parquet row group: large enough for efficient scans in DuckDB, small
+# enough that pgstac loaders can stream one group at a time
+DEFAULT_ROW_GROUP_SIZE = 10_000
+
+
+# concurrent directory listings when discovering a run's assets
+DEFAULT_LIST_WORKERS = 32
+
+
+# attempts per tile in a queued run before a transient error is given up on
+DEFAULT_MAX_ATTEMPTS = 5
+
+
+# size limit of the on-disk COG block cache shared by the workers of a run
+DEFAULT_BLOCK_CACHE_SIZE = 10 * 1024**3
+
+
+class ThumbnailFormat(StrEnum):
+    """Enumeration of the item thumbnail image formats"""
+
+    PNG = "png"
+    WEBP = "webp"
+
+
+# longest side of the item thumbnails in pixels; the smallest overview of a tile
+# is used as is if it is smaller
+DEFAULT_THUMBNAIL_SIZE = 256
+
+
+# pixel size in meters of the circumpolar mosaic built from the coarsest overviews
+DEFAULT_MOSAIC_RESOLUTION = 10_000
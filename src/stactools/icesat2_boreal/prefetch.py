@@ -0,0 +1,278 @@
+"""Concurrent prefetching of the small range reads needed for item metadata"""
+
+import asyncio
+import io
+import logging
+from dataclasses import dataclass
+from itertools import islice
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import fsspec
+from fsspec import AbstractFileSystem
+
+from stactools.icesat2_boreal.metrics import count_bytes, stage
+
+logger = logging.getLogger(__name__)
+
+# enough for the IFDs and tag data of a COG with several overview levels
+DEFAULT_HEADER_SIZE = 64 * 1024
+DEFAULT_CONCURRENCY = 64
+# the metadata of a training data parquet file is a few KB
+DEFAULT_FOOTER_SIZE = 64 * 1024
+# number of tiles whose headers are fetched together in a batch run
+PREFETCH_BATCH_SIZE = 256
+
+
+@dataclass(frozen=True)
+class ByteRange:
+    """A range of bytes to read from a file
+
+    A negative ``start`` with no ``end`` reads the last ``-start`` bytes, e.g. a
+    parquet footer.
+    """
+
+    href: str
+    start: int
+    end: Optional[int] = None
+
+
+async def _read_range(
+    fs: AbstractFileSystem,
+    path: str,
+    byte_range: ByteRange,
+    semaphore: asyncio.Semaphore,
+) -> bytes:
+    async with semaphore:
+        start, end = byte_range.start, byte_range.end
+        if fs.async_impl:
+            if start < 0:
+                size = (await fs._info(path))["size"]
+                start, end = max(size + start, 0), size
+            return await fs._cat_file(path, start=start, end=end)
+
+        # synchronous filesystems (e.g. local files) are read on a thread
+        return await asyncio.to_thread(fs.cat_file, path, start=start, end=end)
+
+
+async def fetch_ranges_async(
+    ranges: Iterable[ByteRange], concurrency: int = DEFAULT_CONCURRENCY
+) -> List[Union[bytes, BaseException]]:
+    """Read many byte ranges concurrently
+
+    One asynchronous filesystem, and so one pooled HTTP session, is used per
+    protocol, and at most ``concurrency`` requests are in flight at once.
+
+    Returns:
+        The bytes of each range, or the exception raised while reading it, in the
+        order of ``ranges``
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    filesystems: Dict[str, AbstractFileSystem] = {}
+    tasks = []
+    for byte_range in ranges:
+        protocol, path = fsspec.core.split_protocol(byte_range.href)
+        protocol = protocol or "file"
+        if protocol not in filesystems:
+            fs_class = fsspec.get_filesystem_class(protocol)
+            if fs_class.async_impl:
+                fs = fs_class(asynchronous=True, skip_instance_cache=True)
+                await fs.set_session()
+            else:
+                fs = fs_class()
+            filesystems[protocol] = fs
+        fs = filesystems[protocol]
+        tasks.append(
+            _read_range(
+                fs,
+                fs._strip_protocol(byte_range.href),
+                byte_range,
+                semaphore,
+            )
+        )
+
+    try:
+        return await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        for fs in filesystems.values():
+            session = getattr(fs, "_session", None)
+            if session is not None:
+                await session.close()
+
+
+def fetch_ranges(
+    ranges: Iterable[ByteRange], concurrency: int = DEFAULT_CONCURRENCY
+) -> List[Union[bytes, BaseException]]:
+    """Read many byte ranges concurrently, see :func:`fetch_ranges_async`"""
+    with stage("prefetch"):
+        results = asyncio.run(fetch_ranges_async(ranges, concurrency))
+    count_bytes(sum(len(r) for r in results if not isinstance(r, BaseException)))
+    return results
+
+
+def fetch_headers(
+    hrefs: Iterable[str],
+    header_size: int = DEFAULT_HEADER_SIZE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> Dict[str, bytes]:
+    """Read the first ``header_size`` bytes of many files concurrently
+
+    Files that could not be read are logged and left out of the result, so they
+    are read again (and fail with a proper error) when the item is created.
+    """
+    hrefs = list(hrefs)
+    results = fetch_ranges(
+        [ByteRange(href, 0, header_size) for href in hrefs], concurrency
+    )
+    headers = {}
+    for href, result in zip(hrefs, results, strict=True):
+        if isinstance(result, BaseException):
+            logger.warning(f"Failed to prefetch the header of {href}: {result!r}")
+        else:
+            headers[href] = result
+
+    return headers
+
+
+@dataclass
+class PrefetchedTile:
+    """The source keys of one tile with the bytes prefetched for them"""
+
+    cog_key: str
+    parquet_key: str
+    # first bytes of the COG, None if they were not (or could not be) fetched
+    cog_header: Optional[bytes] = None
+    # last bytes of the training data parquet file
+    parquet_footer: Optional[bytes] = None
+
+
+def iter_prefetched(
+    pairs: Iterable[Tuple[str, str]],
+    parquet_footers: bool = False,
+    batch_size: int = PREFETCH_BATCH_SIZE,
+    header_size: int = DEFAULT_HEADER_SIZE,
+    footer_size: int = DEFAULT_FOOTER_SIZE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> Iterator[PrefetchedTile]:
+    """Prefetch the COG headers (and parquet footers) of (COG, parquet) key pairs
+
+    The ranges of ``batch_size`` tiles at a time are fetched concurrently. Ranges
+    that could not be fetched are logged and left as None, so the file is read
+    again (and fails with a proper error) when the item is created.
+    """
+    pairs = iter(pairs)
+    while batch := list(islice(pairs, batch_size)):
+        ranges = [ByteRange(cog_key, 0, header_size) for cog_key, _ in batch]
+        if parquet_footers:
+            ranges += [ByteRange(key, -footer_size) for _, key in batch]
+
+        results: List[Optional[bytes]] = []
+        for byte_range, result in zip(
+            ranges, fetch_ranges(ranges, concurrency), strict=True
+        ):
+            if isinstance(result, BaseException):
+                logger.warning(f"Failed to prefetch {byte_range.href}: {result!r}")
+                results.append(None)
+            else:
+                results.append(result)
+
+        headers = results[: len(batch)]
+        footers = results[len(batch) :] if parquet_footers else [None] * len(batch)
+        for (cog_key, parquet_key), header, footer in zip(
+            batch, headers, footers, strict=True
+        ):
+            yield PrefetchedTile(
+                cog_key=cog_key,
+                parquet_key=parquet_key,
+                cog_header=header,
+                parquet_footer=footer,
+            )
+
+
+class PrefetchedFile(io.RawIOBase):
+    """A read-only file that serves its first bytes from memory
+
+    Reads past the prefetched header fall through to the underlying file, which
+    is only opened if they happen.
+    """
+
+    def __init__(self, href: str, header: bytes) -> None:
+        """Wrap the file at ``href`` whose first bytes are ``header``"""
+        self.href = href
+        self.header = header
+        self._position = 0
+        self._file: Optional[IO[bytes]] = None
+        self._size: Optional[int] = None
+
+    def _underlying(self) -> IO[bytes]:
+        if self._file is None:
+            logger.debug(f"Read past the prefetched header of {self.href}")
+            self._file = fsspec.open(self.href, "rb").open()
+        return self._file
+
+    @property
+    def size(self) -> int:
+        """Size of the file"""
+        if self._size is None:
+            file = self._underlying()
+            self._size = file.seek(0, io.SEEK_END)
+        return self._size
+
+    def readable(self) -> bool:
+        """The file can be read"""
+        return True
+
+    def seekable(self) -> bool:
+        """The file supports random access"""
+        return True
+
+    def tell(self) -> int:
+        """Current position"""
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        """Move to a new position"""
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self._position = offset
+        return self._position
+
+    def readinto(self, buffer: bytearray) -> int:  # type: ignore[override]
+        """Read into a buffer, from memory where possible"""
+        start, end = self._position, self._position + len(buffer)
+        if end <= len(self.header):
+            data = self.header[start:end]
+        else:
+            file = self._underlying()
+            file.seek(start)
+            data = file.read(end - start)
+            count_bytes(len(data))
+        buffer[: len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def close(self) -> None:
+        """Close the underlying file if it was opened"""
+        if self._file is not None:
+            self._file.close()
+        super().close()
+
+
+class HeaderOpener:
+    """A rasterio ``opener`` that serves a COG from a prefetched header
+
+    Any other file (e.g. the ``.aux.xml`` and ``.ovr`` sidecars GDAL probes for)
+    is reported as missing, like ``GDAL_DISABLE_READDIR_ON_OPEN=EMPTY_DIR``.
+    """
+
+    def __init__(self, href: str, header: bytes) -> None:
+        """Serve ``href`` using its prefetched ``header``"""
+        self.href = href
+        self.header = header
+
+    def __call__(self, path: str, mode: str = "rb") -> PrefetchedFile:
+        """Open the prefetched file"""
+        if path != self.href:
+            raise FileNotFoundError(path)
+        return PrefetchedFile(self.href, self.header)
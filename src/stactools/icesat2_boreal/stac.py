@@ -1,26 +1,30 @@
 """STAC metadata methods for icesat2-boreal collections"""
 
-import importlib.resources as pkg_resources
-import json
-import os
 import re
-from datetime import datetime, timedelta, timezone
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, Optional
 
-import rasterio
 import rio_stac
-from dateutil.relativedelta import relativedelta
+import stactools.core
 from pystac import (
     Collection,
     Extent,
     Item,
     Link,
+    MediaType,
+    RelType,
     SpatialExtent,
     TemporalExtent,
 )
+from pystac.extensions.file import FileExtension
 from pystac.extensions.render import RenderExtension
+from pystac.extensions.table import TableExtension
 from pystac.extensions.version import VersionRelType
-from rio_stac.stac import get_raster_info
+from rasterio.io import DatasetReader
 
+from stactools.icesat2_boreal.aggregate import CollectionSummary
+from stactools.icesat2_boreal.cache import BlockCache, gdal_env
+from stactools.icesat2_boreal.checksum import get_file_info
 from stactools.icesat2_boreal.constants import (
     BBOX,
     COLLECTION_ASSETS,
@@ -30,6 +34,8 @@ from stactools.icesat2_boreal.constants import (
     COLLECTION_TITLES,
     ITEM_ASSETS,
     LICENSE,
+    PROCESSING_EXTENSION_SCHEMA,
+    PROJECTION_EXTENSION_SCHEMA,
     PROVIDERS,
     RENDERS,
     REPOSITORY_LINK,
@@ -37,8 +43,31 @@ from stactools.icesat2_boreal.constants import (
     TEMPORAL_INTERVALS,
     VERSION,
     AssetType,
+)
+from stactools.icesat2_boreal.daac import in_daac
+from stactools.icesat2_boreal.metrics import open_dataset, stage
+from stactools.icesat2_boreal.mosaic import mosaic_assets
+from stactools.icesat2_boreal.options import (
+    DEFAULT_OVERVIEW_SIZE,
+    DEFAULT_THUMBNAIL_SIZE,
+    GeometryMode,
+    StatisticsMode,
+    ThumbnailFormat,
+    ValidationMode,
     Variable,
 )
+from stactools.icesat2_boreal.prefetch import HeaderOpener
+from stactools.icesat2_boreal.statistics import get_band_statistics
+from stactools.icesat2_boreal.table import get_table_metadata
+from stactools.icesat2_boreal.keys import ItemName
+from stactools.icesat2_boreal.templates import get_item_template
+from stactools.icesat2_boreal.thumbnail import THUMBNAIL_ASSET_KEY, write_thumbnail
+from stactools.icesat2_boreal.tiles import get_tile_index
+from stactools.icesat2_boreal.validation import validate
+
+# read and write STAC objects on S3 and other remote filesystems; configured here
+# rather than on package import so only commands that do I/O pay for it
+stactools.core.use_fsspec()
 
 # specific text fields for each variable/asset
 
@@ -48,12 +77,39 @@ def format_multiline_string(string: str) -> str:
     return re.sub(r" +", " ", re.sub(r"(?<!\n)\n(?!\n)", " ", string))
 
 
-def create_collection(variable: Variable) -> Collection:
-    """Create STAC collection object"""
+def create_collection(
+    variable: Variable,
+    validation: ValidationMode = ValidationMode.ALL,
+    summary: Optional[CollectionSummary] = None,
+    mosaic: Optional[str] = None,
+) -> Collection:
+    """Create STAC collection object
+
+    Args:
+        variable: Variable of the collection
+        validation: Validate the collection or skip validation
+        summary: Summary of the generated items, replaces the static extent and
+            adds band statistics and DAAC coverage summaries
+        mosaic: HREF of the circumpolar mosaic COG built with
+            :func:`stactools.icesat2_boreal.mosaic.build_mosaic`, added as the
+            ``overview`` asset with its PNG as the thumbnail
+    """
     collection_id = COLLECTION_ID_FORMAT.format(
         version=VERSION, variable=variable.value
     )
 
+    with stage("collection"):
+        collection = _build_collection(collection_id, variable)
+        if summary is not None:
+            summary.apply(collection)
+        if mosaic is not None:
+            for key, asset in mosaic_assets(mosaic).items():
+                collection.add_asset(key, asset)
+    validate(collection, validation)
+    return collection
+
+
+def _build_collection(collection_id: str, variable: Variable) -> Collection:
     collection = Collection(
         id=collection_id,
         title=COLLECTION_TITLES[variable],
@@ -94,9 +150,7 @@ def create_collection(variable: Variable) -> Collection:
         )
 
     # add some extensions by hand
-    collection.stac_extensions.append(
-        "https://stac-extensions.github.io/processing/v1.2.0/schema.json",
-    )
+    collection.stac_extensions.append(PROCESSING_EXTENSION_SCHEMA)
 
     # add render extension
     collection.ext.add("render")
@@ -107,72 +161,163 @@ def create_collection(variable: Variable) -> Collection:
     collection.ext.sci.apply(
         citation=format_multiline_string(COLLECTION_CITATION),
     )
-    collection.validate()
     return collection
 
 
-def create_item(cog_key: str, parquet_key: str) -> Item:
-    """Create a STAC item given the S3 key for a COG"""
-    asset_keys = {AssetType.COG: cog_key, AssetType.TRAINING_DATA_PARQUET: parquet_key}
-
-    item_id = os.path.splitext(os.path.basename(cog_key))[0]
+def _add_thumbnail(
+    item: Item,
+    src: DatasetReader,
+    variable: Variable,
+    thumbnails: Optional[str],
+    thumbnail_size: int,
+    thumbnail_format: ThumbnailFormat,
+) -> None:
+    """Write the thumbnail of an item's COG, if a destination is set"""
+    if thumbnails is None:
+        return
+    with stage("thumbnail"):
+        asset = write_thumbnail(
+            src, variable, thumbnails, item.id, thumbnail_size, thumbnail_format
+        )
+    item.add_asset(THUMBNAIL_ASSET_KEY, asset)
 
-    # parse id into properties
-    id_parts = item_id.split("_")
 
-    variable = Variable(id_parts[1])
-    tile_id = id_parts[-1]
+def create_item(
+    cog_key: str,
+    parquet_key: str,
+    validation: ValidationMode = ValidationMode.ALL,
+    statistics: StatisticsMode = StatisticsMode.EXACT,
+    overview_size: int = DEFAULT_OVERVIEW_SIZE,
+    cog_header: Optional[bytes] = None,
+    parquet_metadata: bool = False,
+    parquet_footer: Optional[bytes] = None,
+    geometry: GeometryMode = GeometryMode.RASTER,
+    tile_index: Optional[str] = None,
+    checksums: bool = False,
+    block_cache: Optional[BlockCache] = None,
+    thumbnails: Optional[str] = None,
+    thumbnail_size: int = DEFAULT_THUMBNAIL_SIZE,
+    thumbnail_format: ThumbnailFormat = ThumbnailFormat.PNG,
+) -> Item:
+    """Create a STAC item given the S3 key for a COG
 
-    collection_id = COLLECTION_ID_FORMAT.format(
-        version=VERSION, variable=variable.value
-    )
-    created_datetime = datetime.strptime(id_parts[3][:8], "%Y%m%d")
-    item_start_datetime = datetime.strptime(id_parts[2], "%Y")
-    item_end_datetime = (
-        item_start_datetime + relativedelta(years=1) - timedelta(seconds=1)
-    )
+    Args:
+        cog_key: HREF of the COG asset
+        parquet_key: HREF of the training data parquet asset
+        validation: Validate the item, validate a sample of items or skip validation
+        statistics: Read band statistics from the header, an overview or every pixel
+        overview_size: Target overview size for the ``overview`` statistics mode
+        cog_header: Prefetched first bytes of the COG, so header reads need no
+            further requests
+        parquet_metadata: Add the row count, column schema and column ranges of
+            the training data parquet asset, read from the parquet footer
+        parquet_footer: Prefetched last bytes of the parquet file
+        geometry: Derive geometry, bbox and projection from the COG or look them
+            up in the tile index. With ``index`` geometry and ``none`` statistics
+            the COG is not opened at all.
+        tile_index: HREF of the tile index, see :func:`tiles.get_tile_index`
+        checksums: Add the file extension size and multihash checksum of the
+            assets, taken from S3 where possible and computed by streaming the
+            file otherwise
+        block_cache: Read the COG through a local block cache shared with other
+            workers, see :class:`stactools.icesat2_boreal.cache.BlockCache`
+        thumbnails: Directory (or URL prefix) to write a thumbnail of the COG to,
+            rendered from its smallest overview with the variable's default
+            render and added as the ``thumbnail`` asset
+        thumbnail_size: Longest side of the thumbnail in pixels
+        thumbnail_format: Image format of the thumbnail
+    """
+    asset_keys = {AssetType.COG: cog_key, AssetType.TRAINING_DATA_PARQUET: parquet_key}
 
-    # generate dictionary of assets
-    collection_item_assets = ITEM_ASSETS[variable]
-    item_assets = {
-        str(asset): collection_item_assets[asset].create_asset(key).clone()
-        for asset, key in asset_keys.items()
-    }
+    # everything that only depends on the variable and year comes from a shared
+    # template, so only the tile specific fields are built per item
+    name = ItemName.from_key(cog_key)
+    template = get_item_template(name.variable, name.year)
+    item_id = name.item_id
+    tile_id = name.tile_id
+    collection_id = template.collection_id
+    input_datetime = template.datetime
+    item_assets = template.create_assets(asset_keys)
+    properties = template.create_properties(name)
+    with stage("daac"):
+        properties["icesat2-boreal:in_daac"] = in_daac(tile_id)
 
-    with pkg_resources.open_text("stactools.icesat2_boreal", "daac-tiles.json") as f:
-        daac_tiles = json.load(f)
+    opener: Optional[Callable[..., Any]] = None
+    if block_cache is not None:
+        opener = block_cache.opener(cog_key, cog_header)
+    elif cog_header is not None:
+        opener = HeaderOpener(cog_key, cog_header)
+    # openers serve the header themselves, the tuned options are for GDAL's own
+    # HTTP reads
+    env = gdal_env if opener is None else nullcontext
 
-    item = rio_stac.create_stac_item(
-        source=asset_keys[AssetType.COG],
-        collection=collection_id,
-        id=item_id,
-        input_datetime=(
-            item_start_datetime + (item_end_datetime - item_start_datetime) / 2
-        ),
-        properties={
-            "start_datetime": item_start_datetime.replace(
-                tzinfo=timezone.utc
-            ).isoformat(),
-            "end_datetime": item_end_datetime.replace(tzinfo=timezone.utc).isoformat(),
-            "created_datetime": created_datetime.replace(
-                tzinfo=timezone.utc
-            ).isoformat(),
-            "icesat2-boreal:tile_id": tile_id,
-            "icesat2-boreal:in_daac": tile_id in daac_tiles,
-        },
-        assets=item_assets,
-        # skip with_raster because when assets is specified, raster info does not get
-        # attached to the asset
-        with_raster=False,
-        with_proj=True,
-    )
-
-    with rasterio.open(cog_key) as src:
-        raster_info = get_raster_info(src, max_size=3000)
+    raster_info: List[Dict[str, Any]] = []
+    if geometry == GeometryMode.INDEX:
+        with stage("tile_index"):
+            tile = get_tile_index(tile_index).get(tile_id)
+        item = Item(
+            id=item_id,
+            geometry=tile.geometry,
+            bbox=tile.bbox,
+            datetime=input_datetime,
+            properties={**properties, **tile.projection()},
+            stac_extensions=[PROJECTION_EXTENSION_SCHEMA],
+            collection=collection_id,
+            assets=item_assets,
+        )
+        item.add_link(Link(RelType.COLLECTION, collection_id, MediaType.JSON))
+        if statistics != StatisticsMode.NONE or thumbnails is not None:
+            with env(), open_dataset(asset_keys[AssetType.COG], opener) as src:
+                with stage("statistics"):
+                    raster_info = get_band_statistics(src, statistics, overview_size)
+                _add_thumbnail(
+                    item,
+                    src,
+                    name.variable,
+                    thumbnails,
+                    thumbnail_size,
+                    thumbnail_format,
+                )
+    else:
+        # open the COG once and derive geometry, projection, band statistics and
+        # the thumbnail from the same dataset handle
+        with env(), open_dataset(asset_keys[AssetType.COG], opener) as src:
+            with stage("rio_stac"):
+                item = rio_stac.create_stac_item(
+                    source=src,
+                    collection=collection_id,
+                    id=item_id,
+                    input_datetime=input_datetime,
+                    properties=properties,
+                    assets=item_assets,
+                    # skip with_raster because when assets is specified, raster info
+                    # does not get attached to the asset
+                    with_raster=False,
+                    with_proj=True,
+                )
+            with stage("statistics"):
+                raster_info = get_band_statistics(src, statistics, overview_size)
+            _add_thumbnail(
+                item, src, name.variable, thumbnails, thumbnail_size, thumbnail_format
+            )
 
     for i, band in enumerate(raster_info):
         item.assets[AssetType.COG].extra_fields["bands"][i].update(band)
 
-    item.validate()
+    if parquet_metadata:
+        with stage("table"):
+            table_metadata = get_table_metadata(parquet_key, parquet_footer)
+        item.assets[AssetType.TRAINING_DATA_PARQUET].extra_fields.update(table_metadata)
+        TableExtension.add_to(item)
+
+    if checksums:
+        with stage("checksum"):
+            for asset_type, href in asset_keys.items():
+                file_info = get_file_info(href)
+                FileExtension.ext(item.assets[asset_type], add_if_missing=True).apply(
+                    size=file_info.size, checksum=file_info.checksum
+                )
+
+    validate(item, validation)
 
     return item
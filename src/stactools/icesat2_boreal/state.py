@@ -0,0 +1,150 @@
+"""Local state database for incremental catalog builds"""
+
+import hashlib
+import json
+import sqlite3
+from dataclasses import astuple, dataclass
+from datetime import datetime, timezone
+from importlib.metadata import PackageNotFoundError
+from importlib.metadata import version as package_version
+from typing import Any, Dict, Iterator, Mapping, Optional, Tuple
+
+import fsspec
+
+from stactools.icesat2_boreal.constants import VERSION
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    variable TEXT NOT NULL,
+    tile_id TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    href TEXT NOT NULL,
+    inputs TEXT NOT NULL,
+    generator TEXT NOT NULL,
+    item_hash TEXT NOT NULL,
+    updated TEXT NOT NULL,
+    PRIMARY KEY (variable, tile_id)
+)
+"""
+
+
+@dataclass(frozen=True)
+class ItemRecord:
+    """What was used to build the item for one tile, and what it produced"""
+
+    variable: str
+    tile_id: str
+    item_id: str
+    href: str
+    # fingerprint of the COG and parquet source files
+    inputs: str
+    # version of the generator and the options the item was created with
+    generator: str
+    item_hash: str
+
+
+def fingerprint(href: str) -> str:
+    """Identify the version of a source file without reading it
+
+    Uses the ETag for object stores and the size and modification time for local
+    files. Missing files get an empty fingerprint.
+    """
+    fs, path = fsspec.core.url_to_fs(href)
+    try:
+        info = fs.info(path)
+    except FileNotFoundError:
+        return ""
+
+    for key in ("ETag", "etag", "ETAG"):
+        if info.get(key):
+            return str(info[key]).strip('"')
+
+    return f"{info.get('size')}:{info.get('mtime', info.get('LastModified'))}"
+
+
+def inputs_fingerprint(cog_key: str, parquet_key: str) -> str:
+    """Combined fingerprint of the source files for one item"""
+    return f"{fingerprint(cog_key)}|{fingerprint(parquet_key)}"
+
+
+def generator_key(options: Optional[Mapping[str, Any]] = None) -> str:
+    """Identify the generator version and the options passed to create_item"""
+    try:
+        generator_version = package_version("stactools-icesat2-boreal")
+    except PackageNotFoundError:  # no cov
+        generator_version = "unknown"
+
+    return json.dumps(
+        {
+            "version": VERSION,
+            "generator": generator_version,
+            "options": dict(options or {}),
+        },
+        sort_keys=True,
+        default=str,
+    )
+
+
+def item_hash(item_dict: Mapping[str, Any]) -> str:
+    """Hash of the canonical JSON representation of an item"""
+    return hashlib.sha256(
+        json.dumps(item_dict, sort_keys=True, separators=(",", ":")).encode()
+    ).hexdigest()
+
+
+class CatalogState:
+    """SQLite record of the items built in previous runs, keyed by tile
+
+    Example:
+        >>> with CatalogState("catalog-state.db") as state:
+        ...     record = state.get("agb", "0000004")
+    """
+
+    def __init__(self, path: str) -> None:
+        """Open (or create) the state database at ``path``"""
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(SCHEMA)
+
+    def __enter__(self) -> "CatalogState":
+        """Use the state as a context manager that closes the database"""
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        """Close the database"""
+        self.close()
+
+    def close(self) -> None:
+        """Commit any pending changes and close the database"""
+        self._connection.commit()
+        self._connection.close()
+
+    def get(self, variable: str, tile_id: str) -> Optional[ItemRecord]:
+        """Get the record for one tile"""
+        row = self._connection.execute(
+            "SELECT variable, tile_id, item_id, href, inputs, generator, item_hash "
+            "FROM items WHERE variable = ? AND tile_id = ?",
+            (variable, tile_id),
+        ).fetchone()
+        return ItemRecord(*row) if row else None
+
+    def records(self) -> Dict[Tuple[str, str], ItemRecord]:
+        """All records, keyed by (variable, tile ID)"""
+        return {
+            (record.variable, record.tile_id): record for record in self._iter_records()
+        }
+
+    def _iter_records(self) -> Iterator[ItemRecord]:
+        for row in self._connection.execute(
+            "SELECT variable, tile_id, item_id, href, inputs, generator, item_hash "
+            "FROM items"
+        ):
+            yield ItemRecord(*row)
+
+    def put(self, record: ItemRecord) -> None:
+        """Insert or replace the record for a tile"""
+        self._connection.execute(
+            "INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (*astuple(record), datetime.now(timezone.utc).isoformat()),
+        )
+        self._connection.commit()
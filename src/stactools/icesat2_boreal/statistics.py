@@ -0,0 +1,285 @@
+"""Band statistics for the COG asset"""
+
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import numpy.typing as npt
+from rasterio.io import DatasetReader
+from rio_stac.stac import get_raster_info
+
+from stactools.icesat2_boreal.options import DEFAULT_OVERVIEW_SIZE, StatisticsMode
+
+HISTOGRAM_BINS = 10
+
+# band metadata items written by GDAL when statistics are computed
+STATISTICS_TAGS = {
+    "STATISTICS_MEAN": "mean",
+    "STATISTICS_MINIMUM": "minimum",
+    "STATISTICS_MAXIMUM": "maximum",
+    "STATISTICS_STDDEV": "stddev",
+    "STATISTICS_VALID_PERCENT": "valid_percent",
+}
+
+
+def get_band_info(src: DatasetReader) -> List[Dict[str, Any]]:
+    """Get the band metadata that can be read from the COG header"""
+    area_or_point = src.tags().get("AREA_OR_POINT", "").lower()
+
+    bands = []
+    for i in range(src.count):
+        band: Dict[str, Any] = {
+            "data_type": src.dtypes[i],
+            "scale": src.scales[i],
+            "offset": src.offsets[i],
+        }
+        if area_or_point:
+            band["sampling"] = area_or_point
+
+        if src.nodata is not None:
+            if np.isnan(src.nodata):
+                band["nodata"] = "nan"
+            elif np.isposinf(src.nodata):
+                band["nodata"] = "inf"
+            elif np.isneginf(src.nodata):
+                band["nodata"] = "-inf"
+            else:
+                band["nodata"] = src.nodata
+
+        if src.units[i]:
+            band["unit"] = src.units[i]
+
+        bands.append(band)
+
+    return bands
+
+
+def get_header_statistics(src: DatasetReader) -> List[Dict[str, Any]]:
+    """Get band statistics from the GDAL statistics tags without reading pixels
+
+    Bands without statistics tags only get the header band metadata.
+    """
+    bands = get_band_info(src)
+    for i, band in enumerate(bands):
+        tags = src.tags(i + 1)
+        statistics = {
+            key: float(tags[tag]) for tag, key in STATISTICS_TAGS.items() if tag in tags
+        }
+        if statistics:
+            band["statistics"] = statistics
+
+    return bands
+
+
+def select_overview_size(src: DatasetReader, target_size: int) -> int:
+    """Largest dimension of the smallest overview that is at least target_size
+
+    Falls back to the full resolution size if there is no such overview.
+    """
+    full_size = max(src.width, src.height)
+    size = full_size
+    for factor in sorted(src.overviews(1)):
+        overview_size = math.ceil(full_size / factor)
+        if overview_size < target_size:
+            break
+        size = overview_size
+
+    return size
+
+
+def get_overview_statistics(
+    src: DatasetReader, target_size: int = DEFAULT_OVERVIEW_SIZE
+) -> List[Dict[str, Any]]:
+    """Get band statistics from the smallest overview above target_size"""
+    return get_raster_info(
+        src,
+        max_size=select_overview_size(src, target_size),
+        histogram_bins=HISTOGRAM_BINS,
+    )
+
+
+@dataclass
+class BandAccumulator:
+    """Mergeable running statistics for one raster band
+
+    Moments are combined with the parallel algorithm of Chan et al. so partial
+    results computed for separate blocks (or by separate workers) can be merged
+    without loss of precision. The histogram uses fixed bins, so it can only be
+    accumulated once the range is known.
+    """
+
+    histogram_range: Optional[Tuple[float, float]] = None
+    bins: int = HISTOGRAM_BINS
+    n_pixels: int = 0
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    minimum: float = math.inf
+    maximum: float = -math.inf
+    buckets: npt.NDArray[np.int64] = field(init=False)
+
+    def __post_init__(self) -> None:
+        """Initialize empty histogram buckets"""
+        self.buckets = np.zeros(self.bins, dtype=np.int64)
+
+    def update(self, values: npt.NDArray, n_pixels: Optional[int] = None) -> None:
+        """Add the valid values of one block
+
+        Args:
+            values: Valid (non-nodata, finite) values of the block
+            n_pixels: Number of pixels in the block, valid or not, defaults to the
+                number of values
+        """
+        self.n_pixels += values.size if n_pixels is None else n_pixels
+        if not values.size:
+            return
+
+        values = values.astype(np.float64, copy=False)
+        block_mean = values.mean()
+        block = BandAccumulator(
+            histogram_range=self.histogram_range,
+            bins=self.bins,
+            count=values.size,
+            mean=block_mean,
+            m2=float(np.square(values - block_mean).sum()),
+            minimum=float(values.min()),
+            maximum=float(values.max()),
+        )
+        if self.histogram_range is not None:
+            block.buckets = np.histogram(
+                values, bins=self.bins, range=self.histogram_range
+            )[0]
+        self._merge_moments(block)
+
+    def _merge_moments(self, other: "BandAccumulator") -> None:
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta**2 * self.count * other.count / count
+        self.count = count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self.buckets += other.buckets
+
+    def merge(self, other: "BandAccumulator") -> "BandAccumulator":
+        """Combine this accumulator with another one for the same band
+
+        Raises:
+            ValueError: if the histograms use different bins
+        """
+        if (self.histogram_range, self.bins) != (other.histogram_range, other.bins):
+            raise ValueError("Cannot merge accumulators with different histogram bins")
+
+        merged = BandAccumulator(
+            histogram_range=self.histogram_range,
+            bins=self.bins,
+            n_pixels=self.n_pixels + other.n_pixels,
+            count=self.count,
+            mean=self.mean,
+            m2=self.m2,
+            minimum=self.minimum,
+            maximum=self.maximum,
+        )
+        merged.buckets = self.buckets.copy()
+        merged._merge_moments(other)
+        return merged
+
+    def statistics(self) -> Dict[str, float]:
+        """STAC statistics object"""
+        return {
+            "mean": float(self.mean),
+            "minimum": float(self.minimum),
+            "maximum": float(self.maximum),
+            "stddev": math.sqrt(self.m2 / self.count),
+            "valid_percent": self.count / self.n_pixels * 100,
+        }
+
+    def histogram(self) -> Dict[str, Any]:
+        """STAC histogram object"""
+        edges = np.histogram_bin_edges([], bins=self.bins, range=self.histogram_range)
+        return {
+            "count": len(edges),
+            "min": float(edges.min()),
+            "max": float(edges.max()),
+            "buckets": self.buckets.tolist(),
+        }
+
+
+def _iter_blocks(src: DatasetReader) -> Iterator[Tuple[int, List[npt.NDArray]]]:
+    """Read the COG one internal tile at a time
+
+    Yields:
+        The number of pixels in the block and the valid values of each band
+    """
+    for _, window in src.block_windows(1):
+        data = np.ma.fix_invalid(src.read(window=window, masked=True), copy=False)
+        yield data.shape[1] * data.shape[2], [band.compressed() for band in data]
+
+
+def accumulate_blocks(
+    src: DatasetReader,
+    histogram_ranges: Optional[Sequence[Optional[Tuple[float, float]]]] = None,
+) -> List[BandAccumulator]:
+    """Accumulate statistics for every band in one pass over the COG blocks
+
+    Args:
+        src: Open COG dataset
+        histogram_ranges: Per-band histogram ranges, or None to skip histograms
+    """
+    ranges = histogram_ranges or [None] * src.count
+    accumulators = [BandAccumulator(histogram_range=r) for r in ranges]
+    for n_pixels, bands in _iter_blocks(src):
+        for accumulator, values in zip(accumulators, bands, strict=True):
+            accumulator.update(values, n_pixels)
+
+    return accumulators
+
+
+def get_exact_statistics(src: DatasetReader) -> List[Dict[str, Any]]:
+    """Get band statistics from every pixel, reading one block at a time
+
+    The first pass over the blocks computes the moments and range of each band and
+    the second pass fills fixed-bin histograms over that range, so memory use is
+    bounded by the block size rather than the raster size.
+    """
+    moments = accumulate_blocks(src)
+    histograms = accumulate_blocks(
+        src,
+        [(a.minimum, a.maximum) if a.count else None for a in moments],
+    )
+
+    bands = get_band_info(src)
+    for band, accumulator in zip(bands, histograms, strict=True):
+        if accumulator.count:
+            band["statistics"] = accumulator.statistics()
+            band["histogram"] = accumulator.histogram()
+
+    return bands
+
+
+def get_band_statistics(
+    src: DatasetReader,
+    mode: StatisticsMode = StatisticsMode.EXACT,
+    overview_size: int = DEFAULT_OVERVIEW_SIZE,
+) -> List[Dict[str, Any]]:
+    """Get band metadata and statistics for each band of a COG
+
+    Args:
+        src: Open COG dataset
+        mode: How pixels are read to compute the statistics
+        overview_size: Target size for the overview in ``overview`` mode
+
+    Returns:
+        List[Dict[str, Any]]: One band object per band, with ``statistics`` and
+            ``histogram`` fields where they could be computed
+    """
+    if mode == StatisticsMode.NONE:
+        return []
+    if mode == StatisticsMode.HEADER:
+        return get_header_statistics(src)
+    if mode == StatisticsMode.OVERVIEW:
+        return get_overview_statistics(src, overview_size)
+    return get_exact_statistics(src)
@@ -0,0 +1,485 @@
+"""Compact columnar store of the items of a generated catalog
+
+Holding thousands of pystac items in memory keeps nested dictionaries, links and
+asset objects alive for every tile. :class:`ItemStore` keeps the fields that vary
+between items in numpy arrays instead, stores repeated values such as the CRS and
+the band metadata once, and rebuilds items from the shared :mod:`templates` only
+when they are needed.
+"""
+
+import json
+import math
+from dataclasses import dataclass, field
+from functools import cache
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+import numpy as np
+import numpy.typing as npt
+import stactools.core
+from pystac import Item, get_stac_version
+from pystac.utils import datetime_to_str
+
+from stactools.icesat2_boreal.constants import PROJECTION_EXTENSION_SCHEMA, AssetType
+from stactools.icesat2_boreal.options import (
+    DEFAULT_ROW_GROUP_SIZE,
+    OutputFormat,
+    Variable,
+)
+from stactools.icesat2_boreal.statistics import HISTOGRAM_BINS
+from stactools.icesat2_boreal.templates import (
+    ItemName,
+    ItemTemplate,
+    get_item_template,
+)
+from stactools.icesat2_boreal.writers import ItemWriter, open_writer
+
+# write JSON items to S3 and other remote filesystems
+stactools.core.use_fsspec()
+
+# band statistics, in the order of the last axis of ItemStore.statistics
+STATISTICS_FIELDS = ("mean", "minimum", "maximum", "stddev", "valid_percent")
+
+# key of a patch listing the keys removed from the rebuilt dictionary
+DELETED_KEYS = "__deleted__"
+
+# returned by _diff when there is nothing to patch
+_UNCHANGED = object()
+
+
+def _equal(actual: Any, expected: Any) -> bool:
+    """Compare JSON values, treating lists and tuples alike"""
+    if actual == expected:
+        return True
+    if isinstance(actual, (list, tuple)) and isinstance(expected, (list, tuple)):
+        return len(actual) == len(expected) and all(map(_equal, actual, expected))
+    if isinstance(actual, dict) and isinstance(expected, dict):
+        return actual.keys() == expected.keys() and all(
+            _equal(value, expected[key]) for key, value in actual.items()
+        )
+    return False
+
+
+def _diff(actual: Any, expected: Any) -> Any:
+    """Patch that turns ``expected`` into ``actual``"""
+    if isinstance(actual, dict) and isinstance(expected, dict):
+        patch: Dict[str, Any] = {}
+        for key, value in actual.items():
+            if key not in expected:
+                patch[key] = value
+                continue
+            change = _diff(value, expected[key])
+            if change is not _UNCHANGED:
+                patch[key] = change
+        deleted = [key for key in expected if key not in actual]
+        if deleted:
+            patch[DELETED_KEYS] = deleted
+        return patch or _UNCHANGED
+
+    return _UNCHANGED if _equal(actual, expected) else actual
+
+
+def _apply(target: Dict[str, Any], patch: Dict[str, Any]) -> None:
+    """Apply a patch made by :func:`_diff` in place"""
+    for key, value in patch.items():
+        if key == DELETED_KEYS:
+            for deleted in value:
+                target.pop(deleted, None)
+        elif isinstance(value, dict) and isinstance(target.get(key), dict):
+            _apply(target[key], value)
+        else:
+            target[key] = value
+
+
+def _floats(values: Any, size: int) -> List[float]:
+    """``values`` as ``size`` floats, NaN if they are something else"""
+    if isinstance(values, (list, tuple)) and len(values) == size:
+        try:
+            return [math.nan if value is None else float(value) for value in values]
+        except (TypeError, ValueError):
+            pass
+    return [math.nan] * size
+
+
+def _ring(bbox: List[float]) -> List[List[float]]:
+    minx, miny, maxx, maxy = bbox
+    return [[minx, miny], [maxx, miny], [maxx, maxy], [minx, maxy], [minx, miny]]
+
+
+@cache
+def _nominal_datetime(variable: Variable, year: int) -> str:
+    return datetime_to_str(get_item_template(variable, year).datetime)
+
+
+def _asset_dict(
+    template: ItemTemplate, asset_type: AssetType, href: str
+) -> Dict[str, Any]:
+    """Asset dictionary as written by pystac, from the template of the asset"""
+    skeleton = template.assets[asset_type]
+    asset: Dict[str, Any] = {"href": href}
+    if skeleton.media_type is not None:
+        asset["type"] = skeleton.media_type
+    if skeleton.title is not None:
+        asset["title"] = skeleton.title
+    if skeleton.description is not None:
+        asset["description"] = skeleton.description
+    asset.update(skeleton.extra_fields)
+    asset["roles"] = list(skeleton.roles)
+    return asset
+
+
+@dataclass
+class _Dictionary:
+    """Distinct JSON values of a column, referenced by their position"""
+
+    values: List[str] = field(default_factory=list)
+    codes: Dict[str, int] = field(default_factory=dict)
+
+    def encode(self, value: Any) -> int:
+        key = json.dumps(value)
+        code = self.codes.get(key)
+        if code is None:
+            code = self.codes[key] = len(self.values)
+            self.values.append(key)
+        return code
+
+    def decode(self, code: int) -> Any:
+        # parsed on every call, so each item gets its own copy
+        return json.loads(self.values[code])
+
+
+class _Row(NamedTuple):
+    """Column values of one item"""
+
+    name: ItemName
+    in_daac: bool
+    bbox: List[float]
+    footprint: List[List[float]]
+    proj_bbox: List[float]
+    proj_shape: List[int]
+    proj_transform: List[float]
+    crs: int
+    bands: int
+    cog_href: str
+    parquet_href: str
+    # one list per band
+    statistics: List[List[float]]
+    histogram_range: List[List[float]]
+    histogram_buckets: List[List[int]]
+
+
+class ItemStore:
+    """Array backed store of the items of one or more collections
+
+    Item ``i`` is rebuilt on demand with :meth:`to_dict` or :meth:`to_item`, and
+    :meth:`save` writes every item without creating pystac objects. The columns
+    are numpy arrays with one row per item, e.g. ``store.bbox[:, 0].min()`` is
+    the western edge of the catalog.
+
+    Fields that the columns do not cover, e.g. table extension fields or links
+    added by a catalog, are kept in a per-item patch, so items are reproduced
+    exactly.
+    """
+
+    def __init__(self, item_dicts: Iterable[Dict[str, Any]]) -> None:
+        """Store STAC item dictionaries"""
+        self._crs = _Dictionary()
+        self._bands = _Dictionary()
+        self._patches: Dict[int, Dict[str, Any]] = {}
+
+        rows = []
+        for item_dict in item_dicts:
+            row = self._to_row(item_dict)
+            patch = _diff(item_dict, self._build(row))
+            if patch is not _UNCHANGED:
+                self._patches[len(rows)] = patch
+            rows.append(row)
+
+        self.item_id: npt.NDArray[np.str_] = np.array(
+            [row.name.item_id for row in rows], dtype=str
+        )
+        self.variable: npt.NDArray[np.str_] = np.array(
+            [row.name.variable.value for row in rows], dtype=str
+        )
+        self.year: npt.NDArray[np.int16] = np.array(
+            [row.name.year for row in rows], dtype=np.int16
+        )
+        self.run_id: npt.NDArray[np.str_] = np.array(
+            [row.name.run_id for row in rows], dtype=str
+        )
+        self.tile_id: npt.NDArray[np.str_] = np.array(
+            [row.name.tile_id for row in rows], dtype=str
+        )
+        self.in_daac: npt.NDArray[np.bool_] = np.array(
+            [row.in_daac for row in rows], dtype=bool
+        )
+        # EPSG:4326 bbox and footprint polygon
+        self.bbox: npt.NDArray[np.float64] = np.array(
+            [row.bbox for row in rows], dtype=np.float64
+        ).reshape(-1, 4)
+        self.footprint: npt.NDArray[np.float64] = np.array(
+            [row.footprint for row in rows], dtype=np.float64
+        ).reshape(-1, 5, 2)
+        # projection extension fields, in the tile CRS
+        self.proj_bbox: npt.NDArray[np.float64] = np.array(
+            [row.proj_bbox for row in rows], dtype=np.float64
+        ).reshape(-1, 4)
+        self.proj_shape: npt.NDArray[np.int32] = np.array(
+            [row.proj_shape for row in rows], dtype=np.int32
+        ).reshape(-1, 2)
+        self.proj_transform: npt.NDArray[np.float64] = np.array(
+            [row.proj_transform for row in rows], dtype=np.float64
+        ).reshape(-1, 9)
+        self.cog_href: npt.NDArray[np.object_] = np.array(
+            [row.cog_href for row in rows], dtype=object
+        )
+        self.parquet_href: npt.NDArray[np.object_] = np.array(
+            [row.parquet_href for row in rows], dtype=object
+        )
+        self._crs_codes = np.array([row.crs for row in rows], dtype=np.int32)
+        self._band_codes = np.array([row.bands for row in rows], dtype=np.int32)
+
+        # band statistics and histograms by item and band, NaN where missing
+        bands = max((len(row.statistics) for row in rows), default=0)
+        self.statistics: npt.NDArray[np.float64] = np.full(
+            (len(rows), bands, len(STATISTICS_FIELDS)), np.nan
+        )
+        self.histogram_range: npt.NDArray[np.float64] = np.full(
+            (len(rows), bands, 2), np.nan
+        )
+        self.histogram_buckets: npt.NDArray[np.int64] = np.zeros(
+            (len(rows), bands, HISTOGRAM_BINS), dtype=np.int64
+        )
+        for index, row in enumerate(rows):
+            count = len(row.statistics)
+            if count:
+                self.statistics[index, :count] = row.statistics
+                self.histogram_range[index, :count] = row.histogram_range
+                self.histogram_buckets[index, :count] = row.histogram_buckets
+
+    @classmethod
+    def from_items(cls, items: Iterable[Item]) -> "ItemStore":
+        """Store pystac items, which can be released afterwards"""
+        return cls(item.to_dict(include_self_link=False) for item in items)
+
+    def __len__(self) -> int:
+        """Number of items"""
+        return len(self.item_id)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Iterate over the item dictionaries"""
+        return (self.to_dict(index) for index in range(len(self)))
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate size of the store in memory"""
+        arrays = sum(
+            array.nbytes
+            for array in vars(self).values()
+            if isinstance(array, np.ndarray)
+        )
+        hrefs = sum(map(len, self.cog_href)) + sum(map(len, self.parquet_href))
+        shared = sum(map(len, self._crs.values)) + sum(map(len, self._bands.values))
+        patches = sum(len(json.dumps(patch)) for patch in self._patches.values())
+        return arrays + hrefs + shared + patches
+
+    def band_groups(self) -> Iterator[Tuple[List[str], npt.NDArray[np.intp]]]:
+        """Band names of the COG asset and the rows of the items with those bands"""
+        for code in np.unique(self._band_codes):
+            names = [band.get("name") for band in self._bands.decode(int(code))]
+            yield names, np.flatnonzero(self._band_codes == code)
+
+    def to_dict(self, index: int) -> Dict[str, Any]:
+        """STAC dictionary of item ``index``"""
+        item_dict = self._build(self._row(index))
+        patch = self._patches.get(index)
+        if patch is not None:
+            # copied, so changes to the returned dictionary do not leak into the store
+            _apply(item_dict, json.loads(json.dumps(patch)))
+        return item_dict
+
+    def to_item(self, index: int) -> Item:
+        """Pystac item of item ``index``"""
+        return Item.from_dict(self.to_dict(index), preserve_dict=False, migrate=False)
+
+    def iter_items(self) -> Iterator[Item]:
+        """Iterate over the items as pystac items"""
+        return (self.to_item(index) for index in range(len(self)))
+
+    def write(self, writer: ItemWriter) -> None:
+        """Write every item with a batch output writer"""
+        for item_dict in self:
+            writer.write_dict(item_dict)
+
+    def save(
+        self,
+        destination: str,
+        output_format: OutputFormat = OutputFormat.NDJSON,
+        row_group_size: Optional[int] = DEFAULT_ROW_GROUP_SIZE,
+    ) -> None:
+        """Write every item to JSON files, an ndjson or a stac-geoparquet file
+
+        Args:
+            destination: Directory for ``json`` output, file HREF otherwise
+            output_format: Format of the output
+            row_group_size: Rows per row group for ``geoparquet`` output
+        """
+        with open_writer(output_format, destination, row_group_size) as writer:
+            self.write(writer)
+
+    def _to_row(self, item_dict: Dict[str, Any]) -> _Row:
+        properties = item_dict.get("properties", {})
+        assets = item_dict.get("assets", {})
+        cog = assets.get(AssetType.COG.value, {})
+        parquet = assets.get(AssetType.TRAINING_DATA_PARQUET.value, {})
+
+        geometry = item_dict.get("geometry") or {}
+        rings = geometry.get("coordinates") or []
+        ring = rings[0] if geometry.get("type") == "Polygon" and len(rings) == 1 else []
+        shape = properties.get("proj:shape")
+
+        statistics, histogram_range, histogram_buckets, bands = [], [], [], []
+        for band in cog.get("bands", []):
+            band = dict(band)
+            values = band.pop("statistics", {})
+            statistics.append(
+                _floats([values.get(name) for name in STATISTICS_FIELDS], 5)
+            )
+            histogram = band.pop("histogram", {})
+            buckets = histogram.get("buckets", [])
+            if len(buckets) == HISTOGRAM_BINS:
+                histogram_range.append(
+                    _floats([histogram.get("min"), histogram.get("max")], 2)
+                )
+                histogram_buckets.append(list(buckets))
+            else:
+                histogram_range.append([math.nan, math.nan])
+                histogram_buckets.append([0] * HISTOGRAM_BINS)
+            bands.append(band)
+
+        return _Row(
+            name=ItemName.from_key(item_dict["id"]),
+            in_daac=bool(properties.get("icesat2-boreal:in_daac")),
+            bbox=_floats(item_dict.get("bbox"), 4),
+            footprint=(
+                [_floats(point, 2) for point in ring]
+                if len(ring) == 5
+                else [[math.nan, math.nan]] * 5
+            ),
+            proj_bbox=_floats(properties.get("proj:bbox"), 4),
+            proj_shape=(
+                list(shape)
+                if isinstance(shape, (list, tuple)) and len(shape) == 2
+                else [0, 0]
+            ),
+            proj_transform=_floats(properties.get("proj:transform"), 9),
+            crs=self._crs.encode(
+                [properties.get("proj:epsg"), properties.get("proj:wkt2")]
+            ),
+            bands=self._bands.encode(bands),
+            cog_href=cog.get("href", ""),
+            parquet_href=parquet.get("href", ""),
+            statistics=statistics,
+            histogram_range=histogram_range,
+            histogram_buckets=histogram_buckets,
+        )
+
+    def _row(self, index: int) -> _Row:
+        return _Row(
+            name=ItemName(
+                item_id=str(self.item_id[index]),
+                variable=Variable(str(self.variable[index])),
+                year=int(self.year[index]),
+                run_id=str(self.run_id[index]),
+                tile_id=str(self.tile_id[index]),
+            ),
+            in_daac=bool(self.in_daac[index]),
+            bbox=self.bbox[index].tolist(),
+            footprint=self.footprint[index].tolist(),
+            proj_bbox=self.proj_bbox[index].tolist(),
+            proj_shape=self.proj_shape[index].tolist(),
+            proj_transform=self.proj_transform[index].tolist(),
+            crs=int(self._crs_codes[index]),
+            bands=int(self._band_codes[index]),
+            cog_href=self.cog_href[index],
+            parquet_href=self.parquet_href[index],
+            statistics=self.statistics[index].tolist(),
+            histogram_range=self.histogram_range[index].tolist(),
+            histogram_buckets=self.histogram_buckets[index].tolist(),
+        )
+
+    def _build(self, row: _Row) -> Dict[str, Any]:
+        """Item dictionary from its template and columns, without its patch"""
+        name = row.name
+        template = get_item_template(name.variable, name.year)
+        epsg, wkt2 = self._crs.decode(row.crs)
+
+        bands = self._bands.decode(row.bands)
+        for band, statistics, (low, high), buckets in zip(
+            bands,
+            row.statistics,
+            row.histogram_range,
+            row.histogram_buckets,
+            strict=False,
+        ):
+            values = {
+                key: value
+                for key, value in zip(STATISTICS_FIELDS, statistics, strict=True)
+                if not math.isnan(value)
+            }
+            if values:
+                band["statistics"] = values
+            if not math.isnan(low):
+                band["histogram"] = {
+                    "count": HISTOGRAM_BINS + 1,
+                    "min": low,
+                    "max": high,
+                    "buckets": buckets,
+                }
+        cog = _asset_dict(template, AssetType.COG, row.cog_href)
+        cog["bands"] = bands
+
+        return {
+            "type": "Feature",
+            "stac_version": get_stac_version(),
+            "stac_extensions": [PROJECTION_EXTENSION_SCHEMA],
+            "id": name.item_id,
+            "geometry": {"type": "Polygon", "coordinates": [row.footprint]},
+            "bbox": row.bbox,
+            "properties": {
+                **template.create_properties(name),
+                "icesat2-boreal:in_daac": row.in_daac,
+                "proj:epsg": epsg,
+                "proj:geometry": {
+                    "type": "Polygon",
+                    "coordinates": [_ring(row.proj_bbox)],
+                },
+                "proj:bbox": row.proj_bbox,
+                "proj:shape": row.proj_shape,
+                "proj:transform": row.proj_transform,
+                "proj:wkt2": wkt2,
+                "datetime": _nominal_datetime(name.variable, name.year),
+            },
+            "links": [
+                {
+                    "rel": "collection",
+                    "href": template.collection_id,
+                    "type": "application/json",
+                }
+            ],
+            "assets": {
+                AssetType.COG.value: cog,
+                AssetType.TRAINING_DATA_PARQUET.value: _asset_dict(
+                    template, AssetType.TRAINING_DATA_PARQUET, row.parquet_href
+                ),
+            },
+            "collection": template.collection_id,
+        }
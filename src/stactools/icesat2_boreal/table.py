@@ -0,0 +1,103 @@
+"""Table extension metadata for the training data parquet asset"""
+
+import struct
+from typing import Any, Dict, List, Optional
+
+import fsspec
+
+from stactools.icesat2_boreal.metrics import count_bytes
+from stactools.icesat2_boreal.prefetch import DEFAULT_FOOTER_SIZE
+
+PARQUET_MAGIC = b"PAR1"
+
+
+def _import_pyarrow() -> Any:
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as error:
+        raise ImportError(
+            "Reading parquet metadata requires pyarrow: "
+            "pip install 'stactools-icesat2-boreal[parquet]'"
+        ) from error
+    return pyarrow
+
+
+def read_footer(href: str, footer_size: int = DEFAULT_FOOTER_SIZE) -> bytes:
+    """Read the last ``footer_size`` bytes of a parquet file"""
+    fs, path = fsspec.core.url_to_fs(href)
+    footer = fs.tail(path, footer_size)
+    count_bytes(len(footer))
+    return footer
+
+
+def read_parquet_metadata(href: str, footer: Optional[bytes] = None) -> Any:
+    """Read the metadata of a parquet file without reading any data pages
+
+    Args:
+        href: HREF of the parquet file
+        footer: Prefetched tail of the file. If it does not hold all of the file
+            metadata, the missing bytes are read with one more range request.
+
+    Returns:
+        pyarrow.parquet.FileMetaData: row count, schema and row group statistics
+    """
+    pyarrow = _import_pyarrow()
+    if footer is None:
+        footer = read_footer(href)
+
+    if len(footer) < 8 or footer[-4:] != PARQUET_MAGIC:
+        raise ValueError(f"{href} is not a parquet file")
+
+    (metadata_length,) = struct.unpack("<i", footer[-8:-4])
+    if metadata_length + 8 > len(footer):
+        footer = read_footer(href, metadata_length + 8)
+
+    return pyarrow.parquet.read_metadata(pyarrow.BufferReader(footer))
+
+
+def _is_numeric(data_type: Any) -> bool:
+    types = _import_pyarrow().types
+    return bool(types.is_integer(data_type) or types.is_floating(data_type))
+
+
+def _column_statistics(metadata: Any, index: int) -> Optional[Dict[str, Any]]:
+    """Minimum and maximum of a column over all row groups, from the footer only"""
+    minimum = maximum = None
+    for i in range(metadata.num_row_groups):
+        statistics = metadata.row_group(i).column(index).statistics
+        if statistics is None or not statistics.has_min_max:
+            return None
+        minimum = statistics.min if minimum is None else min(minimum, statistics.min)
+        maximum = statistics.max if maximum is None else max(maximum, statistics.max)
+
+    if minimum is None:
+        return None
+    return {"minimum": minimum, "maximum": maximum}
+
+
+def get_table_metadata(href: str, footer: Optional[bytes] = None) -> Dict[str, Any]:
+    """Get table extension fields for a parquet asset from its footer
+
+    Numeric columns (e.g. the latitude, longitude and biomass or height
+    observations) get the minimum and maximum over all row groups.
+
+    Returns:
+        Dict[str, Any]: ``table:row_count`` and ``table:columns`` asset fields
+    """
+    metadata = read_parquet_metadata(href, footer)
+    schema = metadata.schema.to_arrow_schema()
+
+    columns: List[Dict[str, Any]] = []
+    for index, arrow_field in enumerate(schema):
+        column: Dict[str, Any] = {
+            "name": arrow_field.name,
+            "type": str(arrow_field.type),
+        }
+        if _is_numeric(arrow_field.type):
+            statistics = _column_statistics(metadata, index)
+            if statistics is not None:
+                column["statistics"] = statistics
+        columns.append(column)
+
+    return {"table:row_count": metadata.num_rows, "table:columns": columns}
@@ -0,0 +1,120 @@
+"""Fields shared by all items of a variable and year, computed once per process"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from functools import cache, lru_cache
+from typing import Any, Dict, List, Mapping, Optional
+
+from dateutil.relativedelta import relativedelta
+from pystac import Asset
+
+from stactools.icesat2_boreal.constants import (
+    COLLECTION_ID_FORMAT,
+    ITEM_ASSETS,
+    VERSION,
+    AssetType,
+)
+from stactools.icesat2_boreal.keys import ItemName
+from stactools.icesat2_boreal.options import Variable
+
+
+@lru_cache(maxsize=1024)
+def created_datetime(run_id: str) -> str:
+    """ISO creation date of a run, shared by the many tiles of the run"""
+    return (
+        datetime.strptime(run_id[:8], "%Y%m%d").replace(tzinfo=timezone.utc).isoformat()
+    )
+
+
+@dataclass(frozen=True)
+class AssetSkeleton:
+    """Everything about an item asset except its HREF"""
+
+    title: Optional[str]
+    description: Optional[str]
+    media_type: Optional[str]
+    roles: List[str]
+    extra_fields: Dict[str, Any]
+
+    def create_asset(self, href: str) -> Asset:
+        """Create the asset, with its own copy of the mutable fields"""
+        extra_fields = dict(self.extra_fields)
+        if "bands" in extra_fields:
+            # band dictionaries are updated with the statistics of each item
+            extra_fields["bands"] = [dict(band) for band in extra_fields["bands"]]
+        return Asset(
+            href=href,
+            title=self.title,
+            description=self.description,
+            media_type=self.media_type,
+            roles=list(self.roles),
+            extra_fields=extra_fields,
+        )
+
+
+@dataclass(frozen=True)
+class ItemTemplate:
+    """Fields shared by all items of a variable and year
+
+    Use :func:`get_item_template` so the template is built once per process.
+    """
+
+    variable: Variable
+    year: int
+    collection_id: str
+    # middle of the year, the nominal datetime of the item
+    datetime: datetime
+    # properties shared by every item: the start and end of the year
+    properties: Dict[str, Any]
+    assets: Dict[AssetType, AssetSkeleton]
+
+    @classmethod
+    def build(cls, variable: Variable, year: int) -> "ItemTemplate":
+        """Compute the template of a variable and year"""
+        start = datetime(year, 1, 1)
+        end = start + relativedelta(years=1) - timedelta(seconds=1)
+        assets = {}
+        for asset_type, definition in ITEM_ASSETS[variable].items():
+            fields = definition.to_dict()
+            assets[asset_type] = AssetSkeleton(
+                title=fields.pop("title", None),
+                description=fields.pop("description", None),
+                media_type=fields.pop("type", None),
+                roles=fields.pop("roles", []),
+                extra_fields=fields,
+            )
+
+        return cls(
+            variable=variable,
+            year=year,
+            collection_id=COLLECTION_ID_FORMAT.format(
+                version=VERSION, variable=variable.value
+            ),
+            datetime=start + (end - start) / 2,
+            properties={
+                "start_datetime": start.replace(tzinfo=timezone.utc).isoformat(),
+                "end_datetime": end.replace(tzinfo=timezone.utc).isoformat(),
+            },
+            assets=assets,
+        )
+
+    def create_assets(self, hrefs: Mapping[AssetType, str]) -> Dict[str, Asset]:
+        """Create the assets of an item from their HREFs"""
+        return {
+            str(asset_type): self.assets[asset_type].create_asset(href)
+            for asset_type, href in hrefs.items()
+        }
+
+    def create_properties(self, name: ItemName) -> Dict[str, Any]:
+        """Create the properties of an item that can be derived from its ID"""
+        return {
+            **self.properties,
+            "created_datetime": created_datetime(name.run_id),
+            "icesat2-boreal:tile_id": name.tile_id,
+        }
+
+
+@cache
+def get_item_template(variable: Variable, year: int) -> ItemTemplate:
+    """Shared item template of a variable and year for this process"""
+    return ItemTemplate.build(variable, year)
@@ -0,0 +1,184 @@
+"""Item thumbnails rendered from the smallest COG overview"""
+
+import math
+import os
+import warnings
+from typing import Dict, List, Tuple
+
+import fsspec
+import numpy as np
+import numpy.typing as npt
+from pystac import Asset, MediaType
+from rasterio.enums import Resampling
+from rasterio.errors import NotGeoreferencedWarning
+from rasterio.io import DatasetReader, MemoryFile
+
+from stactools.icesat2_boreal.constants import RENDERS
+from stactools.icesat2_boreal.options import (
+    DEFAULT_THUMBNAIL_SIZE,
+    ThumbnailFormat,
+    Variable,
+)
+
+THUMBNAIL_ASSET_KEY = "thumbnail"
+
+MEDIA_TYPES = {
+    ThumbnailFormat.PNG: MediaType.PNG,
+    ThumbnailFormat.WEBP: "image/webp",
+}
+
+# evenly spaced stops of the matplotlib colormaps used by the renders, which are
+# interpolated to 256 colors
+COLORMAP_STOPS: Dict[str, List[str]] = {
+    "viridis": [
+        "#440154",
+        "#482878",
+        "#3e4a89",
+        "#31688e",
+        "#26828e",
+        "#1f9e89",
+        "#35b779",
+        "#6dcd59",
+        "#b4de2c",
+        "#fde725",
+    ],
+    "inferno": [
+        "#000004",
+        "#1b0c42",
+        "#4b0c6b",
+        "#781c6d",
+        "#a52c60",
+        "#cf4446",
+        "#ed6925",
+        "#fb9a06",
+        "#f7d03c",
+        "#fcffa4",
+    ],
+}
+
+
+def get_colormap(name: str) -> npt.NDArray[np.uint8]:
+    """256 RGB colors of a colormap
+
+    Raises:
+        ValueError: if the colormap is not one of :data:`COLORMAP_STOPS`
+    """
+    if name not in COLORMAP_STOPS:
+        raise ValueError(f"Unsupported colormap: {name}")
+
+    stops = np.array(
+        [list(bytes.fromhex(color[1:])) for color in COLORMAP_STOPS[name]],
+        dtype=np.float64,
+    )
+    positions = np.linspace(0, 1, len(stops))
+    values = np.linspace(0, 1, 256)
+    colormap = [np.interp(values, positions, stops[:, i]) for i in range(3)]
+    return np.stack(colormap, axis=-1).round().astype(np.uint8)
+
+
+def get_render_options(variable: Variable) -> Tuple[Tuple[float, float], str]:
+    """Rescale range and colormap of the first render of a variable"""
+    render = next(iter(RENDERS[variable].values()))
+    [[minimum, maximum]] = render.rescale
+    return (minimum, maximum), render.colormap_name
+
+
+def thumbnail_shape(src: DatasetReader, max_size: int) -> Tuple[int, int]:
+    """Shape of the smallest overview, scaled down to ``max_size`` if larger"""
+    factor = max(src.overviews(1), default=1)
+    height, width = math.ceil(src.height / factor), math.ceil(src.width / factor)
+    scale = min(1.0, max_size / max(height, width))
+    return max(1, round(height * scale)), max(1, round(width * scale))
+
+
+def read_thumbnail(
+    src: DatasetReader, max_size: int = DEFAULT_THUMBNAIL_SIZE
+) -> np.ma.MaskedArray:
+    """Read the first band at thumbnail size
+
+    GDAL serves the read from the smallest overview, so only a few blocks are read
+    and memory is bounded by the thumbnail size.
+    """
+    data = src.read(
+        1,
+        out_shape=thumbnail_shape(src, max_size),
+        masked=True,
+        resampling=Resampling.average,
+    )
+    return np.ma.fix_invalid(data, copy=False)
+
+
+def render(
+    data: np.ma.MaskedArray, rescale: Tuple[float, float], colormap: str
+) -> npt.NDArray[np.uint8]:
+    """Rescale and colorize a band into an RGBA image, transparent where masked"""
+    minimum, maximum = rescale
+    scaled = (data.filled(minimum).astype(np.float64) - minimum) / (maximum - minimum)
+    indices = np.clip(np.rint(scaled * 255), 0, 255).astype(np.uint8)
+    rgb = get_colormap(colormap)[indices]
+    alpha = np.where(np.ma.getmaskarray(data), 0, 255).astype(np.uint8)
+    return np.concatenate([rgb, alpha[..., np.newaxis]], axis=-1).transpose(2, 0, 1)
+
+
+def encode(
+    rgba: npt.NDArray[np.uint8], image_format: ThumbnailFormat = ThumbnailFormat.PNG
+) -> bytes:
+    """Encode an RGBA image (bands first) as PNG or WebP"""
+    options = {"LOSSLESS": True} if image_format == ThumbnailFormat.WEBP else {}
+    with warnings.catch_warnings(), MemoryFile() as memory_file:
+        # thumbnails are plain images without a geotransform
+        warnings.simplefilter("ignore", NotGeoreferencedWarning)
+        with memory_file.open(
+            driver=image_format.upper(),
+            count=4,
+            height=rgba.shape[1],
+            width=rgba.shape[2],
+            dtype="uint8",
+            **options,
+        ) as dst:
+            dst.write(rgba)
+        return memory_file.read()
+
+
+def create_thumbnail(
+    src: DatasetReader,
+    variable: Variable,
+    max_size: int = DEFAULT_THUMBNAIL_SIZE,
+    image_format: ThumbnailFormat = ThumbnailFormat.PNG,
+) -> bytes:
+    """Render the thumbnail of a COG with the default render of its variable"""
+    rescale, colormap = get_render_options(variable)
+    rgba = render(read_thumbnail(src, max_size), rescale, colormap)
+    return encode(rgba, image_format)
+
+
+def write_thumbnail(
+    src: DatasetReader,
+    variable: Variable,
+    destination: str,
+    item_id: str,
+    max_size: int = DEFAULT_THUMBNAIL_SIZE,
+    image_format: ThumbnailFormat = ThumbnailFormat.PNG,
+) -> Asset:
+    """Write the thumbnail of a COG to a directory and return its asset
+
+    Args:
+        src: Open COG dataset
+        variable: Variable of the COG, which selects the render
+        destination: Local directory or URL prefix of the thumbnails
+        item_id: ID of the item, the name of the thumbnail file
+        max_size: Longest side of the thumbnail
+        image_format: PNG or (lossless) WebP
+    """
+    href = os.path.join(destination, f"{item_id}.{image_format}")
+    data = create_thumbnail(src, variable, max_size, image_format)
+    fs, path = fsspec.core.url_to_fs(href)
+    fs.makedirs(fs._parent(path), exist_ok=True)
+    fs.pipe_file(path, data)
+
+    return Asset(
+        href=href,
+        media_type=MEDIA_TYPES[image_format],
+        roles=["thumbnail"],
+        title="Thumbnail",
+    )
@@ -0,0 +1,240 @@
+"""Precomputed geometry index of the 90 km processing tiles"""
+
+import json
+import os
+import sqlite3
+import tempfile
+from dataclasses import dataclass
+from functools import cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import fsspec
+import numpy as np
+import numpy.typing as npt
+import shapely
+from rasterio.crs import CRS
+from rasterio.features import bounds as feature_bounds
+from rasterio.warp import transform_geom
+
+from stactools.icesat2_boreal.constants import RESOLUTION
+from stactools.icesat2_boreal.options import TILE_ID_COLUMN
+
+TILE_INDEX_ENV_VAR = "ICESAT2_BOREAL_TILE_INDEX"
+
+# size in bytes of the envelope in a GeoPackage geometry blob, by envelope indicator
+GPKG_ENVELOPE_SIZES = {0: 0, 1: 32, 2: 48, 3: 48, 4: 64}
+
+
+def parse_gpkg_geometry(blob: bytes) -> shapely.Geometry:
+    """Parse a GeoPackage geometry blob (header, optional envelope and WKB)"""
+    if blob[:2] != b"GP":
+        raise ValueError("Not a GeoPackage geometry")
+    envelope_indicator = (blob[3] >> 1) & 0b111
+    return shapely.from_wkb(blob[8 + GPKG_ENVELOPE_SIZES[envelope_indicator] :])
+
+
+def read_tile_footprints(
+    path: str, tile_id_column: str = TILE_ID_COLUMN
+) -> Tuple[str, List[Tuple[int, shapely.Geometry]]]:
+    """Read the tile features of a local GeoPackage
+
+    Returns:
+        The WKT of the tile CRS and the (tile ID, footprint) of every tile
+    """
+    with sqlite3.connect(f"file:{path}?mode=ro", uri=True) as connection:
+        table_name, column_name, srs_id = connection.execute(
+            "SELECT table_name, column_name, srs_id FROM gpkg_geometry_columns"
+        ).fetchone()
+        (crs_wkt,) = connection.execute(
+            "SELECT definition FROM gpkg_spatial_ref_sys WHERE srs_id = ?",
+            (srs_id,),
+        ).fetchone()
+        rows = connection.execute(
+            f'SELECT "{tile_id_column}", "{column_name}" FROM "{table_name}"'
+        ).fetchall()
+
+    return crs_wkt, [
+        (int(tile_id), parse_gpkg_geometry(blob)) for tile_id, blob in rows
+    ]
+
+
+def _corner_rings(bounds: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    """Closed rings of the corners of bounding boxes, as rio_stac builds them"""
+    minx, miny, maxx, maxy = bounds.T
+    xs = np.stack([minx, maxx, maxx, minx, minx], axis=1)
+    ys = np.stack([miny, miny, maxy, maxy, miny], axis=1)
+    return np.stack([xs, ys], axis=2)
+
+
+def build_tile_index(
+    gpkg_href: str,
+    destination: str,
+    tile_id_column: str = TILE_ID_COLUMN,
+) -> str:
+    """Compile the tiles GeoPackage into a compact tile geometry index
+
+    The index holds, for every tile sorted by ID, the bounds in the tile CRS and
+    the footprint reprojected to EPSG:4326 as GeoJSON. The footprint is the ring
+    of the corners of the tile bounds reprojected with the polygon cut at the
+    antimeridian, the same geometry rio_stac derives from a COG of the tile: a
+    tile that crosses longitude 180 gets a MultiPolygon and a bbox spanning all
+    longitudes.
+
+    Args:
+        gpkg_href: HREF of the tiles GeoPackage, e.g.
+            :data:`constants.TILE_GPKG_HREF`
+        destination: Path of the index
+        tile_id_column: Attribute holding the tile number
+
+    Returns:
+        str: Path of the written index
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fs, path = fsspec.core.url_to_fs(gpkg_href)
+        if not isinstance(fs, fsspec.implementations.local.LocalFileSystem):
+            local_path = os.path.join(tmpdir, os.path.basename(path))
+            fs.get_file(path, local_path)
+            path = local_path
+        crs_wkt, footprints = read_tile_footprints(path, tile_id_column)
+
+    footprints.sort(key=lambda footprint: footprint[0])
+    tile_ids = np.array([tile_id for tile_id, _ in footprints], dtype=np.int64)
+    native_bbox = np.array([geometry.bounds for _, geometry in footprints])
+    geometries = transform_geom(
+        CRS.from_wkt(crs_wkt),
+        CRS.from_epsg(4326),
+        [_bbox_geometry(bounds) for bounds in native_bbox],
+        antimeridian_cutting=True,
+    )
+    bbox = np.array([feature_bounds(geometry) for geometry in geometries])
+
+    np.savez_compressed(
+        destination,
+        tile_id=tile_ids,
+        native_bbox=native_bbox,
+        geometry=np.array([json.dumps(geometry) for geometry in geometries]),
+        bbox=bbox.reshape(-1, 4),
+        crs_wkt=np.array(CRS.from_wkt(crs_wkt).to_wkt()),
+    )
+    return destination
+
+
+def _bbox_geometry(bbox: npt.NDArray[np.float64]) -> Dict[str, Any]:
+    return {"type": "Polygon", "coordinates": [_corner_rings(bbox[None])[0].tolist()]}
+
+
+@dataclass(frozen=True)
+class TileGeometry:
+    """Geometry of one processing tile"""
+
+    tile_id: int
+    # EPSG:4326
+    bbox: List[float]
+    geometry: Dict[str, Any]
+    # tile CRS
+    native_bbox: List[float]
+    crs_wkt: str
+
+    def projection(self, resolution: float = RESOLUTION) -> Dict[str, Any]:
+        """Projection extension properties of a COG of this tile
+
+        Args:
+            resolution: Pixel size of the COG in the tile CRS
+        """
+        minx, miny, maxx, maxy = self.native_bbox
+        return {
+            "proj:epsg": None,
+            "proj:geometry": _bbox_geometry(np.array(self.native_bbox)),
+            "proj:bbox": self.native_bbox,
+            "proj:shape": [
+                round((maxy - miny) / resolution),
+                round((maxx - minx) / resolution),
+            ],
+            "proj:transform": [
+                *(resolution, 0.0, minx),
+                *(0.0, -resolution, maxy),
+                *(0.0, 0.0, 1.0),
+            ],
+            "proj:wkt2": self.crs_wkt,
+        }
+
+
+class TileIndex:
+    """Lookup of tile geometries by tile ID
+
+    Example:
+        >>> index = TileIndex.load("tile-index.npz")
+        >>> index.get("0000004").bbox
+    """
+
+    def __init__(self, arrays: Dict[str, npt.NDArray]) -> None:
+        """Wrap the arrays of a tile index"""
+        self.tile_ids: npt.NDArray[np.int64] = arrays["tile_id"]
+        self.native_bbox: npt.NDArray[np.float64] = arrays["native_bbox"]
+        # GeoJSON footprints
+        self.geometry: npt.NDArray[np.str_] = arrays["geometry"]
+        self.bbox: npt.NDArray[np.float64] = arrays["bbox"]
+        self.crs_wkt = str(arrays["crs_wkt"])
+
+    @classmethod
+    def load(cls, href: str) -> "TileIndex":
+        """Load an index written by :func:`build_tile_index`"""
+        with fsspec.open(href, "rb") as f, np.load(f) as npz:
+            return cls({key: npz[key] for key in npz.files})
+
+    def __len__(self) -> int:
+        """Number of tiles in the index"""
+        return len(self.tile_ids)
+
+    def __iter__(self) -> Iterator[int]:
+        """Iterate over the tile IDs"""
+        return iter(self.tile_ids.tolist())
+
+    def get(self, tile_id: str) -> TileGeometry:
+        """Look up the geometry of a tile
+
+        Raises:
+            KeyError: if the tile is not in the index
+        """
+        number = int(tile_id)
+        i = int(np.searchsorted(self.tile_ids, number))
+        if i == len(self.tile_ids) or self.tile_ids[i] != number:
+            raise KeyError(f"Tile {tile_id} is not in the tile index")
+
+        return TileGeometry(
+            tile_id=number,
+            bbox=self.bbox[i].tolist(),
+            geometry=json.loads(str(self.geometry[i])),
+            native_bbox=self.native_bbox[i].tolist(),
+            crs_wkt=self.crs_wkt,
+        )
+
+
+def tile_index_href() -> Optional[str]:
+    """HREF of the tile index from the environment, if set"""
+    return os.environ.get(TILE_INDEX_ENV_VAR) or None
+
+
+@cache
+def get_tile_index(href: Optional[str] = None) -> TileIndex:
+    """Shared tile index for this process
+
+    Args:
+        href: HREF of the index, defaults to ``$ICESAT2_BOREAL_TILE_INDEX``
+
+    Raises:
+        FileNotFoundError: if there is no index, see :func:`build_tile_index`
+    """
+    href = href or tile_index_href()
+    if href is None:
+        raise FileNotFoundError(
+            "No tile index given, build one with 'stac icesat2boreal "
+            f"build-tile-index' and pass it or set {TILE_INDEX_ENV_VAR}"
+        )
+    try:
+        return TileIndex.load(href)
+    except FileNotFoundError as error:
+        raise FileNotFoundError(
+            f"No tile index at {href}, build it with "
+            "'stac icesat2boreal build-tile-index'"
+        ) from error
@@ -0,0 +1,229 @@
+"""Offline, cached JSON schema validation for STAC items and collections"""
+
+import json
+import logging
+import os
+import zlib
+from functools import cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+from urllib.parse import urldefrag, urljoin, urlparse
+
+import jsonschema
+import jsonschema.exceptions
+import jsonschema.validators
+import pystac
+from pystac import STACObject, STACObjectType
+from pystac.errors import STACValidationError
+from pystac.extensions.render import RenderExtension
+from pystac.extensions.scientific import ScientificExtension
+from pystac.extensions.table import TableExtension
+from pystac.extensions.version import VersionExtension
+from pystac.validation import JsonSchemaSTACValidator
+from pystac.validation.schema_uri_map import DefaultSchemaUriMap
+
+from stactools.icesat2_boreal.constants import (
+    PROCESSING_EXTENSION_SCHEMA,
+    PROJECTION_EXTENSION_SCHEMA,
+)
+from stactools.icesat2_boreal.metrics import count_schema_fetch, stage
+from stactools.icesat2_boreal.options import ValidationMode
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_CACHE_ENV_VAR = "ICESAT2_BOREAL_SCHEMA_CACHE"
+DEFAULT_SCHEMA_CACHE = os.path.join(
+    "~", ".cache", "stactools-icesat2-boreal", "schemas"
+)
+DEFAULT_SAMPLE_RATE = 0.01
+
+
+def schema_cache_dir() -> Path:
+    """Directory of the on-disk schema cache
+
+    Set the ``ICESAT2_BOREAL_SCHEMA_CACHE`` environment variable to override the
+    default location, e.g. to point batch nodes at a pre-warmed copy.
+    """
+    return Path(os.environ.get(SCHEMA_CACHE_ENV_VAR, DEFAULT_SCHEMA_CACHE)).expanduser()
+
+
+class CachingSTACValidator(JsonSchemaSTACValidator):
+    """JSON schema validator backed by an on-disk schema cache
+
+    Schemas are read from the cache directory before falling back to the network,
+    and every fetched schema is written back to the cache. Compiled validators are
+    kept for the life of the object so repeated validations only pay for checking
+    the document.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None) -> None:
+        """Create a validator using ``cache_dir`` (or the default cache)"""
+        super().__init__()
+        self.cache_dir = cache_dir or schema_cache_dir()
+        self._validators: Dict[str, Any] = {}
+
+    def cache_path(self, schema_uri: str) -> Path:
+        """Location of a schema in the on-disk cache"""
+        parsed = urlparse(schema_uri)
+        return self.cache_dir / parsed.netloc / parsed.path.lstrip("/")
+
+    def _get_schema(self, schema_uri: str) -> Dict[str, Any]:
+        if schema_uri in self.schema_cache:
+            return self.schema_cache[schema_uri]
+
+        path = self.cache_path(schema_uri)
+        if path.exists():
+            with open(path) as f:
+                self.schema_cache[schema_uri] = json.load(f)
+            return self.schema_cache[schema_uri]
+
+        logger.info(f"Fetching schema {schema_uri}")
+        count_schema_fetch()
+        schema = super()._get_schema(schema_uri)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # write then rename so concurrent workers never read a partial file
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(schema, f)
+        os.replace(tmp_path, path)
+
+        return schema
+
+    def _validate_from_uri(
+        self,
+        stac_dict: Dict[str, Any],
+        stac_object_type: STACObjectType,
+        schema_uri: str,
+        href: Optional[str] = None,
+    ) -> None:
+        validator = self._validators.get(schema_uri)
+        if validator is None:
+            schema = self._get_schema(schema_uri)
+            cls = jsonschema.validators.validator_for(schema)
+            cls.check_schema(schema)
+            validator = cls(schema, registry=self.registry)
+            self._validators[schema_uri] = validator
+
+        errors = list(validator.iter_errors(stac_dict))
+        if errors:
+            msg = f"Validation failed for {stac_object_type} "
+            if href is not None:
+                msg += f"at {href} "
+            if stac_dict.get("id") is not None:
+                msg += f"with ID {stac_dict['id']} "
+            msg += f"against schema at {schema_uri}"
+
+            best = jsonschema.exceptions.best_match(errors)
+            if best:
+                msg += "\n" + str(best)
+            raise STACValidationError(msg, source=errors) from best
+
+    def prewarm(self, schema_uris: Iterable[str]) -> List[str]:
+        """Load schemas and everything they reference into the cache
+
+        Returns:
+            List[str]: URIs of all schemas that are now cached
+        """
+        seen: Set[str] = set()
+        queue = list(schema_uris)
+        while queue:
+            schema_uri = queue.pop()
+            if schema_uri in seen:
+                continue
+            seen.add(schema_uri)
+            for ref in _iter_refs(self._get_schema(schema_uri)):
+                ref_uri = urldefrag(urljoin(schema_uri, ref)).url
+                if ref_uri and ref_uri not in seen:
+                    queue.append(ref_uri)
+
+        return sorted(seen)
+
+
+def _iter_refs(schema: Any) -> Iterator[str]:
+    if isinstance(schema, dict):
+        for key, value in schema.items():
+            if key == "$ref" and isinstance(value, str):
+                yield value
+            else:
+                yield from _iter_refs(value)
+    elif isinstance(schema, list):
+        for value in schema:
+            yield from _iter_refs(value)
+
+
+def schema_uris() -> List[str]:
+    """URIs of the schemas used by the items and collections in this package"""
+    schema_uri_map = DefaultSchemaUriMap()
+    stac_version = pystac.get_stac_version()
+    return [
+        schema_uri_map.get_object_schema_uri(object_type, stac_version)
+        for object_type in (STACObjectType.ITEM, STACObjectType.COLLECTION)
+    ] + [
+        PROJECTION_EXTENSION_SCHEMA,
+        RenderExtension.get_schema_uri(),
+        VersionExtension.get_schema_uri(),
+        ScientificExtension.get_schema_uri(),
+        TableExtension.get_schema_uri(),
+        PROCESSING_EXTENSION_SCHEMA,
+    ]
+
+
+@cache
+def get_validator(cache_dir: Optional[Path] = None) -> CachingSTACValidator:
+    """Shared validator for this process"""
+    return CachingSTACValidator(cache_dir)
+
+
+def prewarm_schemas(
+    cache_dir: Optional[Path] = None, uris: Optional[Iterable[str]] = None
+) -> List[str]:
+    """Download the schemas used by this package into the on-disk cache
+
+    Run this once on a machine with network access, then share the cache directory
+    with nodes that cannot reach the schema hosts.
+
+    Args:
+        cache_dir: Cache directory, defaults to :func:`schema_cache_dir`
+        uris: Schemas to cache, defaults to :func:`schema_uris`
+
+    Returns:
+        List[str]: URIs of all cached schemas, including referenced ones
+    """
+    return get_validator(cache_dir).prewarm(uris or schema_uris())
+
+
+def is_sampled(stac_id: str, sample_rate: float = DEFAULT_SAMPLE_RATE) -> bool:
+    """Deterministically select a fraction of IDs for validation
+
+    The choice only depends on the ID, so the same items are sampled regardless of
+    which worker process creates them.
+    """
+    return zlib.crc32(stac_id.encode()) % 10_000 < sample_rate * 10_000
+
+
+def validate(
+    stac_object: STACObject,
+    mode: ValidationMode = ValidationMode.ALL,
+    sample_rate: float = DEFAULT_SAMPLE_RATE,
+) -> bool:
+    """Validate a STAC object according to the validation mode
+
+    Args:
+        stac_object: Item or collection to validate
+        mode: Skip validation, validate a sample of objects or validate everything
+        sample_rate: Fraction of objects validated in ``sample`` mode
+
+    Returns:
+        bool: True if the object was validated
+
+    Raises:
+        STACValidationError: if the object is not valid
+    """
+    if mode == ValidationMode.NONE:
+        return False
+    if mode == ValidationMode.SAMPLE and not is_sampled(stac_object.id, sample_rate):
+        return False
+
+    with stage("validate"):
+        stac_object.validate(validator=get_validator())
+    return True
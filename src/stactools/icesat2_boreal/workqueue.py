@@ -0,0 +1,293 @@
+"""Durable work queue for resumable batch runs"""
+
+import os
+import re
+import socket
+import sqlite3
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from enum import StrEnum
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from stactools.icesat2_boreal.options import DEFAULT_MAX_ATTEMPTS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    cog_key TEXT NOT NULL PRIMARY KEY,
+    parquet_key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    not_before REAL NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    href TEXT,
+    error TEXT,
+    updated TEXT NOT NULL
+)
+"""
+
+DEFAULT_LEASE_SECONDS = 15 * 60
+DEFAULT_BACKOFF_SECONDS = 2.0
+
+# S3 error codes worth retrying, as reported by botocore
+TRANSIENT_ERROR_CODES = {
+    "InternalError",
+    "RequestTimeout",
+    "RequestTimeTooSkewed",
+    "ServiceUnavailable",
+    "SlowDown",
+    "Throttling",
+    "ThrottlingException",
+}
+
+# the same errors as reported by GDAL and fsspec, which only keep the message
+_TRANSIENT_MESSAGE = re.compile(
+    r"HTTP response code: (429|5\d\d)|SlowDown|timed out|timeout|"
+    r"connection (reset|aborted|refused)",
+    re.IGNORECASE,
+)
+
+
+class TaskStatus(StrEnum):
+    """State of a tile in the work queue"""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+@dataclass(frozen=True)
+class Task:
+    """A tile claimed from the queue"""
+
+    cog_key: str
+    parquet_key: str
+    # including this one
+    attempts: int
+
+
+def is_transient(error: BaseException) -> bool:
+    """True if an error is likely to go away when the tile is retried"""
+    # errors from the workers carry the verdict on the original exception
+    transient = getattr(error, "transient", None)
+    if isinstance(transient, bool):
+        return transient
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        code = response.get("Error", {}).get("Code")
+        if code in TRANSIENT_ERROR_CODES:
+            return True
+    return bool(_TRANSIENT_MESSAGE.search(str(error)))
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class WorkQueue:
+    """SQLite queue of the tiles of a batch run
+
+    Tiles are claimed with a lease. A tile whose worker died is claimed again once
+    its lease expires, so a run that is restarted picks up where it stopped.
+    Several processes, on one machine or on nodes sharing a filesystem with working
+    file locks, can work off the same queue file without duplicating work. Tiles
+    that fail with a transient error are retried with exponential backoff.
+
+    Example:
+        >>> with WorkQueue("queue.db") as queue:
+        ...     queue.add(read_manifest("manifest.txt"))
+        ...     result = create_items([], "items/", queue=queue)
+    """
+
+    def __init__(
+        self,
+        path: str,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+        worker_id: Optional[str] = None,
+    ) -> None:
+        """Open (or create) the queue database at ``path``
+
+        Args:
+            path: Path of the SQLite database
+            lease_seconds: Time after which a claimed tile that is not done is
+                handed to another worker
+            max_attempts: Attempts per tile before it is marked as failed
+            backoff_seconds: Delay before the first retry, doubled for each
+                further attempt
+            worker_id: Name of this worker in the leases, defaults to the host
+                name and process ID
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.worker_id = (
+            worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        )
+        # autocommit, transactions are started explicitly where they are needed
+        self._connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._connection.execute(SCHEMA)
+
+    def __enter__(self) -> "WorkQueue":
+        """Use the queue as a context manager that closes the database"""
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        """Close the database"""
+        self.close()
+
+    def close(self) -> None:
+        """Close the database"""
+        self._connection.close()
+
+    def add(self, pairs: Iterable[Tuple[str, str]]) -> int:
+        """Add tiles, skipping tiles that are already queued
+
+        Returns:
+            int: number of tiles added
+        """
+        now = _now()
+        with self._connection:
+            cursor = self._connection.executemany(
+                "INSERT OR IGNORE INTO tasks (cog_key, parquet_key, status, updated) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    (cog_key, parquet_key, TaskStatus.PENDING.value, now)
+                    for cog_key, parquet_key in pairs
+                ),
+            )
+        return cursor.rowcount
+
+    def claim(self) -> Optional[Task]:
+        """Lease the next tile that is ready, None if there is none right now"""
+        now = time.time()
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            # tiles that keep killing their worker are not handed out forever
+            self._connection.execute(
+                "UPDATE tasks SET status = ?, error = ?, lease_owner = NULL, "
+                "updated = ? WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                (
+                    TaskStatus.FAILED.value,
+                    "Lease expired on the last attempt",
+                    _now(),
+                    TaskStatus.RUNNING.value,
+                    now,
+                    self.max_attempts,
+                ),
+            )
+            row = self._connection.execute(
+                "SELECT cog_key, parquet_key, attempts FROM tasks "
+                "WHERE (status = ? AND not_before <= ?) "
+                "OR (status = ? AND lease_expires < ?) "
+                "ORDER BY attempts, rowid LIMIT 1",
+                (TaskStatus.PENDING.value, now, TaskStatus.RUNNING.value, now),
+            ).fetchone()
+            if row is not None:
+                self._connection.execute(
+                    "UPDATE tasks SET status = ?, attempts = attempts + 1, "
+                    "lease_owner = ?, lease_expires = ?, updated = ? WHERE cog_key = ?",
+                    (
+                        TaskStatus.RUNNING.value,
+                        self.worker_id,
+                        now + self.lease_seconds,
+                        _now(),
+                        row[0],
+                    ),
+                )
+            self._connection.execute("COMMIT")
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+
+        return None if row is None else Task(row[0], row[1], row[2] + 1)
+
+    def iter_claims(self) -> Iterator[Task]:
+        """Claim tiles one at a time until none is ready"""
+        while (task := self.claim()) is not None:
+            yield task
+
+    def complete(self, cog_key: str, href: Optional[str] = None) -> None:
+        """Mark a claimed tile as done"""
+        with self._connection:
+            self._connection.execute(
+                "UPDATE tasks SET status = ?, href = ?, error = NULL, "
+                "lease_owner = NULL, updated = ? WHERE cog_key = ?",
+                (TaskStatus.DONE.value, href, _now(), cog_key),
+            )
+
+    def fail(self, cog_key: str, error: BaseException) -> TaskStatus:
+        """Release a claimed tile after an error
+
+        Transient errors are retried after an exponential backoff until the tile
+        has been attempted ``max_attempts`` times.
+
+        Returns:
+            TaskStatus: ``pending`` if the tile will be retried, else ``failed``
+        """
+        (attempts,) = self._connection.execute(
+            "SELECT attempts FROM tasks WHERE cog_key = ?", (cog_key,)
+        ).fetchone()
+        retry = is_transient(error) and attempts < self.max_attempts
+        status = TaskStatus.PENDING if retry else TaskStatus.FAILED
+        not_before = time.time() + self.backoff_seconds * 2 ** (attempts - 1)
+        with self._connection:
+            self._connection.execute(
+                "UPDATE tasks SET status = ?, not_before = ?, error = ?, "
+                "lease_owner = NULL, updated = ? WHERE cog_key = ?",
+                (status.value, not_before, repr(error), _now(), cog_key),
+            )
+        return status
+
+    def retry_delay(self) -> Optional[float]:
+        """Seconds until the next pending tile is ready, None if none is pending"""
+        (not_before,) = self._connection.execute(
+            "SELECT MIN(not_before) FROM tasks WHERE status = ?",
+            (TaskStatus.PENDING.value,),
+        ).fetchone()
+        return None if not_before is None else max(0.0, not_before - time.time())
+
+    def retry_failed(self) -> int:
+        """Queue the failed tiles again, with a fresh set of attempts
+
+        Returns:
+            int: number of tiles queued again
+        """
+        with self._connection:
+            cursor = self._connection.execute(
+                "UPDATE tasks SET status = ?, attempts = 0, not_before = 0, "
+                "updated = ? WHERE status = ?",
+                (TaskStatus.PENDING.value, _now(), TaskStatus.FAILED.value),
+            )
+        return cursor.rowcount
+
+    def pairs(self) -> List[Tuple[str, str]]:
+        """(COG key, parquet key) of every tile in the queue"""
+        return self._connection.execute(
+            "SELECT cog_key, parquet_key FROM tasks ORDER BY rowid"
+        ).fetchall()
+
+    def counts(self) -> Dict[TaskStatus, int]:
+        """Number of tiles by status"""
+        counts = dict.fromkeys(TaskStatus, 0)
+        for status, count in self._connection.execute(
+            "SELECT status, COUNT(*) FROM tasks GROUP BY status"
+        ):
+            counts[TaskStatus(status)] = count
+        return counts
+
+    def errors(self) -> Dict[str, str]:
+        """Last error of every failed tile, by COG key"""
+        return dict(
+            self._connection.execute(
+                "SELECT cog_key, error FROM tasks WHERE status = ?",
+                (TaskStatus.FAILED.value,),
+            ).fetchall()
+        )
@@ -0,0 +1,170 @@
+"""Writers for the items produced by a batch run"""
+
+import json
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from typing import IO, Any, Dict, Optional
+
+import fsspec
+from pystac import Item, StacIO
+
+from stactools.icesat2_boreal.options import DEFAULT_ROW_GROUP_SIZE, OutputFormat
+
+
+class ItemWriter(ABC):
+    """Writes items one at a time as a batch produces them"""
+
+    def __enter__(self) -> "ItemWriter":
+        """Use the writer as a context manager that closes it on exit"""
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        """Close the writer"""
+        self.close()
+
+    def write(self, item: Item) -> str:
+        """Write one item
+
+        Returns:
+            str: HREF of the file the item was written to
+        """
+        return self.write_dict(item.to_dict(include_self_link=False))
+
+    @abstractmethod
+    def write_dict(self, item_dict: Dict[str, Any]) -> str:
+        """Write one item given as a STAC dictionary
+
+        Returns:
+            str: HREF of the file the item was written to
+        """
+
+    @abstractmethod
+    def close(self) -> None:
+        """Flush and close the output"""
+
+
+class JsonItemWriter(ItemWriter):
+    """Writes each item to ``{destination}/{item_id}.json``"""
+
+    def __init__(self, destination: str) -> None:
+        """Write items into the ``destination`` directory"""
+        self.destination = destination
+
+    def href(self, item_id: str) -> str:
+        """HREF of the JSON file for an item"""
+        return os.path.join(self.destination, f"{item_id}.json")
+
+    def write(self, item: Item) -> str:
+        """Write one item to its own JSON file"""
+        href = self.href(item.id)
+        item.save_object(include_self_link=False, dest_href=href)
+        return href
+
+    def write_dict(self, item_dict: Dict[str, Any]) -> str:
+        """Write one item dictionary to its own JSON file"""
+        href = self.href(item_dict["id"])
+        StacIO.default().save_json(href, item_dict)
+        return href
+
+    def close(self) -> None:
+        """Nothing to flush, each item is saved as it is written"""
+
+
+class NdjsonItemWriter(ItemWriter):
+    """Streams items to a newline-delimited JSON file"""
+
+    def __init__(self, href: str) -> None:
+        """Open ``href`` for writing"""
+        self.href = href
+        self._file: IO[str] = fsspec.open(href, "w").open()
+
+    def write_dict(self, item_dict: Dict[str, Any]) -> str:
+        """Append one item as a line of JSON"""
+        self._file.write(json.dumps(item_dict))
+        self._file.write("\n")
+        return self.href
+
+    def close(self) -> None:
+        """Close the file"""
+        self._file.close()
+
+
+class GeoParquetItemWriter(ItemWriter):
+    """Writes items to a stac-geoparquet file
+
+    Items are streamed to a temporary newline-delimited JSON file as they arrive.
+    On close, stac-geoparquet infers the schema from that file and converts it one
+    row group at a time, so items are never all held in memory.
+    Requires the ``geoparquet`` extra.
+    """
+
+    def __init__(self, href: str, row_group_size: int = DEFAULT_ROW_GROUP_SIZE) -> None:
+        """Write items to the parquet file at ``href``"""
+        try:
+            import stac_geoparquet.arrow  # noqa: F401
+        except ImportError as error:
+            raise ImportError(
+                "stac-geoparquet output requires the geoparquet extra: "
+                "pip install 'stactools-icesat2-boreal[geoparquet]'"
+            ) from error
+
+        self.href = href
+        self.row_group_size = row_group_size
+        self._tmpdir = tempfile.mkdtemp(prefix="icesat2-boreal-")
+        self._spool = NdjsonItemWriter(os.path.join(self._tmpdir, "items.ndjson"))
+        self._count = 0
+
+    def write_dict(self, item_dict: Dict[str, Any]) -> str:
+        """Spool one item for conversion on close"""
+        self._spool.write_dict(item_dict)
+        self._count += 1
+        return self.href
+
+    def close(self) -> None:
+        """Convert the spooled items to stac-geoparquet"""
+        from stac_geoparquet.arrow import parse_stac_ndjson_to_parquet
+
+        self._spool.close()
+        try:
+            if self._count:
+                self._convert(parse_stac_ndjson_to_parquet)
+        finally:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def _convert(self, parse_stac_ndjson_to_parquet: Any) -> None:
+        fs, path = fsspec.core.url_to_fs(self.href)
+        if isinstance(fs, fsspec.implementations.local.LocalFileSystem):
+            output_path = path
+        else:
+            output_path = os.path.join(self._tmpdir, "items.parquet")
+
+        parse_stac_ndjson_to_parquet(
+            self._spool.href,
+            output_path,
+            chunk_size=self.row_group_size,
+        )
+        if output_path != path:
+            fs.put_file(output_path, path)
+
+
+def open_writer(
+    output_format: OutputFormat,
+    destination: str,
+    row_group_size: Optional[int] = None,
+) -> ItemWriter:
+    """Create a writer for an output format
+
+    Args:
+        output_format: Format of the output
+        destination: Directory for ``json`` output, file HREF otherwise
+        row_group_size: Rows per row group for ``geoparquet`` output
+    """
+    if output_format == OutputFormat.NDJSON:
+        return NdjsonItemWriter(destination)
+    if output_format == OutputFormat.GEOPARQUET:
+        return GeoParquetItemWriter(
+            destination, row_group_size=row_group_size or DEFAULT_ROW_GROUP_SIZE
+        )
+    return JsonItemWriter(destination)
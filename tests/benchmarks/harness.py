@@ -0,0 +1,246 @@
+"""Synthetic COGs and isolated measurement of item and collection generation"""
+
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import rasterio
+import rasterio.shutil
+from rasterio.io import MemoryFile
+from rasterio.transform import from_origin
+
+# 90 km tiles at the 30 m production resolution
+TILE_SIZE = 3000
+PIXEL_SIZE = 30.0
+BLOCK_SIZE = 512
+
+# overview levels written into the synthetic COGs, by layout name
+OVERVIEW_LAYOUTS: Dict[str, Optional[int]] = {
+    # no overviews, overview statistics fall back to the full resolution
+    "none": 0,
+    # a single 2x overview
+    "shallow": 1,
+    # every level down to one block, as written by the COG driver by default
+    "full": None,
+}
+
+
+def write_synthetic_cog(
+    template: str, destination: str, overview_layout: str, seed: int = 0
+) -> str:
+    """Write a production size two band COG modelled on a test fixture
+
+    The CRS, origin, band descriptions and NaN nodata of ``template`` are kept.
+    Band 1 is a smooth height field and band 2 its standard deviation, with
+    roughly a third of the tile (water, outside the boreal mask) set to NaN.
+    GDAL statistics tags are written so ``header`` statistics have data to read.
+    """
+    rng = np.random.default_rng(seed)
+    with rasterio.open(template) as src:
+        profile = src.profile
+        west, north = src.transform.c, src.transform.f
+        descriptions = src.descriptions
+
+    coarse = rng.gamma(2.0, 4.0, size=(TILE_SIZE // 100, TILE_SIZE // 100))
+    height = np.kron(coarse, np.ones((100, 100))).astype(np.float32)
+    height += rng.normal(0, 0.5, size=height.shape).astype(np.float32)
+    sd = np.abs(height * 0.2 + rng.normal(0, 0.1, size=height.shape)).astype(np.float32)
+    yy, xx = np.mgrid[0:TILE_SIZE, 0:TILE_SIZE]
+    mask = np.hypot(xx - TILE_SIZE * 0.2, yy - TILE_SIZE * 0.8) < TILE_SIZE * 0.55
+    height[mask] = np.nan
+    sd[mask] = np.nan
+
+    profile.update(
+        driver="GTiff",
+        width=TILE_SIZE,
+        height=TILE_SIZE,
+        transform=from_origin(west, north, PIXEL_SIZE, PIXEL_SIZE),
+        tiled=True,
+        blockxsize=BLOCK_SIZE,
+        blockysize=BLOCK_SIZE,
+        dtype="float32",
+        nodata=np.nan,
+        count=2,
+    )
+    overview_count = OVERVIEW_LAYOUTS[overview_layout]
+    options: Dict[str, Any] = {
+        "COMPRESS": "DEFLATE",
+        "PREDICTOR": "3",
+        "BLOCKSIZE": BLOCK_SIZE,
+        "OVERVIEWS": "NONE" if overview_count == 0 else "AUTO",
+    }
+    if overview_count:
+        options["OVERVIEW_COUNT"] = overview_count
+
+    with MemoryFile() as memfile:
+        with memfile.open(**profile) as dst:
+            for band, data in enumerate((height, sd), start=1):
+                dst.write(data, band)
+                dst.set_band_description(band, descriptions[band - 1])
+                valid = data[~np.isnan(data)]
+                dst.update_tags(
+                    band,
+                    STATISTICS_MINIMUM=float(valid.min()),
+                    STATISTICS_MAXIMUM=float(valid.max()),
+                    STATISTICS_MEAN=float(valid.mean()),
+                    STATISTICS_STDDEV=float(valid.std()),
+                    STATISTICS_VALID_PERCENT=100.0 * valid.size / data.size,
+                )
+        with memfile.open() as src:
+            rasterio.shutil.copy(src, destination, driver="COG", **options)
+
+    return destination
+
+
+@dataclass
+class Measurement:
+    """Throughput and resource use of one benchmark case"""
+
+    items_per_second: float
+    # peak resident set size of the process running the case
+    peak_rss_mb: float
+    # bytes read by the process per item, None where /proc is not available
+    bytes_read_per_item: Optional[float]
+
+
+def _proc_value(path: str, name: str) -> Optional[int]:
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(f"{name}:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss carries the high water mark of the parent over exec, VmHWM does not
+    peak_kb = _proc_value("/proc/self/status", "VmHWM")
+    if peak_kb is None:
+        peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_kb / 1024
+
+
+def _measure(target: str, keys: List[str], repeat: int, **kwargs: Any) -> Measurement:
+    """Run a case in this process, after one warm-up call"""
+    from stactools.icesat2_boreal.constants import Variable
+    from stactools.icesat2_boreal.stac import create_collection, create_item
+
+    def run(key: str) -> None:
+        if target == "create_item":
+            create_item(key, key.replace(".tif", "_train.parquet"), **kwargs)
+        else:
+            create_collection(Variable(key), **kwargs)
+
+    # imports, packaged lookups and schema loading are not part of the measurement
+    run(keys[0])
+
+    n = len(keys) * repeat
+    start_bytes = _proc_value("/proc/self/io", "rchar")
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for key in keys:
+            run(key)
+    seconds = time.perf_counter() - start
+    end_bytes = _proc_value("/proc/self/io", "rchar")
+
+    return Measurement(
+        items_per_second=n / seconds,
+        peak_rss_mb=_peak_rss_mb(),
+        bytes_read_per_item=(
+            None if start_bytes is None else (end_bytes - start_bytes) / n
+        ),
+    )
+
+
+def measure(target: str, keys: List[str], repeat: int, **kwargs: Any) -> Measurement:
+    """Measure ``create_item`` or ``create_collection`` in a fresh process
+
+    Every case runs in its own spawned interpreter, so its peak RSS is not
+    inflated by the test session or by earlier cases.
+
+    Args:
+        target: ``create_item`` (``keys`` are COG paths) or ``create_collection``
+            (``keys`` are variables)
+        keys: Inputs, each used ``repeat`` times
+        kwargs: Options of the target function
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        return pool.submit(_measure, target, keys, repeat, **kwargs).result()
+
+
+# code timed by the startup benchmark: what every plugin registration pays
+PLUGIN_STARTUP = """
+import time
+start = time.perf_counter()
+from click import Group
+import stactools.icesat2_boreal
+from stactools.icesat2_boreal.commands import create_icesat2boreal_command
+create_icesat2boreal_command(Group())
+print(time.perf_counter() - start)
+"""
+
+
+def measure_startup(repeat: int = 5) -> Dict[str, float]:
+    """Best of ``repeat`` fresh interpreters for plugin import and CLI help
+
+    ``plugin_seconds`` times importing the package and registering its commands,
+    ``cli_help_seconds`` the whole ``stac icesat2boreal create-item --help``
+    process, including the stactools CLI and its other plugins.
+    """
+    plugin, cli_help = [], []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", PLUGIN_STARTUP],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        plugin.append(float(result.stdout))
+
+        start = time.perf_counter()
+        subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "from stactools.cli.cli import run_cli; run_cli()",
+                "icesat2boreal",
+                "create-item",
+                "--help",
+            ],
+            capture_output=True,
+            check=True,
+        )
+        cli_help.append(time.perf_counter() - start)
+
+    return {"plugin_seconds": min(plugin), "cli_help_seconds": min(cli_help)}
+
+
+# metrics where larger values are better, all others should be as small as possible
+HIGHER_IS_BETTER = {"items_per_second"}
+
+
+def regressions(
+    current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    """Metrics that are more than ``tolerance`` worse than the baseline"""
+    failures = []
+    for metric, value in current.items():
+        expected = baseline.get(metric)
+        if value is None or expected is None:
+            continue
+        if metric in HIGHER_IS_BETTER:
+            regressed = value < expected * (1 - tolerance)
+        else:
+            regressed = value > expected * (1 + tolerance)
+        if regressed:
+            failures.append(f"{metric}: {value:.4g} (baseline {expected:.4g})")
+
+    return failures
@@ -0,0 +1,188 @@
+"""Throughput, memory and I/O benchmarks of item and collection generation
+
+Benchmarks are deselected by default, run them with ``pytest -m benchmark``.
+Set ``ICESAT2_BOREAL_BENCHMARK_UPDATE=1`` to record the results as the new
+baseline, and ``ICESAT2_BOREAL_BENCHMARK_TOLERANCE`` to change the allowed
+regression (default 0.25, i.e. 25%). Throughput depends on the machine, so
+record the baseline on the machine that runs the comparison.
+"""
+
+import json
+import os
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Union
+
+import pytest
+from harness import (
+    OVERVIEW_LAYOUTS,
+    Measurement,
+    measure,
+    measure_startup,
+    regressions,
+    write_synthetic_cog,
+)
+
+from stactools.icesat2_boreal.options import (
+    GeometryMode,
+    StatisticsMode,
+    ValidationMode,
+    Variable,
+)
+from stactools.icesat2_boreal.tiles import build_tile_index
+from stactools.icesat2_boreal.validation import schema_cache_dir, schema_uris
+
+BASELINE = Path(__file__).parent / "baseline.json"
+TEMPLATES = sorted((Path(__file__).parent.parent / "data").glob("boreal_ht_*.tif"))
+
+pytestmark = pytest.mark.benchmark
+
+# passes over the synthetic COGs per case; exact statistics read every pixel
+REPEAT = {
+    StatisticsMode.NONE: 20,
+    StatisticsMode.HEADER: 20,
+    StatisticsMode.OVERVIEW: 5,
+    StatisticsMode.EXACT: 1,
+}
+
+
+@pytest.fixture(scope="session")
+def synthetic_cogs(tmp_path_factory: pytest.TempPathFactory) -> Dict[str, List[str]]:
+    """Production size COGs of every overview layout, by layout"""
+    directory = tmp_path_factory.mktemp("cogs")
+    cogs: Dict[str, List[str]] = {}
+    for layout in OVERVIEW_LAYOUTS:
+        (directory / layout).mkdir()
+        cogs[layout] = [
+            write_synthetic_cog(
+                str(template), str(directory / layout / template.name), layout, seed
+            )
+            for seed, template in enumerate(TEMPLATES)
+        ]
+    return cogs
+
+
+@pytest.fixture(scope="session")
+def tolerance() -> float:
+    """Allowed regression relative to the baseline"""
+    return float(os.environ.get("ICESAT2_BOREAL_BENCHMARK_TOLERANCE", "0.25"))
+
+
+@pytest.fixture(scope="session")
+def baseline() -> Iterator[Dict[str, Any]]:
+    """Stored results, rewritten at the end of the session when updating"""
+    results = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    yield results
+    if os.environ.get("ICESAT2_BOREAL_BENCHMARK_UPDATE"):
+        BASELINE.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+
+
+@pytest.fixture(scope="session")
+def schemas_cached() -> bool:
+    """True if the schema cache can validate without network access"""
+    cache_dir = schema_cache_dir()
+    return all((cache_dir / uri.split("://", 1)[1]).exists() for uri in schema_uris())
+
+
+def check(
+    name: str,
+    measurement: Union[Measurement, Dict[str, float]],
+    baseline: Dict[str, Any],
+    tolerance: float,
+) -> None:
+    """Record a measurement and fail if it regressed past the baseline"""
+    current = measurement if isinstance(measurement, dict) else asdict(measurement)
+    previous = baseline.get(name)
+    baseline[name] = current
+    if previous is None or os.environ.get("ICESAT2_BOREAL_BENCHMARK_UPDATE"):
+        pytest.skip(
+            f"No baseline for {name}, record one with ICESAT2_BOREAL_BENCHMARK_UPDATE=1"
+        )
+
+    failures = regressions(current, previous, tolerance)
+    assert not failures, f"{name} regressed: " + ", ".join(failures)
+
+
+@pytest.mark.parametrize("layout", list(OVERVIEW_LAYOUTS))
+@pytest.mark.parametrize("statistics", list(StatisticsMode))
+def test_create_item_statistics(
+    synthetic_cogs: Dict[str, List[str]],
+    baseline: Dict[str, Any],
+    tolerance: float,
+    statistics: StatisticsMode,
+    layout: str,
+) -> None:
+    """Benchmark create_item for each statistics mode and overview layout"""
+    measurement = measure(
+        "create_item",
+        synthetic_cogs[layout],
+        REPEAT[statistics],
+        statistics=statistics,
+        validation=ValidationMode.NONE,
+    )
+    check(f"create_item[{statistics}-{layout}]", measurement, baseline, tolerance)
+
+
+@pytest.mark.parametrize("validation", [ValidationMode.SAMPLE, ValidationMode.ALL])
+def test_create_item_validation(
+    synthetic_cogs: Dict[str, List[str]],
+    baseline: Dict[str, Any],
+    tolerance: float,
+    schemas_cached: bool,
+    validation: ValidationMode,
+) -> None:
+    """Benchmark the cost of validating items"""
+    if not schemas_cached:
+        pytest.skip("Schemas are not cached, run 'stac icesat2boreal prewarm-schemas'")
+
+    measurement = measure(
+        "create_item",
+        synthetic_cogs["full"],
+        REPEAT[StatisticsMode.HEADER],
+        statistics=StatisticsMode.HEADER,
+        validation=validation,
+    )
+    check(f"create_item[validation-{validation}]", measurement, baseline, tolerance)
+
+
+@pytest.mark.parametrize("validation", [ValidationMode.NONE, ValidationMode.ALL])
+def test_create_collection(
+    baseline: Dict[str, Any],
+    tolerance: float,
+    schemas_cached: bool,
+    validation: ValidationMode,
+) -> None:
+    """Benchmark create_collection for every variable"""
+    if validation != ValidationMode.NONE and not schemas_cached:
+        pytest.skip("Schemas are not cached, run 'stac icesat2boreal prewarm-schemas'")
+
+    measurement = measure(
+        "create_collection", list(Variable), 20, validation=validation
+    )
+    check(f"create_collection[{validation}]", measurement, baseline, tolerance)
+
+
+def test_startup(baseline: Dict[str, Any], tolerance: float) -> None:
+    """Benchmark the import cost of the plugin and of the CLI help"""
+    check("startup", measure_startup(), baseline, tolerance)
+
+
+def test_create_item_from_templates(
+    synthetic_cogs: Dict[str, List[str]],
+    tiles_gpkg: str,
+    tmp_path: Path,
+    baseline: Dict[str, Any],
+    tolerance: float,
+) -> None:
+    """Benchmark items built without reading the COG, i.e. pure object creation"""
+    tile_index = build_tile_index(tiles_gpkg, str(tmp_path / "tile-index.npz"))
+    measurement = measure(
+        "create_item",
+        synthetic_cogs["none"],
+        500,
+        statistics=StatisticsMode.NONE,
+        validation=ValidationMode.NONE,
+        geometry=GeometryMode.INDEX,
+        tile_index=tile_index,
+    )
+    check("create_item[index-none]", measurement, baseline, tolerance)
@@ -1,8 +1,20 @@
 """Test configuration"""
 
 import os
+import sqlite3
+import struct
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Iterator, List
 
 import pytest
+import rasterio
+import shapely
+from affine import Affine
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
 
 
 @pytest.fixture()
@@ -23,3 +35,174 @@ def cog_key_not_in_daac():
         + os.path.dirname(__file__)
         + "/data/boreal_ht_2020_202501131736787421_0000003.tif"
     )
+
+
+class S3Server:
+    """A minimal stand-in for S3 that serves files from tests/data
+
+    Objects are served at ``s3://<any bucket>/<file name>`` with support for range
+    requests, and every request is counted by method.
+    """
+
+    def __init__(self) -> None:
+        """Create the server on a free local port"""
+        self.requests: Counter = Counter()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args: object) -> None:
+                pass
+
+            def _send(self, body: bool) -> None:
+                server.requests[self.command] += 1
+                path = os.path.join(DATA_DIR, os.path.basename(self.path))
+                if not os.path.exists(path):
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                with open(path, "rb") as f:
+                    data = f.read()
+                size = len(data)
+                range_header = self.headers.get("Range")
+                if range_header:
+                    start, end = range_header.split("=")[1].split("-")
+                    start, end = int(start), min(int(end or size - 1), size - 1)
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+                    data = data[start : end + 1]
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                if body:
+                    self.wfile.write(data)
+
+            def do_HEAD(self) -> None:
+                self._send(body=False)
+
+            def do_GET(self) -> None:
+                self._send(body=True)
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.endpoint = "127.0.0.1:{}".format(self._httpd.server_address[1])
+
+    def env(self) -> rasterio.Env:
+        """GDAL configuration that points /vsis3/ at this server without caching"""
+        return rasterio.Env(
+            AWS_S3_ENDPOINT=self.endpoint,
+            AWS_HTTPS="NO",
+            AWS_VIRTUAL_HOSTING="FALSE",
+            AWS_NO_SIGN_REQUEST="YES",
+            GDAL_DISABLE_READDIR_ON_OPEN="EMPTY_DIR",
+            CPL_VSIL_CURL_NON_CACHED="/vsis3/",
+        )
+
+    def start(self) -> None:
+        """Serve requests in a background thread"""
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        """Shut the server down"""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture()
+def s3_server() -> Iterator[S3Server]:
+    """Local S3 stand-in serving the files in tests/data"""
+    server = S3Server()
+    server.start()
+    yield server
+    server.stop()
+
+
+def write_tiles_gpkg(path: str, cog_paths: List[str]) -> None:
+    """Write a minimal tiles GeoPackage with the footprints of some COGs"""
+    with rasterio.open(cog_paths[0]) as src:
+        crs_wkt = src.crs.to_wkt()
+
+    with sqlite3.connect(path) as connection:
+        connection.executescript(
+            """
+            CREATE TABLE gpkg_spatial_ref_sys (
+                srs_name TEXT, srs_id INTEGER PRIMARY KEY, organization TEXT,
+                organization_coordsys_id INTEGER, definition TEXT, description TEXT
+            );
+            CREATE TABLE gpkg_contents (
+                table_name TEXT PRIMARY KEY, data_type TEXT, identifier TEXT,
+                srs_id INTEGER
+            );
+            CREATE TABLE gpkg_geometry_columns (
+                table_name TEXT, column_name TEXT, geometry_type_name TEXT,
+                srs_id INTEGER, z TINYINT, m TINYINT
+            );
+            CREATE TABLE boreal_tiles (
+                fid INTEGER PRIMARY KEY, geom BLOB, tile_num INTEGER
+            );
+            """
+        )
+        connection.execute(
+            "INSERT INTO gpkg_spatial_ref_sys VALUES "
+            "('boreal', 100000, 'NONE', 100000, ?, '')",
+            (crs_wkt,),
+        )
+        connection.execute(
+            "INSERT INTO gpkg_contents VALUES "
+            "('boreal_tiles', 'features', 'boreal_tiles', 100000)"
+        )
+        connection.execute(
+            "INSERT INTO gpkg_geometry_columns VALUES "
+            "('boreal_tiles', 'geom', 'POLYGON', 100000, 0, 0)"
+        )
+        for cog_path in cog_paths:
+            with rasterio.open(cog_path) as src:
+                bounds = src.bounds
+            tile_num = int(os.path.splitext(cog_path)[0].split("_")[-1])
+            # GeoPackage binary header with an xy envelope, followed by the WKB
+            blob = (
+                b"GP"
+                + struct.pack("<BBi4d", 0, 0b011, 100000, *bounds)
+                + shapely.to_wkb(shapely.box(*bounds))
+            )
+            connection.execute(
+                "INSERT INTO boreal_tiles (geom, tile_num) VALUES (?, ?)",
+                (blob, tile_num),
+            )
+
+
+@pytest.fixture()
+def tiles_gpkg(tmp_path: Path) -> str:
+    """Local stand-in for the tiles GeoPackage on S3, with tiles 3 and 4"""
+    path = str(tmp_path / "boreal_tiles.gpkg")
+    write_tiles_gpkg(
+        path,
+        [
+            os.path.join(DATA_DIR, "boreal_ht_2020_202501131736787421_0000003.tif"),
+            os.path.join(DATA_DIR, "boreal_ht_2020_202501131736787421_0000004.tif"),
+        ],
+    )
+    return path
+
+
+@pytest.fixture()
+def antimeridian_cog(tmp_path: Path) -> str:
+    """COG of a tile that crosses longitude 180"""
+    path = str(tmp_path / "boreal_ht_2020_202501131736787421_0000007.tif")
+    with rasterio.open(
+        os.path.join(DATA_DIR, "boreal_ht_2020_202501131736787421_0000004.tif")
+    ) as src:
+        profile = src.profile
+        data = src.read()
+    # the tile CRS is centered on longitude 180, tiles are 90 km
+    profile["transform"] = Affine(1500.0, 0.0, -45000.0, 0.0, -1500.0, 2830000.0)
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(data)
+    return path
+
+
+@pytest.fixture()
+def antimeridian_tiles_gpkg(tmp_path: Path, antimeridian_cog: str) -> str:
+    """Tiles GeoPackage with the tile of :func:`antimeridian_cog`"""
+    path = str(tmp_path / "antimeridian_tiles.gpkg")
+    write_tiles_gpkg(path, [antimeridian_cog])
+    return path
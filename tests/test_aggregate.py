@@ -0,0 +1,166 @@
+"""Tests for the collection extent and summaries computed from items"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import pytest
+from pystac import Item
+
+from stactools.icesat2_boreal.aggregate import (
+    BandSummary,
+    CollectionSummary,
+    iter_item_dicts,
+    summarize,
+)
+from stactools.icesat2_boreal.constants import SUMMARIES
+from stactools.icesat2_boreal.options import StatisticsMode, ValidationMode, Variable
+from stactools.icesat2_boreal.stac import create_collection, create_item
+from stactools.icesat2_boreal.store import ItemStore
+
+
+@pytest.fixture
+def item_dicts(cog_key_in_daac: str, cog_key_not_in_daac: str) -> List[Dict[str, Any]]:
+    """Items of both test COGs, with exact statistics"""
+    return [
+        create_item(
+            cog_key,
+            cog_key.replace(".tif", "_train.parquet"),
+            validation=ValidationMode.NONE,
+            statistics=StatisticsMode.EXACT,
+        ).to_dict(include_self_link=False)
+        for cog_key in (cog_key_in_daac, cog_key_not_in_daac)
+    ]
+
+
+def band_summary(pixels: np.ndarray, size: int) -> BandSummary:
+    """Summary of one item with ``size`` pixels, of which ``pixels`` are valid"""
+    return BandSummary.from_statistics(
+        {
+            "mean": pixels.mean(),
+            "minimum": pixels.min(),
+            "maximum": pixels.max(),
+            "stddev": pixels.std(),
+            "valid_percent": 100 * pixels.size / size,
+        },
+        size,
+    )
+
+
+def assert_same(summary: CollectionSummary, expected: CollectionSummary) -> None:
+    """Assert that two summaries are equal up to floating point error"""
+    actual, wanted = summary.to_dict(), expected.to_dict()
+    bands, wanted_bands = actual.pop("bands"), wanted.pop("bands")
+    assert actual == wanted
+    assert list(bands) == list(wanted_bands)
+    for name, band in bands.items():
+        assert band == pytest.approx(wanted_bands[name])
+
+
+def test_band_summary_merge() -> None:
+    """Test that merged summaries match the statistics of all pixels"""
+    rng = np.random.default_rng(0)
+    tiles = [rng.gamma(2.0, scale, size) for scale, size in ((4, 900), (9, 300))]
+    tiles.append(rng.normal(50, 3, 1000))
+
+    summary = BandSummary()
+    for tile in tiles:
+        summary.merge(band_summary(tile, 1000))
+    summary.merge(BandSummary.from_statistics({}, 1000))
+
+    everything = np.concatenate(tiles)
+    assert summary.items == 3
+    assert summary.pixels == pytest.approx(everything.size)
+    assert summary.mean == pytest.approx(everything.mean())
+    assert summary.stddev == pytest.approx(everything.std())
+    assert summary.minimum == everything.min()
+    assert summary.maximum == everything.max()
+
+    statistics = np.array(
+        [[t.mean(), t.min(), t.max(), t.std(), 100 * t.size / 1000] for t in tiles]
+    )
+    arrays = BandSummary.from_arrays(statistics, np.full(3, 1000.0))
+    assert arrays.mean == pytest.approx(summary.mean)
+    assert arrays.stddev == pytest.approx(summary.stddev)
+    assert BandSummary.from_dict(summary.to_dict()).to_dict() == pytest.approx(
+        summary.to_dict()
+    )
+
+
+def test_collection_summary(item_dicts: List[Dict[str, Any]]) -> None:
+    """Test the summary of a stream of items"""
+    summary = CollectionSummary()
+    for item_dict in item_dicts:
+        summary.add(item_dict)
+
+    assert summary.items == 2
+    assert summary.in_daac == 1
+    bboxes = np.array([item_dict["bbox"] for item_dict in item_dicts])
+    assert summary.bbox == [*bboxes[:, :2].min(axis=0), *bboxes[:, 2:].max(axis=0)]
+    assert summary.start_datetime.isoformat() == "2020-01-01T00:00:00+00:00"
+    assert summary.end_datetime.isoformat() == "2020-12-31T23:59:59+00:00"
+    assert list(summary.bands) == ["mean_ht", "std_ht"]
+    band_statistics = [
+        item_dict["assets"]["cog"]["bands"][0]["statistics"] for item_dict in item_dicts
+    ]
+    assert summary.bands["mean_ht"].maximum == max(
+        statistics["maximum"] for statistics in band_statistics
+    )
+
+    # partial summaries merge to the summary of all items
+    merged = CollectionSummary()
+    for item_dict in item_dicts:
+        partial = CollectionSummary()
+        partial.add(item_dict)
+        merged.merge(CollectionSummary.from_dict(partial.to_dict()))
+    assert_same(merged, summary)
+
+    # the same summary from the columns of an item store
+    from_store = CollectionSummary()
+    from_store.add_store(ItemStore(item_dicts))
+    assert_same(from_store, summary)
+
+
+def test_apply(item_dicts: List[Dict[str, Any]]) -> None:
+    """Test that the collection extent and summaries come from the items"""
+    summary = CollectionSummary()
+    for item_dict in item_dicts:
+        summary.add(item_dict)
+
+    collection = create_collection(Variable.HT, ValidationMode.NONE, summary=summary)
+    assert collection.extent.spatial.bboxes == [summary.bbox]
+    assert collection.extent.temporal.intervals == [
+        [summary.start_datetime, summary.end_datetime]
+    ]
+    summaries = collection.summaries.to_dict()
+    assert [band["name"] for band in summaries["bands"]] == ["mean_ht", "std_ht"]
+    assert summaries["bands"][0]["statistics"]["mean"] == summary.bands["mean_ht"].mean
+    assert summaries["icesat2-boreal:in_daac"] == [False, True]
+    assert summaries["gsd"] == {"minimum": 30, "maximum": 30}
+
+    # the static summaries shared by every collection are left alone
+    assert "bands" not in SUMMARIES.to_dict()
+    collection = create_collection(Variable.HT, ValidationMode.NONE)
+    assert "bands" not in collection.summaries.to_dict()
+
+
+def test_summarize(item_dicts: List[Dict[str, Any]], tmp_path: Path) -> None:
+    """Test summarizing create-items outputs in parallel"""
+    (tmp_path / "items").mkdir()
+    for item_dict in item_dicts:
+        Item.from_dict(item_dict).save_object(
+            include_self_link=False,
+            dest_href=str(tmp_path / "items" / f"{item_dict['id']}.json"),
+        )
+    ndjson = tmp_path / "items.ndjson"
+    ndjson.write_text("\n".join(json.dumps(item_dict) for item_dict in item_dicts))
+
+    assert [d["id"] for d in iter_item_dicts(str(tmp_path / "items"))] == sorted(
+        d["id"] for d in item_dicts
+    )
+    assert len(list(iter_item_dicts(str(ndjson)))) == 2
+
+    summary = summarize([str(tmp_path / "items"), str(ndjson)], workers=2)
+    assert summary.items == 4
+    assert summary.in_daac == 2
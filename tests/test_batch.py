@@ -0,0 +1,113 @@
+"""Tests for batch item generation"""
+
+import os
+from pathlib import Path
+from typing import Any, NoReturn
+
+import pytest
+from pystac import Item
+
+from stactools.icesat2_boreal import batch
+from stactools.icesat2_boreal.batch import (
+    ExecutorType,
+    TileError,
+    create_items,
+    iter_items,
+    parse_manifest,
+    read_manifest,
+)
+from stactools.icesat2_boreal.workqueue import is_transient
+
+
+class _UnpicklableError(Exception):
+    """An exception that can't be rebuilt from its args, like GetSchemaError"""
+
+    def __init__(self, url: str, reason: str) -> None:
+        """Format the message from two arguments"""
+        super().__init__(f"{url}: {reason}")
+
+
+def _raise_unpicklable(*args: Any, **kwargs: Any) -> NoReturn:
+    raise _UnpicklableError("https://example.com/schema.json", "timed out")
+
+
+def _kill_worker(*args: Any, **kwargs: Any) -> NoReturn:
+    os._exit(1)
+
+
+def test_parse_manifest() -> None:
+    """Test manifest parsing"""
+    text = "# header\n\na.tif b_train.parquet\nc.tif,d_train.parquet\n"
+    assert parse_manifest(text) == [
+        ("a.tif", "b_train.parquet"),
+        ("c.tif", "d_train.parquet"),
+    ]
+
+    with pytest.raises(ValueError, match="line 1"):
+        parse_manifest("a.tif")
+
+
+def test_read_manifest(tmp_path: Path) -> None:
+    """Test that manifest keys are validated and superseded runs dropped"""
+    keys = [
+        "s3://bucket/boreal_agb_2020_202411251732556086_0000004.tif",
+        "s3://bucket/boreal_agb_2020_202501131736787421_0000004.tif",
+    ]
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("".join(f"{key} {key}.parquet\n" for key in keys))
+    assert read_manifest(str(manifest)) == [(key, f"{key}.parquet") for key in keys]
+    assert read_manifest(str(manifest), latest_only=True) == [
+        (keys[1], f"{keys[1]}.parquet")
+    ]
+
+    manifest.write_text("s3://bucket/a.tif s3://bucket/a_train.parquet\n")
+    with pytest.raises(ValueError, match="1 of 1 keys are not"):
+        read_manifest(str(manifest))
+
+
+@pytest.mark.parametrize("executor_type", list(ExecutorType))
+def test_create_items(
+    tmp_path: Path,
+    cog_key_in_daac: str,
+    cog_key_not_in_daac: str,
+    executor_type: ExecutorType,
+) -> None:
+    """Test that a failing tile does not stop the batch"""
+    missing = cog_key_in_daac.replace("0000004", "0000005")
+    pairs = [
+        (cog_key_in_daac, "file://training_data.parquet"),
+        (missing, "file://training_data.parquet"),
+        (cog_key_not_in_daac, "file://training_data.parquet"),
+    ]
+    result = create_items(pairs, str(tmp_path), workers=2, executor_type=executor_type)
+
+    assert not result.ok
+    assert len(result.hrefs) == 2
+    assert [error.cog_key for error in result.errors] == [missing]
+    assert sorted(Item.from_file(href).id for href in result.hrefs) == [
+        "boreal_ht_2020_202501131736787421_0000003",
+        "boreal_ht_2020_202501131736787421_0000004",
+    ]
+
+
+def test_iter_items_unpicklable_error(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that worker errors reach the parent even if they can't be pickled"""
+    monkeypatch.setattr(batch, "create_item", _raise_unpicklable)
+    pairs = [(f"{i}.tif", f"{i}_train.parquet") for i in range(4)]
+    results = list(iter_items(pairs, workers=1, executor_type=ExecutorType.PROCESS))
+
+    assert [result.cog_key for result in results] == [key for key, _ in pairs]
+    for result in results:
+        assert isinstance(result.error, TileError)
+        assert repr(result.error).startswith("_UnpicklableError(")
+        assert is_transient(result.error)
+
+
+def test_iter_items_broken_pool(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a broken process pool fails the remaining tiles, not the run"""
+    monkeypatch.setattr(batch, "create_item", _kill_worker)
+    pairs = [(f"{i}.tif", f"{i}_train.parquet") for i in range(6)]
+    results = list(iter_items(pairs, workers=1, executor_type=ExecutorType.PROCESS))
+
+    assert sorted(result.cog_key for result in results) == [key for key, _ in pairs]
+    assert all(result.error is not None for result in results)
@@ -0,0 +1,113 @@
+"""Tests for the GDAL configuration and the COG block cache"""
+
+import time
+from pathlib import Path
+
+import pytest
+import rasterio
+
+from stactools.icesat2_boreal.batch import create_items
+from stactools.icesat2_boreal.cache import BlockCache, CachedFile, gdal_env
+from stactools.icesat2_boreal.metrics import track_io
+from stactools.icesat2_boreal.options import (
+    ExecutorType,
+    StatisticsMode,
+    ValidationMode,
+)
+from stactools.icesat2_boreal.stac import create_item
+
+
+def test_cached_file(cog_key_in_daac: str, tmp_path: Path) -> None:
+    """Test that reads through the cache return the file's bytes"""
+    data = Path(cog_key_in_daac.removeprefix("file://")).read_bytes()
+    cache = BlockCache(str(tmp_path / "cache"), block_size=4096)
+    ranges = [(0, 100), (4000, 9000), (len(data) - 10, len(data) + 100), (50, 60)]
+
+    with track_io() as counters:
+        with CachedFile(cog_key_in_daac, cache) as f:
+            for start, end in ranges:
+                f.seek(start)
+                assert f.read(end - start) == data[start:end]
+            assert f.seek(0, 2) == len(data)
+    # block 0 is read once, then served from memory
+    assert counters.cache_hits == 0
+    assert counters.cache_misses == 4
+
+    with track_io() as counters:
+        with CachedFile(cog_key_in_daac, cache, header=data[:100]) as f:
+            for start, end in ranges:
+                f.seek(start)
+                assert f.read(end - start) == data[start:end]
+    assert counters.cache_misses == 0
+    assert counters.cache_hit_rate == 1
+    assert counters.bytes_read == 0
+
+
+def test_evict(tmp_path: Path) -> None:
+    """Test that the least recently used blocks are evicted"""
+    cache = BlockCache(str(tmp_path / "cache"), max_bytes=1000, block_size=100)
+    for index in range(8):
+        cache.put("s3://bucket/tile.tif", index, bytes(100))
+        time.sleep(0.01)
+    assert cache.get("s3://bucket/tile.tif", 0) is not None
+    for index in range(8, 11):
+        time.sleep(0.01)
+        cache.put("s3://bucket/tile.tif", index, bytes(100))
+
+    assert cache.usage() <= 1000
+    assert cache.get("s3://bucket/tile.tif", 0) is not None
+    assert cache.get("s3://bucket/tile.tif", 1) is None
+    assert cache.get("s3://bucket/tile.tif", 10) is not None
+
+
+def test_gdal_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that options set in the environment are not overridden"""
+    monkeypatch.setenv("GDAL_HTTP_MAX_RETRY", "7")
+    with gdal_env(GDAL_CACHEMAX=64):
+        options = rasterio.env.getenv()
+    assert options["GDAL_DISABLE_READDIR_ON_OPEN"] == "EMPTY_DIR"
+    assert options["GDAL_CACHEMAX"] == 64
+    assert "GDAL_HTTP_MAX_RETRY" not in options
+
+
+def test_create_item_block_cache(cog_key_in_daac: str, tmp_path: Path) -> None:
+    """Test that items read through the block cache are the same"""
+    expected = create_item(
+        cog_key_in_daac, "/path/to/train.parquet", validation=ValidationMode.NONE
+    )
+    cache = BlockCache(str(tmp_path / "cache"), block_size=64 * 1024)
+    item = create_item(
+        cog_key_in_daac,
+        "/path/to/train.parquet",
+        validation=ValidationMode.NONE,
+        block_cache=cache,
+    )
+    assert item.to_dict() == expected.to_dict()
+
+
+def test_create_items_hit_rate(
+    cog_key_in_daac: str, cog_key_not_in_daac: str, tmp_path: Path
+) -> None:
+    """Test that a second run over the same tiles is served from the cache"""
+    pairs = [
+        (key, "/path/to/train.parquet")
+        for key in (cog_key_in_daac, cog_key_not_in_daac)
+    ]
+    cache = BlockCache(str(tmp_path / "cache"))
+    results = [
+        create_items(
+            pairs,
+            str(tmp_path / "items"),
+            workers=2,
+            executor_type=ExecutorType.THREAD,
+            block_cache=cache,
+            validation=ValidationMode.NONE,
+            statistics=StatisticsMode.EXACT,
+        )
+        for _ in range(2)
+    ]
+
+    assert results[0].cache_misses > 0
+    assert results[0].profile is None
+    assert results[1].cache_hits > 0
+    assert results[1].cache_hit_rate == 1
@@ -0,0 +1,90 @@
+"""Tests for the asset size and checksum"""
+
+import base64
+import hashlib
+import os
+from pathlib import Path
+
+from pystac.extensions.file import FileExtension
+
+from stactools.icesat2_boreal.batch import ExecutorType, create_items
+from stactools.icesat2_boreal.checksum import get_file_info, hash_file, stored_checksum
+from stactools.icesat2_boreal.constants import AssetType
+from stactools.icesat2_boreal.metrics import track_io
+from stactools.icesat2_boreal.options import OutputFormat, StatisticsMode
+from stactools.icesat2_boreal.stac import create_item
+from stactools.icesat2_boreal.validation import ValidationMode
+
+
+def test_hash_file(cog_key_in_daac: str) -> None:
+    """Test the size and SHA2-256 multihash of a file, read in several chunks"""
+    data = Path(cog_key_in_daac.removeprefix("file://")).read_bytes()
+    with track_io() as counters:
+        file_info = hash_file(cog_key_in_daac, chunk_size=4096)
+
+    assert file_info.size == len(data)
+    assert file_info.checksum == "1220" + hashlib.sha256(data).hexdigest()
+    assert counters.bytes_hashed == len(data)
+    assert get_file_info(cog_key_in_daac) == file_info
+
+
+def test_stored_checksum() -> None:
+    """Test that S3 checksums and single part ETags are used as multihashes"""
+    digest = hashlib.sha256(b"data").digest()
+    assert stored_checksum(
+        {"ChecksumSHA256": base64.b64encode(digest).decode(), "ETag": '"abc-2"'}
+    ) == ("1220" + digest.hex())
+
+    md5 = hashlib.md5(b"data").hexdigest()
+    assert stored_checksum({"ETag": f'"{md5}"'}) == "d510" + md5
+    # multipart uploads have neither a content MD5 nor a full object checksum
+    assert stored_checksum({"ChecksumSHA256": "abc=-3", "ETag": f'"{md5}-3"'}) is None
+    assert stored_checksum({}) is None
+
+
+def test_create_item_checksums(cog_key_in_daac: str, tmp_path: Path) -> None:
+    """Test that file extension fields are added to both assets"""
+    parquet_key = str(tmp_path / "train.parquet")
+    Path(parquet_key).write_bytes(b"PAR1")
+    item = create_item(
+        cog_key_in_daac,
+        parquet_key,
+        validation=ValidationMode.NONE,
+        statistics=StatisticsMode.NONE,
+        checksums=True,
+    )
+
+    assert FileExtension.get_schema_uri() in item.stac_extensions
+    cog = FileExtension.ext(item.assets[AssetType.COG])
+    assert cog.size == os.path.getsize(cog_key_in_daac.removeprefix("file://"))
+    assert cog.checksum == get_file_info(cog_key_in_daac).checksum
+    parquet = FileExtension.ext(item.assets[AssetType.TRAINING_DATA_PARQUET])
+    assert parquet.size == 4
+    assert parquet.checksum == "1220" + hashlib.sha256(b"PAR1").hexdigest()
+
+
+def test_create_items_hash_throughput(
+    cog_key_in_daac: str, cog_key_not_in_daac: str, tmp_path: Path
+) -> None:
+    """Test that the batch result reports the bytes hashed and the throughput"""
+    parquet_key = str(tmp_path / "train.parquet")
+    Path(parquet_key).write_bytes(b"PAR1")
+    cog_keys = [cog_key_in_daac, cog_key_not_in_daac]
+    result = create_items(
+        [(cog_key, parquet_key) for cog_key in cog_keys],
+        str(tmp_path / "items.ndjson"),
+        workers=2,
+        executor_type=ExecutorType.THREAD,
+        output_format=OutputFormat.NDJSON,
+        validation=ValidationMode.NONE,
+        statistics=StatisticsMode.NONE,
+        checksums=True,
+    )
+
+    assert result.ok
+    assert result.profile is None
+    assert result.bytes_hashed == 8 + sum(
+        os.path.getsize(cog_key.removeprefix("file://")) for cog_key in cog_keys
+    )
+    assert result.stored_checksums == 0
+    assert result.hash_throughput > 0
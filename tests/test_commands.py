@@ -1,5 +1,8 @@
 """Tests for cli commands"""
 
+import json
+import subprocess
+import sys
 from pathlib import Path
 
 from click import Group
@@ -34,3 +37,114 @@ def test_create_item(tmp_path: Path, cog_key_in_daac: str) -> None:
     assert result.exit_code == 0, "\n{}".format(result.output)
     item = Item.from_file(path)
     item.validate()
+
+
+def test_create_items(
+    tmp_path: Path, cog_key_in_daac: str, cog_key_not_in_daac: str
+) -> None:
+    """Test create items cli"""
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text(
+        f"{cog_key_in_daac} /path/to/train.parquet\n"
+        f"{cog_key_not_in_daac} /path/to/train.parquet\n"
+    )
+    destination = tmp_path / "items"
+    runner = CliRunner()
+    result = runner.invoke(
+        command,
+        [
+            "create-items",
+            str(manifest),
+            str(destination),
+            "--workers",
+            "2",
+            "--executor",
+            "thread",
+        ],
+    )
+    assert result.exit_code == 0, "\n{}".format(result.output)
+    assert len(list(destination.glob("*.json"))) == 2
+
+
+def test_plugin_registration_is_lazy() -> None:
+    """Test that registering the plugin does not import the heavy dependencies"""
+    code = (
+        "import sys\n"
+        "from click import Group\n"
+        "import stactools.icesat2_boreal as plugin\n"
+        "from stactools.icesat2_boreal.commands import create_icesat2boreal_command\n"
+        "create_icesat2boreal_command(Group())\n"
+        "heavy = ['rasterio', 'pystac', 'rio_stac', 'shapely', 'fsspec', 'numpy']\n"
+        "print(','.join(m for m in heavy if m in sys.modules))\n"
+        "assert callable(plugin.create_item)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == ""
+
+
+def test_create_collection_from_items(tmp_path: Path, cog_key_in_daac: str) -> None:
+    """Test a collection with the extent and summaries of generated items"""
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text(f"{cog_key_in_daac} /path/to/train.parquet\n")
+    items = str(tmp_path / "items.ndjson")
+    runner = CliRunner()
+    result = runner.invoke(
+        command,
+        ["create-items", str(manifest), items, "--format", "ndjson", "--workers", "1"],
+    )
+    assert result.exit_code == 0, "\n{}".format(result.output)
+
+    path = str(tmp_path / "collection.json")
+    result = runner.invoke(command, ["create-collection", "ht", path, "--items", items])
+    assert result.exit_code == 0, "\n{}".format(result.output)
+    assert "Summarized 1 items, 1 of them in the DAAC" in result.output
+    collection = Collection.from_file(path)
+    item = Item.from_dict(json.loads(Path(items).read_text()))
+    assert collection.extent.spatial.bboxes == [item.bbox]
+    assert collection.summaries.get_list("icesat2-boreal:in_daac") == [True]
+
+
+def test_build_mosaic(tmp_path: Path, cog_key_in_daac: str) -> None:
+    """Test that a mosaic is built from a manifest and added to the collection"""
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text(f"{cog_key_in_daac} /path/to/train.parquet\n")
+    runner = CliRunner()
+    result = runner.invoke(
+        command, ["build-mosaic", str(manifest), str(tmp_path / "mosaic")]
+    )
+    assert result.exit_code == 0, "\n{}".format(result.output)
+    cog = tmp_path / "mosaic" / "boreal_ht_mosaic.tif"
+    assert cog.exists()
+
+    path = str(tmp_path / "collection.json")
+    result = runner.invoke(
+        command, ["create-collection", "ht", path, "--mosaic", str(cog)]
+    )
+    assert result.exit_code == 0, "\n{}".format(result.output)
+    collection = Collection.from_file(path)
+    assert collection.assets["overview"].href == str(cog)
+
+
+def test_build_mosaicjson(tmp_path: Path, cog_key_in_daac: str) -> None:
+    """Test that the quadkey index is built from create-items output"""
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text(f"{cog_key_in_daac} /path/to/train.parquet\n")
+    items = str(tmp_path / "items.ndjson")
+    runner = CliRunner()
+    result = runner.invoke(
+        command,
+        ["create-items", str(manifest), items, "--format", "ndjson", "--workers", "1"],
+    )
+    assert result.exit_code == 0, "\n{}".format(result.output)
+
+    path = str(tmp_path / "mosaic.json")
+    for args in ([], ["--update"]):
+        result = runner.invoke(
+            command, ["build-mosaicjson", path, "--items", items, *args]
+        )
+        assert result.exit_code == 0, "\n{}".format(result.output)
+    assert "Indexed 0 items, 1 quadkeys" in result.output
+    document = json.loads(Path(path).read_text())
+    assert document["tiles"] == {"120023": [cog_key_in_daac]}
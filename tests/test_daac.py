@@ -0,0 +1,22 @@
+"""Tests for the DAAC tile lookup"""
+
+import pytest
+
+from stactools.icesat2_boreal.daac import classify_tiles, daac_tiles, in_daac
+
+
+def test_in_daac() -> None:
+    """Test single tile lookups"""
+    assert in_daac("0000004")
+    assert not in_daac("0000003")
+    assert daac_tiles() is daac_tiles()
+
+
+def test_classify_tiles() -> None:
+    """Test that batch classification matches single lookups"""
+    tile_ids = ["0000003", "0000004", "0003543", "9999999"]
+    assert classify_tiles(tile_ids).tolist() == [in_daac(t) for t in tile_ids]
+    assert classify_tiles([]).tolist() == []
+
+    with pytest.raises(ValueError):
+        classify_tiles(["not-a-tile"])
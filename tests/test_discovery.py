@@ -0,0 +1,63 @@
+"""Tests for asset discovery"""
+
+from pathlib import Path
+
+import pytest
+
+from stactools.icesat2_boreal.constants import AssetType
+from stactools.icesat2_boreal.discovery import discover_assets, match_asset
+
+
+@pytest.fixture()
+def run_dir(tmp_path: Path) -> Path:
+    """Run output tree with reruns, an incomplete group and unrelated files"""
+    files = [
+        "2025/08/19/09/59/01/262274/boreal_agb_2020_202508191755618683_0000004.tif",
+        "2025/08/19/09/59/01/262274/"
+        "boreal_agb_2020_202508191755618683_0000004_train.parquet",
+        "2025/08/19/09/59/01/262274/_job.log",
+        "2025/08/20/10/00/00/1/boreal_agb_2020_202508201755684000_0000004.tif",
+        "2025/08/20/10/00/00/1/boreal_agb_2020_202508201755684000_0000004_train.parquet",
+        "2025/08/20/11/00/00/2/boreal_agb_2020_202508201755687600_0000009.tif",
+        "2025/08/20/11/00/00/2/boreal_agb_2020_202508201755687600_0000009_train.parquet",
+        "2025/08/21/12/00/00/3/boreal_agb_2020_202508211755777600_0000010.tif",
+    ]
+    for name in files:
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+    return tmp_path
+
+
+def test_match_asset() -> None:
+    """Test matching file names to asset types"""
+    assert match_asset("boreal_ht_2020_202501131736787421_0000004_train.parquet") == (
+        AssetType.TRAINING_DATA_PARQUET,
+        "boreal_ht_2020_202501131736787421_0000004",
+    )
+    assert match_asset("boreal_ht_2020_202501131736787421_0000004.tif") == (
+        AssetType.COG,
+        "boreal_ht_2020_202501131736787421_0000004",
+    )
+    assert match_asset("something.tif") is None
+
+
+def test_discover_assets(run_dir: Path) -> None:
+    """Test grouping, de-duplication of reruns and incomplete groups"""
+    result = discover_assets(str(run_dir), workers=4)
+
+    assert [group.item_id for group in result.groups] == [
+        "boreal_agb_2020_202508201755684000_0000004",
+        "boreal_agb_2020_202508201755687600_0000009",
+    ]
+    assert [group.item_id for group in result.superseded] == [
+        "boreal_agb_2020_202508191755618683_0000004"
+    ]
+    assert [group.missing for group in result.incomplete] == [
+        {AssetType.TRAINING_DATA_PARQUET.value}
+    ]
+    cog_key, parquet_key = result.pairs()[0]
+    assert cog_key.endswith("0000004.tif")
+    assert parquet_key.endswith("0000004_train.parquet")
+
+    assert len(discover_assets(str(run_dir), latest_only=False).groups) == 3
@@ -0,0 +1,82 @@
+"""Tests for the key parser"""
+
+import pytest
+
+from stactools.icesat2_boreal.keys import ItemName, parse_keys, plan_manifest
+from stactools.icesat2_boreal.options import Variable
+
+PREFIX = "s3://maap-ops-workspace/run/2025/01/13/00/00/00/1"
+
+
+def _key(variable: str, run_id: str, tile_id: str) -> str:
+    return f"{PREFIX}/boreal_{variable}_2020_{run_id}_{tile_id}.tif"
+
+
+def test_parse_keys() -> None:
+    """Test that a manifest's keys are parsed like single keys"""
+    keys = [
+        _key("agb", "202411251732556086", "0000004"),
+        _key("ht", "202501131736787421", "0036023"),
+        "boreal_ht_2020_202501131736787421_0000003",
+    ]
+    parsed = parse_keys(keys)
+    assert len(parsed) == 3
+    assert [parsed.name(i) for i in range(3)] == [
+        ItemName.from_key(key) for key in keys
+    ]
+    assert parsed.name(1) == ItemName(
+        item_id="boreal_ht_2020_202501131736787421_0036023",
+        variable=Variable.HT,
+        year=2020,
+        run_id="202501131736787421",
+        tile_id="0036023",
+    )
+    assert len(parse_keys([])) == 0
+
+
+@pytest.mark.parametrize(
+    "key",
+    [
+        _key("xyz", "202411251732556086", "0000004"),
+        _key("agb", "20241125", "4"),
+        _key("agb", "2024", "0000004"),
+        f"{PREFIX}/boreal_agb_20_202411251732556086_0000004.tif",
+        f"{PREFIX}/boreal_agb_2020_202411251732556086_0000004_train.parquet",
+    ],
+)
+def test_parse_keys_invalid(key: str) -> None:
+    """Test that malformed keys are reported"""
+    valid = _key("agb", "202411251732556086", "0000004")
+    with pytest.raises(ValueError, match=r"1 of 3 keys are not") as excinfo:
+        parse_keys([valid, key, valid])
+    assert key in str(excinfo.value)
+    with pytest.raises(ValueError):
+        ItemName.from_key(key)
+
+
+def test_parse_keys_invalid_date() -> None:
+    """Test that run IDs must start with a date"""
+    keys = [_key("agb", f"2024{month:02d}011732556086", "0000004") for month in (1, 13)]
+    with pytest.raises(ValueError, match="valid date") as excinfo:
+        parse_keys(keys)
+    assert keys[1] in str(excinfo.value)
+    assert keys[0] not in str(excinfo.value)
+
+
+def test_plan_manifest() -> None:
+    """Test that only the newest run of each variable and tile is kept"""
+    pairs = [
+        (key, key.replace(".tif", "_train.parquet"))
+        for key in [
+            _key("agb", "202411251732556086", "0000004"),
+            _key("agb", "202501131736787421", "0000004"),
+            _key("ht", "202411251732556086", "0000004"),
+            _key("agb", "202411251732556086", "0000005"),
+            _key("agb", "20241125173255608", "0000005"),
+        ]
+    ]
+    plan = plan_manifest(pairs)
+    assert plan.pairs == [pairs[1], pairs[2], pairs[3]]
+    assert plan.superseded == [pairs[0], pairs[4]]
+
+    assert plan_manifest(pairs, latest_only=False).pairs == pairs
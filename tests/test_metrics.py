@@ -0,0 +1,99 @@
+"""Tests for I/O counters and stage timers"""
+
+import json
+from pathlib import Path
+
+from click import Group
+from click.testing import CliRunner
+
+from stactools.icesat2_boreal.batch import ExecutorType, create_items
+from stactools.icesat2_boreal.commands import create_icesat2boreal_command
+from stactools.icesat2_boreal.metrics import IOCounters, stage, track_io
+from stactools.icesat2_boreal.stac import create_item
+from stactools.icesat2_boreal.validation import ValidationMode
+
+
+def test_stage_disabled() -> None:
+    """Test that stages outside of track_io record nothing"""
+    with stage("open"):
+        pass
+
+    with track_io() as counters:
+        pass
+    assert counters.to_dict()["stages"] == {}
+
+
+def test_merge_and_report() -> None:
+    """Test merging counters and the round trip through the report"""
+    counters = IOCounters(dataset_opens=1, bytes_read=10, items=1)
+    counters.add_stage("open", 0.5)
+    counters.add_stage("statistics", 2.0)
+    other = IOCounters.from_dict(counters.to_dict())
+    counters.merge(other)
+
+    report = counters.to_dict()
+    assert report["items"] == 2
+    assert report["dataset_opens"] == 2
+    assert report["bytes_read"] == 20
+    assert list(report["stages"]) == ["statistics", "open"]
+    assert report["stages"]["open"] == {
+        "calls": 2,
+        "seconds": 1.0,
+        "mean_seconds": 0.5,
+    }
+
+
+def test_create_item_stages(cog_key_in_daac: str) -> None:
+    """Test the stages recorded while creating an item"""
+    with track_io() as counters:
+        create_item(cog_key_in_daac, "/path/to/train.parquet")
+
+    stages = counters.to_dict()["stages"]
+    assert {"daac", "open", "rio_stac", "statistics", "validate"} <= set(stages)
+    assert counters.dataset_opens == 1
+
+
+def test_create_items_profile(
+    tmp_path: Path, cog_key_in_daac: str, cog_key_not_in_daac: str
+) -> None:
+    """Test that a profiled batch sums the reports of its workers"""
+    pairs = [
+        (cog_key_in_daac, "/path/to/train.parquet"),
+        (cog_key_not_in_daac, "/path/to/train.parquet"),
+    ]
+    result = create_items(
+        pairs,
+        str(tmp_path),
+        workers=2,
+        executor_type=ExecutorType.THREAD,
+        profile=True,
+        validation=ValidationMode.NONE,
+    )
+
+    assert result.profile is not None
+    assert result.profile.items == 2
+    assert result.profile.dataset_opens == 2
+    stages = result.profile.to_dict()["stages"]
+    assert stages["write"]["calls"] == 2
+    assert stages["serialize"]["calls"] == 2
+
+    assert create_items(pairs, str(tmp_path), workers=1).profile is None
+
+
+def test_profile_option(tmp_path: Path, cog_key_in_daac: str) -> None:
+    """Test the JSON report printed by --profile"""
+    command = create_icesat2boreal_command(Group())
+    result = CliRunner().invoke(
+        command,
+        [
+            "create-item",
+            cog_key_in_daac,
+            "/path/to/train.parquet",
+            str(tmp_path / "item.json"),
+            "--profile",
+        ],
+    )
+    assert result.exit_code == 0, result.stderr
+    report = json.loads(result.stderr)
+    assert report["items"] == 1
+    assert report["dataset_opens"] == 1
@@ -0,0 +1,115 @@
+"""Tests for the circumpolar mosaic"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+import rasterio
+
+from stactools.icesat2_boreal.mosaic import (
+    MOSAIC_CRS,
+    OVERVIEW_ASSET_KEY,
+    Mosaic,
+    MosaicGrid,
+    Patch,
+    build_mosaic,
+    composite,
+    mosaic_variable,
+)
+from stactools.icesat2_boreal.options import ExecutorType, ValidationMode, Variable
+from stactools.icesat2_boreal.stac import create_collection
+
+# a small grid around the test tile
+GRID = MosaicGrid(resolution=3000, bounds=(400_000, -3_660_000, 560_000, -3_530_000))
+
+
+def test_grid_window() -> None:
+    """Test that windows are rounded out to whole pixels and clipped to the grid"""
+    grid = MosaicGrid(resolution=10, bounds=(0, 0, 100, 100))
+    assert (grid.width, grid.height) == (10, 10)
+    window = grid.window((15, 42, 31, 58))
+    assert (window.col_off, window.row_off, window.width, window.height) == (
+        1,
+        4,
+        3,
+        2,
+    )
+    window = grid.window((-50, -50, 5, 5))
+    assert (window.col_off, window.row_off, window.width, window.height) == (
+        0,
+        9,
+        1,
+        1,
+    )
+    assert grid.window((200, 200, 300, 300)) is None
+
+
+def test_mosaic_mean() -> None:
+    """Test that overlapping patches are averaged and empty pixels masked"""
+    mosaic = Mosaic(MosaicGrid(resolution=10, bounds=(0, 0, 30, 10)))
+    mosaic.add(Patch(0, 0, np.array([[1.0, 2.0]], dtype=np.float32)))
+    mosaic.add(Patch(0, 1, np.array([[4.0, np.nan]], dtype=np.float32)))
+    data = mosaic.to_array()
+    assert data.tolist() == [[1.0, 3.0, None]]
+
+
+def test_composite(cog_key_in_daac: str, tmp_path: Path) -> None:
+    """Test that tiles are reprojected and failures are collected"""
+    missing = str(tmp_path / "boreal_ht_2020_202501131736787421_0000009.tif")
+    mosaic, errors = composite(
+        [cog_key_in_daac, missing],
+        GRID,
+        workers=2,
+        executor_type=ExecutorType.THREAD,
+        chunk_size=1,
+    )
+    assert [href for href, _ in errors] == [missing]
+
+    data = mosaic.to_array()
+    with rasterio.open(cog_key_in_daac) as src:
+        expected = np.ma.masked_invalid(src.read(1)).mean()
+    assert data.count() > 0
+    assert data.mean() == pytest.approx(expected, rel=0.01)
+
+
+def test_build_mosaic(cog_key_in_daac: str, tmp_path: Path) -> None:
+    """Test that the mosaic COG and PNG are written"""
+    result = build_mosaic([cog_key_in_daac], str(tmp_path), GRID)
+    assert result.tiles == 1
+    assert not result.errors
+    assert result.cog_href == str(tmp_path / "boreal_ht_mosaic.tif")
+
+    with rasterio.open(result.cog_href) as src:
+        assert src.crs.to_string() == MOSAIC_CRS
+        assert src.shape == (GRID.height, GRID.width)
+        assert src.tags(ns="IMAGE_STRUCTURE")["LAYOUT"] == "COG"
+        data = src.read(1, masked=True)
+    with rasterio.open(result.png_href) as src:
+        assert src.count == 4
+        alpha = src.read(4)
+    assert ((alpha == 0) == data.mask).all()
+
+
+def test_mosaic_variable() -> None:
+    """Test that a mosaic is built from the tiles of one variable"""
+    agb = "boreal_agb_2020_202411251732556086_0000001.tif"
+    ht = "boreal_ht_2020_202411251732556086_0000001.tif"
+    assert mosaic_variable([agb]) == Variable.AGB
+    with pytest.raises(ValueError, match="one variable"):
+        mosaic_variable([agb, ht])
+
+
+def test_create_collection_mosaic() -> None:
+    """Test that the mosaic is registered as collection assets"""
+    collection = create_collection(
+        Variable.HT,
+        validation=ValidationMode.NONE,
+        mosaic="s3://bucket/mosaic/boreal_ht_mosaic.tif",
+    )
+    assert collection.assets["thumbnail"].href == (
+        "s3://bucket/mosaic/boreal_ht_mosaic.png"
+    )
+    overview = collection.assets[OVERVIEW_ASSET_KEY]
+    assert overview.href == "s3://bucket/mosaic/boreal_ht_mosaic.tif"
+    assert overview.roles == ["overview"]
+    assert "tiles" in collection.assets
@@ -0,0 +1,105 @@
+"""Tests for the MosaicJSON quadkey index"""
+
+import copy
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+
+from stactools.icesat2_boreal.mosaicjson import (
+    MosaicIndex,
+    footprint_quadkeys,
+    quadkey,
+    tile_bounds,
+    tile_range,
+)
+from stactools.icesat2_boreal.options import ValidationMode
+from stactools.icesat2_boreal.stac import create_item
+
+
+@pytest.fixture
+def item_dict(cog_key_in_daac: str) -> Dict[str, Any]:
+    """Item of the test COG"""
+    item = create_item(
+        cog_key_in_daac, "/path/to/train.parquet", validation=ValidationMode.NONE
+    )
+    return item.to_dict()
+
+
+def _rename(item_dict: Dict[str, Any], item_id: str) -> Dict[str, Any]:
+    renamed = copy.deepcopy(item_dict)
+    renamed["id"] = item_id
+    renamed["assets"]["cog"]["href"] = f"s3://bucket/{item_id}.tif"
+    return renamed
+
+
+def test_tile_math() -> None:
+    """Test web mercator tiles and quadkeys"""
+    assert [quadkey(1, 0, 1), quadkey(0, 1, 1), quadkey(3, 5, 3)] == ["1", "2", "213"]
+    assert tile_range((-180, -90, 180, 90), 2) == (0, 0, 3, 3)
+    west, south, east, north = tile_bounds(1, 0, 1)
+    assert (west, south, east) == (0, 0, 180)
+    assert north == pytest.approx(85.0511, abs=1e-4)
+    assert tile_range((10, 50, 20, 60), 6) == (33, 18, 35, 21)
+
+
+def test_footprint_quadkeys() -> None:
+    """Test that tiles missing the footprint and the antimeridian are handled"""
+    # a triangle in the lower left half of its bbox
+    triangle = {
+        "type": "Polygon",
+        "coordinates": [[[1, 1], [10, 1], [1, 10], [1, 1]]],
+    }
+    bbox = (1.0, 1.0, 10.0, 10.0)
+    assert len(footprint_quadkeys(bbox, 6)) == 4
+    assert len(footprint_quadkeys(bbox, 6, triangle)) == 3
+
+    keys = footprint_quadkeys((179.0, 60.0, -179.0, 61.0), 6)
+    assert {quadkey(0, 18, 6), quadkey(63, 18, 6)} <= keys
+    assert len(keys) == 2
+
+
+def test_add(item_dict: Dict[str, Any]) -> None:
+    """Test that newer runs of a tile replace older runs"""
+    index = MosaicIndex()
+    assert index.add(item_dict)
+    assert not index.add(item_dict)
+    href = item_dict["assets"]["cog"]["href"]
+    assert set().union(*index.tiles.values()) == {href}
+
+    west, south, east, north = item_dict["bbox"]
+    x, y, _, _ = tile_range((west, south, east, north), 12)
+    assert index.get_assets(x, y, 12) == [href]
+    assert index.get_assets(x >> 8, y >> 8, 4) == [href]
+
+    old = _rename(item_dict, "boreal_ht_2020_202401010000000000_0000004")
+    new = _rename(item_dict, "boreal_ht_2020_202601010000000000_0000004")
+    other = _rename(item_dict, "boreal_ht_2020_202401010000000000_0000005")
+    assert index.add_items([old, new, other]) == 2
+    assert index.get_assets(x, y, 12) == sorted(
+        [new["assets"]["cog"]["href"], other["assets"]["cog"]["href"]]
+    )
+
+    with pytest.raises(ValueError, match="Cannot add agb item"):
+        index.add(_rename(item_dict, "boreal_agb_2020_202601010000000000_0000006"))
+
+
+def test_save_load(item_dict: Dict[str, Any], tmp_path: Path) -> None:
+    """Test that the index is written as MosaicJSON and can be updated"""
+    index = MosaicIndex()
+    index.add(item_dict)
+    path = str(tmp_path / "mosaic.json")
+    index.save(path)
+
+    loaded = MosaicIndex.load(path)
+    document = loaded.to_dict()
+    assert document == index.to_dict()
+    assert document["mosaicjson"] == "0.0.3"
+    assert document["name"] == "icesat2-boreal-v3.1-ht"
+    assert document["quadkey_zoom"] == 6
+    assert (document["minzoom"], document["maxzoom"]) == (6, 18)
+    assert document["bounds"] == item_dict["bbox"]
+
+    new = _rename(item_dict, "boreal_ht_2020_202601010000000000_0000004")
+    assert loaded.add(new)
+    assert set().union(*loaded.tiles.values()) == {new["assets"]["cog"]["href"]}
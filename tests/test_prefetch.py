@@ -0,0 +1,92 @@
+"""Tests for concurrent header prefetching"""
+
+import os
+
+from conftest import DATA_DIR, S3Server
+
+from stactools.icesat2_boreal.batch import ExecutorType, iter_items
+from stactools.icesat2_boreal.prefetch import ByteRange, fetch_headers, fetch_ranges
+from stactools.icesat2_boreal.stac import create_item
+from stactools.icesat2_boreal.statistics import StatisticsMode
+from stactools.icesat2_boreal.validation import ValidationMode
+
+COG_NAME = "boreal_ht_2020_202501131736787421_0000004.tif"
+
+
+def test_fetch_ranges(s3_server: S3Server, cog_key_in_daac: str) -> None:
+    """Test prefix and suffix ranges over HTTP and local files"""
+    with open(os.path.join(DATA_DIR, COG_NAME), "rb") as f:
+        data = f.read()
+    href = f"http://{s3_server.endpoint}/bucket/{COG_NAME}"
+
+    results = fetch_ranges(
+        [
+            ByteRange(href, 0, 100),
+            ByteRange(href, -100),
+            ByteRange(cog_key_in_daac, 0, 100),
+            ByteRange(href.replace(COG_NAME, "missing.tif"), 0, 100),
+        ]
+    )
+
+    assert results[0] == data[:100]
+    assert results[1] == data[-100:]
+    assert results[2] == data[:100]
+    assert isinstance(results[3], FileNotFoundError)
+
+
+def test_fetch_headers(s3_server: S3Server) -> None:
+    """Test that one request is made per file and failures are left out"""
+    hrefs = [f"http://{s3_server.endpoint}/bucket{i}/{COG_NAME}" for i in range(20)]
+    missing = f"http://{s3_server.endpoint}/bucket/missing.tif"
+
+    headers = fetch_headers([*hrefs, missing], header_size=1024, concurrency=4)
+
+    assert sorted(headers) == sorted(hrefs)
+    assert all(len(header) == 1024 for header in headers.values())
+    assert s3_server.requests["GET"] == 21
+
+
+def test_create_item_with_header(s3_server: S3Server) -> None:
+    """Test that metadata reads are served from the prefetched header"""
+    href = f"http://{s3_server.endpoint}/bucket/{COG_NAME}"
+    kwargs = {"validation": ValidationMode.NONE, "statistics": StatisticsMode.HEADER}
+    header = fetch_headers([href])[href]
+    with s3_server.env():
+        expected = create_item(href, "/path/to/train.parquet", **kwargs)
+        s3_server.requests.clear()
+        item = create_item(href, "/path/to/train.parquet", cog_header=header, **kwargs)
+
+    assert sum(s3_server.requests.values()) == 0
+    assert item.to_dict() == expected.to_dict()
+
+
+def test_create_item_past_header(s3_server: S3Server) -> None:
+    """Test that pixel reads beyond the header fall through to the file"""
+    href = f"http://{s3_server.endpoint}/bucket/{COG_NAME}"
+    kwargs = {"validation": ValidationMode.NONE, "statistics": StatisticsMode.EXACT}
+    header = fetch_headers([href], header_size=1024)[href]
+    with s3_server.env():
+        expected = create_item(href, "/path/to/train.parquet", **kwargs)
+        item = create_item(href, "/path/to/train.parquet", cog_header=header, **kwargs)
+
+    assert item.to_dict() == expected.to_dict()
+
+
+def test_iter_items_prefetch(cog_key_in_daac: str, cog_key_not_in_daac: str) -> None:
+    """Test batch item creation with prefetched headers"""
+    pairs = [
+        (cog_key_in_daac, "/path/to/train.parquet"),
+        (cog_key_not_in_daac, "/path/to/train.parquet"),
+    ]
+    results = list(
+        iter_items(
+            pairs,
+            workers=2,
+            executor_type=ExecutorType.THREAD,
+            prefetch=True,
+            validation=ValidationMode.NONE,
+        )
+    )
+
+    assert all(result.error is None for result in results)
+    assert len(results) == 2
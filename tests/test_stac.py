@@ -3,7 +3,10 @@
 from datetime import datetime, timezone
 
 import pytest
+import rasterio
 
+from stactools.icesat2_boreal.cache import gdal_env
+from stactools.icesat2_boreal.metrics import track_io
 from stactools.icesat2_boreal.stac import (
     AssetType,
     Variable,
@@ -39,6 +42,23 @@ def test_create_item_not_in_daac(cog_key_not_in_daac: str) -> None:
     assert not item.properties["icesat2-boreal:in_daac"]
 
 
+def test_create_item_opens_cog_once(s3_server) -> None:
+    """Test that item creation opens the COG with a single dataset handle"""
+    cog_key = "s3://bucket/boreal_ht_2020_202501131736787421_0000004.tif"
+    with s3_server.env():
+        # requests needed to open the COG and read its pixels once
+        with gdal_env(), rasterio.open(cog_key) as src:
+            src.read()
+        single_open_requests = s3_server.requests["GET"]
+        s3_server.requests.clear()
+
+        with track_io() as counters:
+            create_item(cog_key, "s3://bucket/training_data.parquet")
+
+    assert counters.dataset_opens == 1
+    assert s3_server.requests["GET"] == single_open_requests
+
+
 @pytest.mark.parametrize("variable", list(Variable))
 def test_create_collection(variable: Variable) -> None:
     """Test create_collection"""
@@ -0,0 +1,74 @@
+"""Tests for incremental builds"""
+
+import os
+from pathlib import Path
+
+from stactools.icesat2_boreal.batch import ExecutorType, create_items
+from stactools.icesat2_boreal.state import (
+    CatalogState,
+    ItemRecord,
+    fingerprint,
+    generator_key,
+)
+
+
+def test_catalog_state(tmp_path: Path) -> None:
+    """Test storing and replacing records"""
+    path = str(tmp_path / "state.db")
+    record = ItemRecord("ht", "0000004", "item", "item.json", "a|b", "gen", "hash")
+    with CatalogState(path) as state:
+        assert state.get("ht", "0000004") is None
+        state.put(record)
+
+    with CatalogState(path) as state:
+        assert state.get("ht", "0000004") == record
+        state.put(ItemRecord("ht", "0000004", "item", "item.json", "c|d", "g", "h"))
+        assert state.records()[("ht", "0000004")].inputs == "c|d"
+
+
+def test_fingerprint(tmp_path: Path) -> None:
+    """Test that local fingerprints change when a file changes"""
+    path = tmp_path / "file.tif"
+    assert fingerprint(str(path)) == ""
+    path.write_bytes(b"a")
+    first = fingerprint(str(path))
+    path.write_bytes(b"ab")
+    assert fingerprint(str(path)) != first
+    assert generator_key({"statistics": "exact"}) != generator_key()
+
+
+def test_incremental_create_items(
+    tmp_path: Path, cog_key_in_daac: str, cog_key_not_in_daac: str
+) -> None:
+    """Test that only tiles with changed sources are rebuilt"""
+    cog_path = tmp_path / os.path.basename(cog_key_in_daac)
+    cog_path.write_bytes(Path(cog_key_in_daac.removeprefix("file://")).read_bytes())
+    pairs = [
+        (str(cog_path), "file://training_data.parquet"),
+        (cog_key_not_in_daac, "file://training_data.parquet"),
+    ]
+    destination = str(tmp_path / "items")
+
+    def build() -> tuple:
+        with CatalogState(str(tmp_path / "state.db")) as state:
+            result = create_items(
+                pairs,
+                destination,
+                workers=2,
+                executor_type=ExecutorType.THREAD,
+                state=state,
+            )
+        assert result.ok
+        return len(result.hrefs), len(result.skipped)
+
+    assert build() == (2, 0)
+    assert build() == (0, 2)
+
+    # touching the COG changes its fingerprint but not the item contents
+    os.utime(cog_path, (0, 0))
+    assert build() == (0, 2)
+
+    with CatalogState(str(tmp_path / "state.db")) as state:
+        assert state.get("ht", "0000004").inputs.startswith(
+            f"{cog_path.stat().st_size}:"
+        )
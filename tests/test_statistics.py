@@ -0,0 +1,118 @@
+"""Tests for band statistics"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.transform import from_origin
+from rio_stac.stac import get_raster_info
+
+from stactools.icesat2_boreal.statistics import (
+    BandAccumulator,
+    StatisticsMode,
+    get_band_statistics,
+    select_overview_size,
+)
+
+
+@pytest.fixture()
+def cog_path(tmp_path: Path) -> str:
+    """Two band float32 COG with NaN nodata, overviews and statistics tags"""
+    path = str(tmp_path / "boreal_agb_2020_202508191755618683_0000004.tif")
+    rng = np.random.default_rng(0)
+    data = rng.gamma(2.0, 10.0, size=(2, 512, 512)).astype("float32")
+    data[:, :100, :] = np.nan
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        width=512,
+        height=512,
+        count=2,
+        dtype="float32",
+        nodata=np.nan,
+        crs="EPSG:3857",
+        transform=from_origin(0, 0, 30, 30),
+        tiled=True,
+        blockxsize=128,
+        blockysize=128,
+    ) as dst:
+        dst.write(data)
+        dst.update_tags(1, STATISTICS_MEAN=1.5, STATISTICS_MAXIMUM=3)
+        dst.build_overviews([2, 4, 8], Resampling.nearest)
+
+    return path
+
+
+def test_band_accumulator_merge() -> None:
+    """Test that merged partial results match statistics of the whole array"""
+    rng = np.random.default_rng(0)
+    values = rng.normal(1e4, 0.5, size=10_000).astype("float32")
+    histogram_range = (float(values.min()), float(values.max()))
+
+    partials = []
+    for chunk in np.array_split(values, 7):
+        accumulator = BandAccumulator(histogram_range=histogram_range)
+        accumulator.update(chunk, n_pixels=chunk.size * 2)
+        partials.append(accumulator)
+    merged = partials[0]
+    for partial in partials[1:]:
+        merged = merged.merge(partial)
+
+    statistics = merged.statistics()
+    assert statistics["mean"] == pytest.approx(values.astype("float64").mean())
+    assert statistics["stddev"] == pytest.approx(values.astype("float64").std())
+    assert statistics["valid_percent"] == 50
+    assert merged.buckets.tolist() == (
+        np.histogram(values, bins=10, range=histogram_range)[0].tolist()
+    )
+
+    with pytest.raises(ValueError):
+        merged.merge(BandAccumulator())
+
+
+def test_exact_statistics(cog_key_in_daac: str) -> None:
+    """Test that block-wise statistics match a full resolution read"""
+    with rasterio.open(cog_key_in_daac) as src:
+        expected = get_raster_info(src, max_size=0)
+        actual = get_band_statistics(src, StatisticsMode.EXACT)
+
+    assert len(actual) == len(expected) == 2
+    for actual_band, expected_band in zip(actual, expected, strict=True):
+        assert actual_band["histogram"] == expected_band["histogram"]
+        assert actual_band["statistics"] == pytest.approx(
+            expected_band["statistics"], rel=1e-6
+        )
+        assert actual_band["nodata"] == "nan"
+
+
+def test_header_statistics(cog_path: str) -> None:
+    """Test that header mode only uses the statistics tags"""
+    with rasterio.open(cog_path) as src:
+        bands = get_band_statistics(src, StatisticsMode.HEADER)
+
+    assert bands[0]["statistics"] == {"mean": 1.5, "maximum": 3.0}
+    assert "histogram" not in bands[0]
+    assert "statistics" not in bands[1]
+    assert bands[1]["data_type"] == "float32"
+
+
+def test_overview_statistics(cog_path: str) -> None:
+    """Test overview selection and overview statistics"""
+    with rasterio.open(cog_path) as src:
+        assert select_overview_size(src, 100) == 128
+        assert select_overview_size(src, 129) == 256
+        assert select_overview_size(src, 1024) == 512
+
+        overview = get_band_statistics(src, StatisticsMode.OVERVIEW, 100)
+        exact = get_band_statistics(src, StatisticsMode.EXACT)
+
+    for overview_band, exact_band in zip(overview, exact, strict=True):
+        assert overview_band["statistics"]["valid_percent"] == pytest.approx(
+            exact_band["statistics"]["valid_percent"], abs=1
+        )
+        assert overview_band["statistics"]["mean"] == pytest.approx(
+            exact_band["statistics"]["mean"], rel=0.05
+        )
@@ -0,0 +1,118 @@
+"""Tests for the columnar item store"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import pytest
+from pystac import Item
+
+from stactools.icesat2_boreal.options import (
+    GeometryMode,
+    OutputFormat,
+    StatisticsMode,
+    ValidationMode,
+    Variable,
+)
+from stactools.icesat2_boreal.stac import create_collection, create_item
+from stactools.icesat2_boreal.store import ItemStore
+from stactools.icesat2_boreal.tiles import build_tile_index
+from stactools.icesat2_boreal.writers import NdjsonItemWriter
+
+
+def as_json(item: Item) -> Dict[str, Any]:
+    """Item dictionary as it is written, with tuples turned into lists"""
+    return json.loads(json.dumps(item.to_dict(include_self_link=False)))
+
+
+@pytest.fixture
+def items(cog_key_in_daac: str, cog_key_not_in_daac: str) -> List[Item]:
+    """Items of both test COGs for every statistics mode"""
+    return [
+        create_item(
+            cog_key,
+            cog_key.replace(".tif", "_train.parquet"),
+            validation=ValidationMode.NONE,
+            statistics=statistics,
+        )
+        for cog_key in (cog_key_in_daac, cog_key_not_in_daac)
+        for statistics in StatisticsMode
+    ]
+
+
+def test_round_trip(items: List[Item]) -> None:
+    """Test that items are rebuilt from the columns alone"""
+    store = ItemStore.from_items(items)
+
+    assert len(store) == len(items)
+    assert not store._patches
+    for index, item in enumerate(items):
+        assert json.dumps(store.to_dict(index)) == json.dumps(as_json(item))
+        assert as_json(store.to_item(index)) == as_json(item)
+    assert [item_dict["id"] for item_dict in store] == [item.id for item in items]
+
+
+def test_columns(items: List[Item]) -> None:
+    """Test the column arrays"""
+    store = ItemStore.from_items(items)
+
+    assert store.tile_id.tolist() == ["0000004"] * 4 + ["0000003"] * 4
+    assert store.year.tolist() == [2020] * 8
+    assert store.in_daac.tolist() == [True] * 4 + [False] * 4
+    np.testing.assert_array_equal(store.bbox[0], items[0].bbox)
+    assert store.statistics.shape == (8, 2, 5)
+    # the first item has no statistics
+    assert np.isnan(store.statistics[0]).all()
+    mean = items[-1].assets["cog"].extra_fields["bands"][0]["statistics"]["mean"]
+    assert store.statistics[-1, 0, 0] == mean
+    assert store.nbytes < sum(len(json.dumps(as_json(item))) for item in items)
+
+
+def test_patches(items: List[Item], tiles_gpkg: str, tmp_path: Path) -> None:
+    """Test that fields the columns do not cover are kept"""
+    collection = create_collection(Variable.HT, ValidationMode.NONE)
+    linked = items[1].clone()
+    collection.add_item(linked)
+    edited = items[2].clone()
+    edited.properties["note"] = "hand edited"
+    del edited.properties["proj:epsg"]
+    edited.assets["cog"].extra_fields["bands"][0]["statistics"]["mean"] = None
+    indexed = create_item(
+        items[0].assets["cog"].href,
+        "train.parquet",
+        validation=ValidationMode.NONE,
+        geometry=GeometryMode.INDEX,
+        tile_index=build_tile_index(tiles_gpkg, str(tmp_path / "tile-index.npz")),
+    )
+
+    store = ItemStore.from_items([linked, edited, indexed])
+    assert set(store._patches) == {0, 1}
+    assert store.to_dict(0)["links"] == as_json(linked)["links"]
+    for index, item in enumerate([linked, edited, indexed]):
+        assert store.to_dict(index) == as_json(item)
+
+    # patches are not shared with the returned dictionaries
+    store.to_dict(1)["properties"]["note"] = "changed"
+    assert store.to_dict(1)["properties"]["note"] == "hand edited"
+
+
+def test_save(items: List[Item], tmp_path: Path) -> None:
+    """Test writing items straight from the columns"""
+    store = ItemStore.from_items(items[:2])
+
+    store.save(str(tmp_path / "items"), OutputFormat.JSON)
+    saved = (tmp_path / "items" / f"{items[0].id}.json").read_text()
+    assert json.loads(saved) == as_json(items[0])
+
+    href = str(tmp_path / "items.ndjson")
+    with NdjsonItemWriter(href) as writer:
+        store.write(writer)
+    lines = Path(href).read_text().splitlines()
+    assert [json.loads(line) for line in lines] == [as_json(item) for item in items[:2]]
+
+    pq = pytest.importorskip("pyarrow.parquet")
+    pytest.importorskip("stac_geoparquet")
+    store.save(str(tmp_path / "items.parquet"), OutputFormat.GEOPARQUET)
+    table = pq.read_table(tmp_path / "items.parquet")
+    assert table.column("id").to_pylist() == [item.id for item in items[:2]]
@@ -0,0 +1,93 @@
+"""Tests for the training data parquet metadata"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+from pystac.extensions.table import TableExtension
+
+from stactools.icesat2_boreal.batch import ExecutorType, iter_items
+from stactools.icesat2_boreal.constants import AssetType
+from stactools.icesat2_boreal.stac import create_item
+from stactools.icesat2_boreal.table import get_table_metadata, read_footer
+from stactools.icesat2_boreal.validation import ValidationMode
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+@pytest.fixture
+def parquet_key(tmp_path: Path) -> str:
+    """Training data parquet file with several row groups"""
+    rng = np.random.default_rng(0)
+    table = pa.table(
+        {
+            "lon": rng.uniform(-150, -140, 1000),
+            "lat": rng.uniform(60, 70, 1000),
+            "AGB": rng.uniform(0, 300, 1000).astype(np.float32),
+            "year": np.full(1000, 2020, dtype=np.int16),
+            "source": ["atl08"] * 1000,
+        }
+    )
+    path = tmp_path / "boreal_agb_2020_202501131736787421_0000004_train.parquet"
+    pq.write_table(table, path, row_group_size=300)
+    return str(path)
+
+
+def test_get_table_metadata(parquet_key: str) -> None:
+    """Test the row count, schema and column ranges"""
+    table = pq.read_table(parquet_key)
+    metadata = get_table_metadata(parquet_key)
+
+    assert metadata["table:row_count"] == 1000
+    columns = {column["name"]: column for column in metadata["table:columns"]}
+    assert list(columns) == ["lon", "lat", "AGB", "year", "source"]
+    assert columns["AGB"]["type"] == "float"
+    assert columns["lon"]["statistics"] == {
+        "minimum": pa.compute.min(table["lon"]).as_py(),
+        "maximum": pa.compute.max(table["lon"]).as_py(),
+    }
+    assert columns["year"]["statistics"] == {"minimum": 2020, "maximum": 2020}
+    assert "statistics" not in columns["source"]
+
+
+def test_get_table_metadata_short_footer(parquet_key: str) -> None:
+    """Test that a footer that is too short to hold the metadata is completed"""
+    footer = read_footer(parquet_key, footer_size=16)
+    assert get_table_metadata(parquet_key, footer) == get_table_metadata(parquet_key)
+
+
+def test_get_table_metadata_not_parquet(cog_key_in_daac: str) -> None:
+    """Test that other files are rejected"""
+    with pytest.raises(ValueError, match="not a parquet file"):
+        get_table_metadata(cog_key_in_daac)
+
+
+def test_create_item_parquet_metadata(cog_key_in_daac: str, parquet_key: str) -> None:
+    """Test that table extension fields are added to the parquet asset"""
+    item = create_item(
+        cog_key_in_daac,
+        parquet_key,
+        validation=ValidationMode.NONE,
+        parquet_metadata=True,
+    )
+
+    assert TableExtension.get_schema_uri() in item.stac_extensions
+    asset = item.assets[AssetType.TRAINING_DATA_PARQUET]
+    assert asset.extra_fields["table:row_count"] == 1000
+
+
+def test_iter_items_prefetch_footer(cog_key_in_daac: str, parquet_key: str) -> None:
+    """Test batch item creation with prefetched parquet footers"""
+    (result,) = iter_items(
+        [(cog_key_in_daac, parquet_key)],
+        workers=1,
+        executor_type=ExecutorType.THREAD,
+        prefetch=True,
+        validation=ValidationMode.NONE,
+        parquet_metadata=True,
+    )
+
+    assert result.error is None
+    asset = result.item.assets[AssetType.TRAINING_DATA_PARQUET]
+    assert len(asset.extra_fields["table:columns"]) == 5
@@ -0,0 +1,48 @@
+"""Tests for the shared item templates"""
+
+import pytest
+
+from stactools.icesat2_boreal.constants import AssetType
+from stactools.icesat2_boreal.options import Variable
+from stactools.icesat2_boreal.templates import ItemName, get_item_template
+
+
+def test_item_name() -> None:
+    """Test parsing an item ID out of a COG key"""
+    name = ItemName.from_key(
+        "s3://bucket/run/boreal_agb_2020_202411251732556086_0000004.tif"
+    )
+    assert name.item_id == "boreal_agb_2020_202411251732556086_0000004"
+    assert name.variable == Variable.AGB
+    assert name.year == 2020
+    assert name.run_id == "202411251732556086"
+    assert name.tile_id == "0000004"
+
+    with pytest.raises(ValueError):
+        ItemName.from_key("boreal_xyz_2020_202411251732556086_0000004.tif")
+
+
+def test_item_template() -> None:
+    """Test that the template is shared and stamps out independent assets"""
+    template = get_item_template(Variable.HT, 2020)
+    assert get_item_template(Variable.HT, 2020) is template
+    assert template.collection_id == "icesat2-boreal-v3.1-ht"
+    assert template.properties == {
+        "start_datetime": "2020-01-01T00:00:00+00:00",
+        "end_datetime": "2020-12-31T23:59:59+00:00",
+    }
+    assert template.datetime.isoformat() == "2020-07-01T23:59:59.500000"
+
+    hrefs = {AssetType.COG: "a.tif", AssetType.TRAINING_DATA_PARQUET: "a.parquet"}
+    first = template.create_assets(hrefs)
+    second = template.create_assets(hrefs)
+    first[AssetType.COG].extra_fields["bands"][0]["statistics"] = {"mean": 1.0}
+    first[AssetType.COG].roles.append("overview")
+    assert "statistics" not in second[AssetType.COG].extra_fields["bands"][0]
+    assert second[AssetType.COG].roles == ["data"]
+    assert second[AssetType.COG].extra_fields["bands"][0]["name"] == "mean_ht"
+
+    name = ItemName.from_key("boreal_ht_2020_202501131736787421_0000003.tif")
+    properties = template.create_properties(name)
+    assert properties["created_datetime"] == "2025-01-13T00:00:00+00:00"
+    assert properties["icesat2-boreal:tile_id"] == "0000003"
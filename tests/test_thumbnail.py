@@ -0,0 +1,109 @@
+"""Tests for the item thumbnails"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+import rasterio
+from rasterio.io import MemoryFile
+from rasterio.transform import from_origin
+
+from stactools.icesat2_boreal.metrics import track_io
+from stactools.icesat2_boreal.options import (
+    GeometryMode,
+    StatisticsMode,
+    ThumbnailFormat,
+    ValidationMode,
+    Variable,
+)
+from stactools.icesat2_boreal.stac import create_item
+from stactools.icesat2_boreal.thumbnail import (
+    THUMBNAIL_ASSET_KEY,
+    encode,
+    get_colormap,
+    get_render_options,
+    render,
+    thumbnail_shape,
+)
+from stactools.icesat2_boreal.tiles import build_tile_index
+
+
+def test_render() -> None:
+    """Test that values are rescaled, colorized and masked"""
+    data = np.ma.masked_invalid(np.array([[0.0, 15.0, 30.0, 45.0, np.nan]]))
+    rescale, colormap = get_render_options(Variable.HT)
+    assert (rescale, colormap) == ((0, 30), "inferno")
+
+    rgba = render(data, rescale, colormap)
+    colors = get_colormap("inferno")
+    assert rgba.shape == (4, 1, 5)
+    assert rgba.dtype == np.uint8
+    assert (rgba[:3, 0, 0] == colors[0]).all()
+    assert (rgba[:3, 0, 1] == colors[128]).all()
+    assert (rgba[:3, 0, 2] == colors[255]).all()
+    # values above the range are clamped
+    assert (rgba[:3, 0, 3] == colors[255]).all()
+    assert rgba[3, 0].tolist() == [255, 255, 255, 255, 0]
+
+    with pytest.raises(ValueError, match="Unsupported colormap"):
+        get_colormap("jet")
+
+
+@pytest.mark.parametrize("image_format", list(ThumbnailFormat))
+def test_encode(image_format: ThumbnailFormat) -> None:
+    """Test that images round trip through PNG and lossless WebP"""
+    rgba = np.random.default_rng(0).integers(0, 256, (4, 8, 16), dtype=np.uint8)
+    with MemoryFile(encode(rgba, image_format)) as memory_file:
+        with memory_file.open() as src:
+            assert src.driver == image_format.upper()
+            assert (src.read() == rgba).all()
+
+
+def test_thumbnail_shape(tmp_path: Path) -> None:
+    """Test that the smallest overview is used, scaled down if needed"""
+    path = tmp_path / "overviews.tif"
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        width=1024,
+        height=768,
+        count=1,
+        dtype="uint8",
+        transform=from_origin(0, 0, 30, 30),
+    ) as dst:
+        dst.write(np.zeros((1, 768, 1024), dtype=np.uint8))
+        dst.build_overviews([2, 4, 8])
+
+    with rasterio.open(path) as src:
+        assert thumbnail_shape(src, 256) == (96, 128)
+        assert thumbnail_shape(src, 64) == (48, 64)
+
+
+@pytest.mark.parametrize("geometry", list(GeometryMode))
+def test_create_item_thumbnail(
+    cog_key_in_daac: str, tiles_gpkg: str, tmp_path: Path, geometry: GeometryMode
+) -> None:
+    """Test that the thumbnail is written without opening the COG again"""
+    tile_index = build_tile_index(tiles_gpkg, str(tmp_path / "tile-index.npz"))
+    with track_io() as counters:
+        item = create_item(
+            cog_key_in_daac,
+            "/path/to/train.parquet",
+            validation=ValidationMode.NONE,
+            statistics=StatisticsMode.NONE,
+            geometry=geometry,
+            tile_index=tile_index,
+            thumbnails=str(tmp_path / "thumbnails"),
+        )
+
+    assert counters.dataset_opens == 1
+    asset = item.assets[THUMBNAIL_ASSET_KEY]
+    assert asset.href == str(tmp_path / "thumbnails" / f"{item.id}.png")
+    assert asset.media_type == "image/png"
+    assert asset.roles == ["thumbnail"]
+    with rasterio.open(cog_key_in_daac) as cog, rasterio.open(asset.href) as src:
+        assert src.count == 4
+        assert src.shape == cog.shape
+        alpha = src.read(4)
+        assert ((alpha == 0) == np.isnan(cog.read(1))).all()
@@ -0,0 +1,102 @@
+"""Tests for the tile geometry index"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+import rasterio
+from rio_stac.stac import get_dataset_geom
+
+from stactools.icesat2_boreal.metrics import track_io
+from stactools.icesat2_boreal.options import GeometryMode
+from stactools.icesat2_boreal.stac import create_item
+from stactools.icesat2_boreal.statistics import StatisticsMode
+from stactools.icesat2_boreal.tiles import (
+    TileIndex,
+    build_tile_index,
+    read_tile_footprints,
+)
+from stactools.icesat2_boreal.validation import ValidationMode
+
+
+@pytest.fixture
+def tile_index(tmp_path: Path, tiles_gpkg: str) -> str:
+    """Tile index built from the test GeoPackage"""
+    return build_tile_index(tiles_gpkg, str(tmp_path / "tile-index.npz"))
+
+
+def test_read_tile_footprints(tiles_gpkg: str) -> None:
+    """Test reading the GeoPackage features"""
+    crs_wkt, footprints = read_tile_footprints(tiles_gpkg)
+    assert "Albers" in crs_wkt
+    assert [tile_id for tile_id, _ in footprints] == [3, 4]
+    assert footprints[1][1].bounds[0] == pytest.approx(-2241478.0)
+
+
+def test_tile_index(tile_index: str) -> None:
+    """Test lookups in the index"""
+    index = TileIndex.load(tile_index)
+    assert len(index) == 2
+    assert list(index) == [3, 4]
+
+    tile = index.get("0000004")
+    assert tile.tile_id == 4
+    assert len(tile.geometry["coordinates"][0]) == 5
+    assert tile.projection(resolution=1500)["proj:shape"] == [60, 60]
+
+    with pytest.raises(KeyError, match="0000005"):
+        index.get("0000005")
+
+
+def test_tile_index_antimeridian(
+    tmp_path: Path, antimeridian_tiles_gpkg: str, antimeridian_cog: str
+) -> None:
+    """Test that footprints are cut at the antimeridian like rio_stac's"""
+    path = build_tile_index(antimeridian_tiles_gpkg, str(tmp_path / "index.npz"))
+    tile = TileIndex.load(path).get("0000007")
+    with rasterio.open(antimeridian_cog) as src:
+        expected = get_dataset_geom(src)
+
+    assert tile.geometry["type"] == "MultiPolygon"
+    assert tile.geometry["type"] == expected["footprint"]["type"]
+    assert tile.bbox == pytest.approx(expected["bbox"])
+    assert tile.bbox[0] == -180 and tile.bbox[2] == 180
+    assert tile.bbox[1] == pytest.approx(64.6, abs=0.1)
+    assert tile.bbox[3] == pytest.approx(65.4, abs=0.1)
+    for polygon, expected_polygon in zip(
+        tile.geometry["coordinates"], expected["footprint"]["coordinates"], strict=True
+    ):
+        assert np.allclose(polygon, expected_polygon)
+
+
+@pytest.mark.parametrize("tile", ["cog_key_in_daac", "cog_key_not_in_daac"])
+def test_create_item_index_geometry(
+    request: pytest.FixtureRequest, tile_index: str, tile: str
+) -> None:
+    """Test that the index gives the same geometry as the COG"""
+    cog_key = request.getfixturevalue(tile)
+    kwargs = {"validation": ValidationMode.NONE, "statistics": StatisticsMode.NONE}
+    expected = create_item(cog_key, "/path/to/train.parquet", **kwargs).to_dict()
+
+    with track_io() as counters:
+        item = create_item(
+            cog_key,
+            "/path/to/train.parquet",
+            geometry=GeometryMode.INDEX,
+            tile_index=tile_index,
+            **kwargs,
+        ).to_dict()
+    assert counters.dataset_opens == 0
+
+    assert np.allclose(
+        item["geometry"]["coordinates"], expected["geometry"]["coordinates"]
+    )
+    assert item["bbox"] == pytest.approx(expected["bbox"])
+    for key in ("proj:bbox", "proj:geometry", "proj:wkt2", "proj:epsg"):
+        assert item["properties"][key] == expected["properties"][key]
+
+    # shape and transform use the product resolution, not the test COG's
+    for key in ("geometry", "bbox", "properties"):
+        item.pop(key)
+        expected.pop(key)
+    assert item == expected
@@ -0,0 +1,102 @@
+"""Tests for cached schema validation"""
+
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+from pystac import Item
+from pystac.errors import STACValidationError
+
+from stactools.icesat2_boreal.validation import (
+    CachingSTACValidator,
+    ValidationMode,
+    is_sampled,
+    validate,
+)
+
+EXTENSION_SCHEMA_URI = "https://example.com/ext/v1.0.0/schema.json"
+
+
+def make_item(**properties: object) -> Item:
+    """Create a minimal item that uses the example extension"""
+    return Item(
+        id="boreal_ht_2020_202501131736787421_0000004",
+        geometry={"type": "Point", "coordinates": [0, 60]},
+        bbox=[0, 60, 0, 60],
+        datetime=datetime(2020, 7, 1, tzinfo=timezone.utc),
+        properties=dict(properties),
+        stac_extensions=[EXTENSION_SCHEMA_URI],
+    )
+
+
+@pytest.fixture()
+def validator(tmp_path: Path) -> CachingSTACValidator:
+    """Validator with the example extension schema already in its disk cache"""
+    validator = CachingSTACValidator(tmp_path)
+    path = validator.cache_path(EXTENSION_SCHEMA_URI)
+    path.parent.mkdir(parents=True)
+    path.write_text(
+        json.dumps(
+            {
+                "$schema": "http://json-schema.org/draft-07/schema#",
+                "$id": EXTENSION_SCHEMA_URI,
+                "type": "object",
+                "required": ["properties"],
+                "properties": {
+                    "properties": {
+                        "type": "object",
+                        "required": ["ext:tile_id"],
+                    }
+                },
+            }
+        )
+    )
+    return validator
+
+
+def test_is_sampled() -> None:
+    """Test that sampling is deterministic and follows the rate"""
+    ids = [f"tile_{i}" for i in range(1000)]
+    assert not any(is_sampled(i, 0) for i in ids)
+    assert all(is_sampled(i, 1) for i in ids)
+    assert 50 < sum(is_sampled(i, 0.2) for i in ids) < 350
+    assert [is_sampled(i, 0.2) for i in ids] == [is_sampled(i, 0.2) for i in ids]
+
+
+def test_validate_none() -> None:
+    """Test that no schemas are needed when validation is skipped"""
+    assert not validate(make_item(), ValidationMode.NONE)
+
+
+def test_caching_validator_offline(validator: CachingSTACValidator) -> None:
+    """Test validation from the on-disk cache with compiled validator reuse"""
+    make_item(**{"ext:tile_id": "0000004"}).validate(validator=validator)
+    compiled = dict(validator._validators)
+    make_item(**{"ext:tile_id": "0000003"}).validate(validator=validator)
+    assert EXTENSION_SCHEMA_URI in compiled
+    assert validator._validators == compiled
+
+    with pytest.raises(STACValidationError, match="ext:tile_id"):
+        make_item().validate(validator=validator)
+
+
+def test_prewarm(tmp_path: Path) -> None:
+    """Test that prewarming caches schemas and the schemas they reference"""
+    source = tmp_path / "source"
+    source.mkdir()
+    (source / "definitions.json").write_text(
+        json.dumps({"$id": "definitions.json", "type": "string"})
+    )
+    (source / "schema.json").write_text(
+        json.dumps({"$id": "schema.json", "$ref": "definitions.json#/"})
+    )
+    validator = CachingSTACValidator(tmp_path / "cache")
+
+    uris = validator.prewarm([(source / "schema.json").as_uri()])
+
+    assert uris == [
+        (source / "definitions.json").as_uri(),
+        (source / "schema.json").as_uri(),
+    ]
+    assert all(validator.cache_path(uri).exists() for uri in uris)
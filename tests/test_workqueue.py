@@ -0,0 +1,159 @@
+"""Tests for the work queue of resumable batch runs"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import pytest
+from rasterio.errors import RasterioIOError
+
+from stactools.icesat2_boreal import batch
+from stactools.icesat2_boreal.options import (
+    ExecutorType,
+    StatisticsMode,
+    ValidationMode,
+)
+from stactools.icesat2_boreal.workqueue import TaskStatus, WorkQueue, is_transient
+
+PAIRS = [
+    (f"s3://bucket/tile_{i}.tif", f"s3://bucket/tile_{i}_train.parquet")
+    for i in range(8)
+]
+
+
+class ClientError(Exception):
+    """Stand-in for botocore's ClientError, which carries the parsed response"""
+
+    def __init__(self, code: str) -> None:
+        """Create the error for an S3 error code"""
+        super().__init__(f"An error occurred ({code})")
+        self.response = {"Error": {"Code": code}}
+
+
+def _claim_all(path: str) -> List[str]:
+    with WorkQueue(path) as queue:
+        return [task.cog_key for task in queue.iter_claims()]
+
+
+def test_claims_are_exclusive(tmp_path: Path) -> None:
+    """Test that queues sharing a file never hand out the same tile twice"""
+    path = str(tmp_path / "queue.db")
+    with WorkQueue(path) as first, WorkQueue(path) as second:
+        assert first.add(PAIRS) == len(PAIRS)
+        # adding the same manifest again, e.g. from another node, is a no-op
+        assert second.add(PAIRS) == 0
+
+        claimed = [first.claim(), second.claim(), first.claim()]
+        assert [task.cog_key for task in claimed] == [pair[0] for pair in PAIRS[:3]]
+        assert all(task.attempts == 1 for task in claimed)
+        assert first.counts()[TaskStatus.RUNNING] == 3
+
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        claims = list(executor.map(_claim_all, [path, path]))
+    claimed_keys = [cog_key for keys in claims for cog_key in keys]
+    assert sorted(claimed_keys) == sorted(pair[0] for pair in PAIRS[3:])
+
+
+def test_expired_lease(tmp_path: Path) -> None:
+    """Test that the tiles of a worker that died are claimed again"""
+    path = str(tmp_path / "queue.db")
+    with (
+        WorkQueue(path, lease_seconds=0, max_attempts=2) as dead,
+        WorkQueue(path) as alive,
+    ):
+        dead.add(PAIRS[:1])
+        assert dead.claim() is not None
+        time.sleep(0.01)
+
+        task = alive.claim()
+        assert task is not None
+        assert task.attempts == 2
+        assert alive.claim() is None
+
+    # a tile whose last attempt never finishes is given up on
+    with WorkQueue(path, lease_seconds=0, max_attempts=2) as queue:
+        queue._connection.execute("UPDATE tasks SET lease_expires = 0")
+        assert queue.claim() is None
+        assert queue.counts()[TaskStatus.FAILED] == 1
+        assert "Lease expired" in queue.errors()[PAIRS[0][0]]
+
+
+def test_fail(tmp_path: Path) -> None:
+    """Test that transient errors are retried with backoff and others are not"""
+    with WorkQueue(
+        str(tmp_path / "queue.db"), max_attempts=2, backoff_seconds=60
+    ) as queue:
+        queue.add(PAIRS[:2])
+        transient, permanent = queue.claim(), queue.claim()
+        assert queue.fail(transient.cog_key, ClientError("SlowDown")) == "pending"
+        assert queue.fail(permanent.cog_key, ValueError("bad tile")) == "failed"
+
+        # the retry waits for the backoff
+        assert queue.claim() is None
+        assert 59 < queue.retry_delay() <= 60
+        queue._connection.execute("UPDATE tasks SET not_before = 0")
+        retry = queue.claim()
+        assert retry.cog_key == transient.cog_key
+        assert retry.attempts == 2
+        assert queue.fail(retry.cog_key, TimeoutError()) == "failed"
+        assert queue.retry_delay() is None
+
+        assert queue.errors() == {
+            transient.cog_key: "TimeoutError()",
+            permanent.cog_key: "ValueError('bad tile')",
+        }
+        assert queue.retry_failed() == 2
+        assert queue.claim().attempts == 1
+
+
+def test_is_transient() -> None:
+    """Test the classification of S3 errors"""
+    assert is_transient(ConnectionResetError())
+    assert is_transient(ClientError("ServiceUnavailable"))
+    assert is_transient(RasterioIOError("CURL error: HTTP response code: 503"))
+    assert is_transient(OSError("Read timed out"))
+    assert not is_transient(ClientError("NoSuchKey"))
+    assert not is_transient(RasterioIOError("HTTP response code: 404"))
+    assert not is_transient(FileNotFoundError("tile.tif"))
+
+
+def test_create_items_queue(
+    cog_key_in_daac: str,
+    cog_key_not_in_daac: str,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that a queued run retries transient errors and resumes"""
+    pairs = [
+        (cog_key, cog_key.replace(".tif", "_train.parquet"))
+        for cog_key in (cog_key_in_daac, cog_key_not_in_daac)
+    ]
+    create_item_dict = batch._create_item_dict
+    failures = [cog_key_in_daac]
+
+    def flaky(cog_key: str, *args: Any) -> Tuple[Any, ...]:
+        if cog_key in failures:
+            failures.remove(cog_key)
+            raise ConnectionResetError("Connection reset by peer")
+        return create_item_dict(cog_key, *args)
+
+    monkeypatch.setattr(batch, "_create_item_dict", flaky)
+    path = str(tmp_path / "queue.db")
+    kwargs: Dict[str, Any] = {
+        "executor_type": ExecutorType.THREAD,
+        "validation": ValidationMode.NONE,
+        "statistics": StatisticsMode.NONE,
+    }
+
+    with WorkQueue(path, backoff_seconds=0.01) as queue:
+        result = batch.create_items(pairs, str(tmp_path), queue=queue, **kwargs)
+        assert result.ok
+        assert result.retried == 1
+        assert len(result.hrefs) == 2
+        assert queue.counts()[TaskStatus.DONE] == 2
+
+    # every tile is done, so running again creates nothing
+    with WorkQueue(path) as queue:
+        result = batch.create_items(pairs, str(tmp_path), queue=queue, **kwargs)
+        assert result.hrefs == []
@@ -0,0 +1,82 @@
+"""Tests for the batch output writers"""
+
+import json
+from pathlib import Path
+
+import pytest
+from pystac import Item
+
+from stactools.icesat2_boreal.batch import ExecutorType, create_items
+from stactools.icesat2_boreal.stac import create_item
+from stactools.icesat2_boreal.validation import ValidationMode
+from stactools.icesat2_boreal.writers import (
+    GeoParquetItemWriter,
+    NdjsonItemWriter,
+    OutputFormat,
+)
+
+
+@pytest.fixture
+def item(cog_key_in_daac: str) -> Item:
+    """An item created from the test COG"""
+    return create_item(
+        cog_key_in_daac, "/path/to/train.parquet", validation=ValidationMode.NONE
+    )
+
+
+def test_ndjson_writer(tmp_path: Path, item: Item) -> None:
+    """Test that items are written one per line"""
+    href = str(tmp_path / "items.ndjson")
+    with NdjsonItemWriter(href) as writer:
+        assert writer.write(item) == href
+        writer.write(item)
+
+    lines = Path(href).read_text().splitlines()
+    assert len(lines) == 2
+    assert Item.from_dict(json.loads(lines[0])).id == item.id
+
+
+def test_geoparquet_writer(tmp_path: Path, item: Item) -> None:
+    """Test that items are written in row groups of the requested size"""
+    pq = pytest.importorskip("pyarrow.parquet")
+    href = str(tmp_path / "items.parquet")
+    with GeoParquetItemWriter(href, row_group_size=2) as writer:
+        for _ in range(5):
+            writer.write(item)
+
+    parquet_file = pq.ParquetFile(href)
+    assert parquet_file.metadata.num_rows == 5
+    assert parquet_file.metadata.num_row_groups == 3
+    assert parquet_file.read().column("id")[0].as_py() == item.id
+
+
+def test_create_items_ndjson(
+    tmp_path: Path, cog_key_in_daac: str, cog_key_not_in_daac: str
+) -> None:
+    """Test a batch streamed into a single ndjson file"""
+    href = str(tmp_path / "items.ndjson")
+    pairs = [
+        (cog_key_in_daac, "file://training_data.parquet"),
+        (cog_key_not_in_daac, "file://training_data.parquet"),
+    ]
+    result = create_items(
+        pairs,
+        href,
+        workers=2,
+        executor_type=ExecutorType.THREAD,
+        output_format=OutputFormat.NDJSON,
+    )
+
+    assert result.hrefs == [href, href]
+    assert len(Path(href).read_text().splitlines()) == 2
+
+
+def test_create_items_bulk_state(tmp_path: Path) -> None:
+    """Test that incremental builds require per-item output"""
+    with pytest.raises(ValueError, match="ndjson"):
+        create_items(
+            [],
+            str(tmp_path / "items.ndjson"),
+            state=object(),
+            output_format=OutputFormat.NDJSON,
+        )